@@ -1,13 +1,22 @@
 from typing import List, Optional, Any, Dict
 from fastapi import FastAPI
 from pydantic import BaseModel
-from playwright.sync_api import sync_playwright, TimeoutError
+from playwright.sync_api import TimeoutError
 
 # Importa funções do script existente
 from detran_manual import processar_veiculo, salvar_no_excel, formatar_valor_br
+from browser_pool import pool as pool_navegadores
 
 app = FastAPI(title="DETRAN-CE API", version="1.0.0")
 
+@app.on_event("startup")
+def startup_event():
+    pool_navegadores.iniciar()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    pool_navegadores.encerrar()
+
 class Veiculo(BaseModel):
     placa: str
     renavam: str
@@ -27,11 +36,7 @@ def health() -> Dict[str, Any]:
 @app.post("/consultar")
 def consultar(req: ConsultaRequest) -> Dict[str, Any]:
     try:
-        with sync_playwright() as p:
-            # Para ambiente local, manter não-headless facilita interações
-            browser = p.chromium.launch(headless=False)
-            total, multas = processar_veiculo(browser, req.veiculo.dict(), 1)
-            browser.close()
+        total, multas = pool_navegadores.executar(processar_veiculo, req.veiculo.dict(), 1)
 
         if req.salvar_excel and multas:
             salvar_no_excel(multas)
@@ -53,13 +58,14 @@ def consultar_lote(req: ConsultaLoteRequest) -> Dict[str, Any]:
     total_geral = 0.0
 
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            for i, v in enumerate(req.veiculos, 1):
-                total, multas = processar_veiculo(browser, v.dict(), i)
-                total_geral += total
-                todas_multas.extend(multas)
-            browser.close()
+        futuros = [
+            pool_navegadores.submeter(processar_veiculo, v.dict(), i)
+            for i, v in enumerate(req.veiculos, 1)
+        ]
+        for futuro in futuros:
+            total, multas = futuro.result()
+            total_geral += total
+            todas_multas.extend(multas)
 
         if req.salvar_excel and todas_multas:
             salvar_no_excel(todas_multas)
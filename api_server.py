@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import uuid
+import asyncio
 import threading
+from concurrent.futures import as_completed
 from datetime import datetime
 import os
 import sys
@@ -14,12 +16,21 @@ from dotenv import load_dotenv
 # Carregar variáveis de ambiente
 load_dotenv()
 
-from supabase import create_client, Client
 
 # Importar funções do detran_manual.py
 import detran_manual
-from detran_manual import processar_veiculo, salvar_no_excel
-from playwright.sync_api import sync_playwright
+from detran_manual import processar_veiculo
+from browser_pool import pool as pool_navegadores
+from pipeline_pdf import pipeline as pipeline_pdf
+from planilhas_consultas import planilhas, versao_conteudo
+from banco import banco
+from escrita_lote import EscritaEmLote
+from cache_leitura import CacheLeitura
+import paginacao
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO
+from eventos_consulta import eventos, formatar_sse, snapshot_do_banco, INTERVALO_PING_S, STATUS_FINAIS
+import exportacao_multas
+import detran_async
 
 app = FastAPI(title="DETRAN-CE API", version="1.0.0")
 
@@ -36,7 +47,30 @@ SUPABASE_KEY = (
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Supabase credentials missing. Defina SUPABASE_URL e SUPABASE_SERVICE_KEY/KEY/ANON/PUBLISHABLE.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Cliente PostgREST com pool de conexões; os endpoints async chamam o banco via banco.executar()
+supabase = banco.conectar(SUPABASE_URL, SUPABASE_KEY)
+
+# Leituras de status/multas em cache (cache_leitura.py), invalidadas a cada escrita
+cache_leitura = CacheLeitura()
+
+
+def _invalidar_leituras(consulta_ids):
+    for consulta_id in consulta_ids:
+        cache_leitura.invalidar(consulta_id)
+
+
+# Status dos veículos e multas vão ao banco em lote (escrita_lote.py)
+escrita = EscritaEmLote(supabase, ao_gravar=_invalidar_leituras)
+
+# ===== Motor de scraping =====
+# "sync": pool de navegadores em threads (browser_pool.py)
+# "async": um navegador dirigido pelo event loop da API (detran_async.py)
+MOTOR_SCRAPING = os.getenv("DETRAN_MOTOR", "sync").lower()
+motor_async = detran_async.MotorAsync() if MOTOR_SCRAPING == "async" else None
+_tarefas_consulta: set = set()
+
+# Tempo máximo da consulta ao banco em /ready
+TIMEOUT_PRONTIDAO_S = 5
 
 # CORS para permitir frontend
 app.add_middleware(
@@ -45,6 +79,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[paginacao.CABECALHO_CURSOR],
 )
 
 # Armazenamento agora no Supabase (consultas, veiculos, multas, condutores, indicacoes)
@@ -149,26 +184,18 @@ def db_update_consulta_status(consulta_id: str, status: str, excel_path: Optiona
         resp = supabase.table("consultas").update(payload).eq("id", consulta_id).execute()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar consulta: {str(e)}")
+    cache_leitura.invalidar(consulta_id)
 
 
-def db_update_veiculo_status(consulta_id: str, placa: str, data: Dict[str, Any]):
-    _supabase_or_http_error()
-    try:
-        resp = supabase.table("veiculos_consulta").update(data).eq("consulta_id", consulta_id).eq("placa", placa).execute()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao atualizar veículo {placa}: {str(e)}")
-
-
-def db_insert_multas(consulta_id: str, multas: List[Dict]):
-    _supabase_or_http_error()
-    if not multas:
-        return
+def _linhas_multas(consulta_id: str, multas: List[Dict]) -> List[Dict[str, Any]]:
+    """Linhas da tabela multas a partir das multas do scraping (ou já no formato do banco)."""
     rows = []
-    for m in multas:
+    for posicao, m in enumerate(multas, 1):
         rows.append({
             "consulta_id": consulta_id,
             "placa": m.get("Placa") or m.get("placa") or "-",
-            "numero": m.get("#") or m.get("numero") or 0,
+            # Chave do upsert com placa (escrita_lote.CHAVE_MULTAS): nunca repete no veículo
+            "numero": m.get("#") or m.get("numero") or posicao,
             "ait": m.get("AIT") or m.get("ait") or "-",
             "ait_originaria": m.get("AIT Originária") or m.get("ait_originaria") or "-",
             "motivo": m.get("Motivo") or m.get("motivo") or "-",
@@ -179,14 +206,19 @@ def db_insert_multas(consulta_id: str, multas: List[Dict]):
             "orgao_autuador": m.get("Órgão Autuador") or m.get("orgao_autuador") or "-",
             "codigo_pagamento": m.get("Código de pagamento em barra") or m.get("codigo_pagamento") or "-",
         })
-
-    try:
-        resp = supabase.table("multas").insert(rows).execute()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar multas: {str(e)}")
+    return rows
 
 
 def db_get_consulta_com_status(consulta_id: str) -> Dict[str, Any]:
+    """Consulta + status dos veículos; em cache, sem expirar depois que a consulta termina."""
+    return cache_leitura.obter(
+        "status", consulta_id,
+        lambda: _db_get_consulta_com_status(consulta_id),
+        imutavel=lambda data: data["consulta"].get("status") in STATUS_FINAIS,
+    )
+
+
+def _db_get_consulta_com_status(consulta_id: str) -> Dict[str, Any]:
     _supabase_or_http_error()
     try:
         consulta = supabase.table("consultas").select("*").eq("id", consulta_id).single().execute()
@@ -200,6 +232,23 @@ def db_get_consulta_com_status(consulta_id: str) -> Dict[str, Any]:
 
 
 def db_get_multas(consulta_id: str) -> List[Dict[str, Any]]:
+    """Multas da consulta; em cache, sem expirar só se a consulta já tinha terminado."""
+    encerrada = False
+
+    def carregar():
+        nonlocal encerrada
+        # Status lido antes das multas: se a consulta já terminou, a lista lida é a final
+        status = db_get_consulta_com_status(consulta_id)["consulta"].get("status")
+        encerrada = status in STATUS_FINAIS
+        return _db_get_multas(consulta_id)
+
+    return cache_leitura.obter(
+        "multas", consulta_id, carregar,
+        imutavel=lambda multas: encerrada,
+    )
+
+
+def _db_get_multas(consulta_id: str) -> List[Dict[str, Any]]:
     _supabase_or_http_error()
     try:
         resp = supabase.table("multas").select("*").eq("consulta_id", consulta_id).execute()
@@ -208,14 +257,98 @@ def db_get_multas(consulta_id: str) -> List[Dict[str, Any]]:
     return resp.data or []
 
 
-def db_get_historico() -> List[Dict[str, Any]]:
+def db_get_multas_pagina(consulta_id: str, depois_de_id: Optional[Any], limite: int) -> List[Dict[str, Any]]:
+    """Uma página de multas da consulta em ordem de id (keyset: id > depois_de_id)."""
     _supabase_or_http_error()
+    colunas = ",".join(["id"] + exportacao_multas.COLUNAS_EXPORTACAO)
+    consulta = supabase.table("multas").select(colunas).eq("consulta_id", consulta_id)
+    if depois_de_id is not None:
+        consulta = consulta.gt("id", depois_de_id)
     try:
-        resp = supabase.table("consultas").select("id,status,total_multas,valor_total,created_at").order("created_at", desc=True).execute()
+        resp = consulta.order("id").limit(limite).execute()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao buscar histórico: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar multas: {str(e)}")
     return resp.data or []
 
+
+# Colunas devolvidas pelas listagens (projeção explícita, sem select *)
+COLUNAS_HISTORICO = "id,status,total_multas,valor_total,created_at"
+COLUNAS_CONDUTORES = "id,nome,cpf,cnh_categoria,cnh_vencimento,pontuacao,created_at"
+COLUNAS_INDICACOES = "id,ait,placa,condutor_id,data_indicacao,status"
+
+
+def _db_listar(tabela: str, colunas: str, coluna_ordem: str, limite: Optional[int], cursor: Optional[str],
+               filtrar=None, erro: str = "Erro ao listar"):
+    """Página de `tabela` em ordem decrescente de `coluna_ordem` -> (linhas, cursor da próxima).
+
+    Sem `limite` nem `cursor` devolve a listagem inteira (clientes que não paginam).
+    """
+    _supabase_or_http_error()
+    if cursor and limite is None:
+        limite = LIMITE_PADRAO
+    consulta = supabase.table(tabela).select(colunas)
+    if filtrar is not None:
+        consulta = filtrar(consulta)
+    consulta = paginacao.pagina(consulta, coluna_ordem, limite, cursor)
+    try:
+        resp = consulta.execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{erro}: {str(e)}")
+    return paginacao.fatiar(resp.data or [], coluna_ordem, limite)
+
+
+def _filtro_periodo(consulta, coluna: str, desde: Optional[str], ate: Optional[str]):
+    if desde:
+        consulta = consulta.gte(coluna, desde)
+    if ate:
+        consulta = consulta.lte(coluna, ate)
+    return consulta
+
+
+def db_get_historico(limite: Optional[int] = None, cursor: Optional[str] = None, status: Optional[str] = None,
+                     desde: Optional[str] = None, ate: Optional[str] = None):
+    def filtrar(consulta):
+        if status:
+            consulta = consulta.eq("status", status)
+        return _filtro_periodo(consulta, "created_at", desde, ate)
+
+    return _db_listar("consultas", COLUNAS_HISTORICO, "created_at", limite, cursor, filtrar,
+                      erro="Erro ao buscar histórico")
+
+
+def db_listar_condutores(limite: Optional[int] = None, cursor: Optional[str] = None,
+                         nome: Optional[str] = None, cpf: Optional[str] = None):
+    def filtrar(consulta):
+        if nome:
+            consulta = consulta.ilike("nome", f"%{nome}%")
+        if cpf:
+            consulta = consulta.eq("cpf", cpf)
+        return consulta
+
+    return _db_listar("condutores", COLUNAS_CONDUTORES, "created_at", limite, cursor, filtrar,
+                      erro="Erro ao listar condutores")
+
+
+def db_listar_indicacoes(limite: Optional[int] = None, cursor: Optional[str] = None, placa: Optional[str] = None,
+                         ait: Optional[str] = None, condutor_id: Optional[str] = None, status: Optional[str] = None,
+                         desde: Optional[str] = None, ate: Optional[str] = None):
+    def filtrar(consulta):
+        for coluna, valor in (("placa", placa), ("ait", ait), ("condutor_id", condutor_id), ("status", status)):
+            if valor:
+                consulta = consulta.eq(coluna, valor)
+        return _filtro_periodo(consulta, "data_indicacao", desde, ate)
+
+    return _db_listar("indicacoes", COLUNAS_INDICACOES, "data_indicacao", limite, cursor, filtrar,
+                      erro="Erro ao listar indicações")
+
+
+def _responder_pagina(response: Response, pagina):
+    """Corpo = lista da página; cursor da próxima no cabeçalho X-Proximo-Cursor."""
+    linhas, proximo = pagina
+    if proximo:
+        response.headers[paginacao.CABECALHO_CURSOR] = proximo
+    return linhas
+
 def converter_multa_para_frontend(multa_dict: Dict) -> Dict:
     """Converte dados da planilha (detran_manual.py) para formato do frontend"""
     return {
@@ -232,93 +365,219 @@ def converter_multa_para_frontend(multa_dict: Dict) -> Dict:
         "codigo_pagamento": multa_dict.get("Código de pagamento em barra", "-")
     }
 
+def _processar_item_veiculo(browser, consulta_id: str, indice: int, veiculo_data: Veiculo):
+    """Raspa um veículo num navegador do pool (cada veículo ganha contexto próprio).
+
+    O parsing do boleto fica no pipeline de PDFs, então o navegador volta ao
+    pool logo após o download; a persistência é feita por _finalizar_veiculo.
+    """
+    # Atualiza status do veículo para processing
+    _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+        "status": "processing",
+        "mensagem": "Consultando DETRAN-CE...",
+    })
+
+    # Chama a função processar_veiculo do detran_manual.py
+    veiculo_dict = {
+        "placa": veiculo_data.placa,
+        "renavam": veiculo_data.renavam
+    }
+    return processar_veiculo(browser, veiculo_dict, indice, pipeline_pdf)
+
+
+def _finalizar_veiculo(consulta_id: str, veiculo_data: Veiculo, futuro):
+    """Espera a raspagem e o parsing do PDF de um veículo e persiste o resultado.
+
+    Retorna (total, multas) ou None quando o veículo terminou com erro.
+    """
+    try:
+        total, multas = futuro.result()
+        pipeline_pdf.concluir(multas)
+
+        # Atualiza status do veículo e persiste as multas (gravados no próximo lote)
+        _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+            "status": "completed",
+            "multas_count": len(multas),
+            "valor_total": total,
+            "mensagem": f"{len(multas)} multa(s) encontrada(s)",
+        })
+        escrita.inserir_multas(_linhas_multas(consulta_id, multas))
+        return total, multas
+
+    except Exception as e:
+        _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+            "status": "error",
+            "mensagem": f"Erro: {str(e)}",
+        })
+        print(f"❌ Erro ao processar {veiculo_data.placa}:")
+        print(traceback.format_exc())
+        return None
+
+
+def _excel_path(consulta_id: str, multas: List[Dict]) -> Optional[str]:
+    """Endereço de download da planilha; ela é gerada no primeiro download (planilhas_consultas.py)."""
+    return f"/consultas/{consulta_id}/excel" if multas else None
+
+
+def _atualizar_veiculo(consulta_id: str, placa: str, dados: Dict[str, Any]):
+    """Status do veículo: vai para o buffer de escrita e para quem assiste a consulta (SSE)."""
+    escrita.atualizar_veiculo(consulta_id, placa, dados)
+    eventos.veiculo(consulta_id, placa, dados)
+
+
+def _descarregar_com_log(consulta_id: str):
+    """descarregar() no caminho de erro: uma nova falha só é registrada."""
+    try:
+        escrita.descarregar()
+    except Exception as e:
+        print(f"⚠️ Consulta {consulta_id}: escritas pendentes não gravadas: {e}")
+
+
 def processar_consulta_background(consulta_id: str, veiculos: List[Veiculo]):
-    """Processa veículos em background usando Playwright (detran_manual.py)"""
+    """Processa veículos em background usando Playwright (detran_manual.py)
+
+    Os veículos são distribuídos entre os navegadores do pool compartilhado e
+    finalizados na ordem em que terminam; os totais seguem a ordem original.
+    """
     total_geral = 0.0
     todas_multas_original = []  # Para Excel
 
     try:
         # Marca consulta como processing
         db_update_consulta_status(consulta_id, "processing")
+        eventos.status(consulta_id, "processing")
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            
-            for i, veiculo_data in enumerate(veiculos, 1):
-                # Atualiza status do veículo para processing
-                db_update_veiculo_status(consulta_id, veiculo_data.placa, {
-                    "status": "processing",
-                    "mensagem": "Consultando DETRAN-CE...",
-                })
+        futuros = {
+            pool_navegadores.submeter(_processar_item_veiculo, consulta_id, i, veiculo_data): i
+            for i, veiculo_data in enumerate(veiculos, 1)
+        }
 
-                try:
-                    # Chama a função processar_veiculo do detran_manual.py
-                    veiculo_dict = {
-                        "placa": veiculo_data.placa,
-                        "renavam": veiculo_data.renavam
-                    }
-                    
-                    total, multas = processar_veiculo(browser, veiculo_dict, i)
-                    multas_formatadas = [converter_multa_para_frontend(m) for m in multas]
-
-                    # Atualiza status do veículo
-                    db_update_veiculo_status(consulta_id, veiculo_data.placa, {
-                        "status": "completed",
-                        "multas_count": len(multas),
-                        "valor_total": total,
-                        "mensagem": f"{len(multas)} multa(s) encontrada(s)",
-                    })
-
-                    # Persiste multas
-                    db_insert_multas(consulta_id, multas)
-
-                    todas_multas_original.extend(multas)
-                    total_geral += total
-                    
-                except Exception as e:
-                    db_update_veiculo_status(consulta_id, veiculo_data.placa, {
-                        "status": "error",
-                        "mensagem": f"Erro: {str(e)}",
-                    })
-                    print(f"❌ Erro ao processar {veiculo_data.placa}:")
-                    print(traceback.format_exc())
-            
-            browser.close()
-        
-        # Salvar Excel usando a função do detran_manual.py
-        if todas_multas_original:
-            salvar_no_excel(todas_multas_original)
-            excel_path = detran_manual.EXCEL_ARQUIVO
-        else:
-            excel_path = None
+        resultados = {}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            resultados[i] = _finalizar_veiculo(consulta_id, veiculos[i - 1], futuro)
+
+        for i in sorted(resultados):
+            if resultados[i] is None:
+                continue
+            total, multas = resultados[i]
+            todas_multas_original.extend(multas)
+            total_geral += total
+
+        # Grava o que ainda está no buffer antes de marcar a consulta como concluída
+        escrita.descarregar()
 
         # Marca consulta como concluída com totais
         db_update_consulta_status(
             consulta_id,
             status="completed",
-            excel_path=excel_path,
+            excel_path=_excel_path(consulta_id, todas_multas_original),
             total_multas=len(todas_multas_original),
             valor_total=total_geral,
         )
+        eventos.status(consulta_id, "completed", total_multas=len(todas_multas_original), valor_total=total_geral)
         
         print(f"✅ Consulta {consulta_id} concluída com sucesso!")
         print(f"📊 Total: {len(todas_multas_original)} multas | R$ {total_geral:.2f}")
         
     except Exception:
+        _descarregar_com_log(consulta_id)
         db_update_consulta_status(consulta_id, "error")
+        eventos.status(consulta_id, "error")
         print(f"❌ Erro na consulta {consulta_id}:")
         print(traceback.format_exc())
 
-# ================= ENDPOINTS =================
+async def _processar_item_veiculo_async(consulta_id: str, indice: int, veiculo_data: Veiculo):
+    """Versão async de _processar_item_veiculo (uma página do motor async por veículo)."""
+    _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+        "status": "processing",
+        "mensagem": "Consultando DETRAN-CE...",
+    })
 
-@app.get("/condutores")
-async def listar_condutores():
-    """Lista condutores cadastrados"""
     try:
-        resp = supabase.table("condutores").select("*").order("created_at", desc=True).execute()
-        return resp.data or []
+        veiculo_dict = {
+            "placa": veiculo_data.placa,
+            "renavam": veiculo_data.renavam
+        }
+
+        total, multas = await motor_async.processar(veiculo_dict, indice, pipeline_pdf)
+        # A página já foi liberada; só o parsing do boleto ainda pode estar rodando
+        await asyncio.to_thread(pipeline_pdf.concluir, multas)
+
+        _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+            "status": "completed",
+            "multas_count": len(multas),
+            "valor_total": total,
+            "mensagem": f"{len(multas)} multa(s) encontrada(s)",
+        })
+        escrita.inserir_multas(_linhas_multas(consulta_id, multas))
+        return total, multas
+
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        _atualizar_veiculo(consulta_id, veiculo_data.placa, {
+            "status": "error",
+            "mensagem": f"Erro: {str(e)}",
+        })
+        print(f"❌ Erro ao processar {veiculo_data.placa}:")
+        print(traceback.format_exc())
+        return None
+
+
+async def processar_consulta_async(consulta_id: str, veiculos: List[Veiculo]):
+    """Processa a consulta no event loop da API usando o motor async (DETRAN_MOTOR=async)."""
+    total_geral = 0.0
+    todas_multas_original = []
+
+    try:
+        await banco.executar(db_update_consulta_status, consulta_id, "processing")
+        eventos.status(consulta_id, "processing")
+
+        resultados = await asyncio.gather(*[
+            _processar_item_veiculo_async(consulta_id, i, veiculo_data)
+            for i, veiculo_data in enumerate(veiculos, 1)
+        ])
+        for resultado in resultados:
+            if resultado is None:
+                continue
+            total, multas = resultado
+            todas_multas_original.extend(multas)
+            total_geral += total
+
+        await banco.executar(escrita.descarregar)
+
+        await banco.executar(
+            db_update_consulta_status,
+            consulta_id,
+            status="completed",
+            excel_path=_excel_path(consulta_id, todas_multas_original),
+            total_multas=len(todas_multas_original),
+            valor_total=total_geral,
+        )
+        eventos.status(consulta_id, "completed", total_multas=len(todas_multas_original), valor_total=total_geral)
+
+        print(f"✅ Consulta {consulta_id} concluída com sucesso!")
+        print(f"📊 Total: {len(todas_multas_original)} multas | R$ {total_geral:.2f}")
+
+    except Exception:
+        await banco.executar(_descarregar_com_log, consulta_id)
+        await banco.executar(db_update_consulta_status, consulta_id, "error")
+        eventos.status(consulta_id, "error")
+        print(f"❌ Erro na consulta {consulta_id}:")
+        print(traceback.format_exc())
+
+# ================= ENDPOINTS =================
+
+@app.get("/condutores")
+async def listar_condutores(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    nome: Optional[str] = None,
+    cpf: Optional[str] = None,
+):
+    """Lista condutores cadastrados (mais recentes primeiro, paginado por cursor)"""
+    pagina = await banco.executar(db_listar_condutores, limite, cursor, nome, cpf)
+    return _responder_pagina(response, pagina)
 
 @app.post("/condutores")
 async def criar_condutor(condutor: CondutorCreate):
@@ -331,7 +590,7 @@ async def criar_condutor(condutor: CondutorCreate):
         "pontuacao": condutor.pontuacao,
     }
     try:
-        resp = supabase.table("condutores").insert(payload).select("*").single().execute()
+        resp = await banco.executar(supabase.table("condutores").insert(payload).select("*").single().execute)
         return resp.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -340,7 +599,7 @@ async def criar_condutor(condutor: CondutorCreate):
 async def remover_condutor(condutor_id: str):
     """Remove um condutor cadastrado"""
     try:
-        resp = supabase.table("condutores").delete().eq("id", condutor_id).execute()
+        resp = await banco.executar(supabase.table("condutores").delete().eq("id", condutor_id).execute)
         if not resp.data:
             raise HTTPException(status_code=404, detail="Condutor não encontrado")
         return {"status": "ok"}
@@ -350,13 +609,22 @@ async def remover_condutor(condutor_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/indicacoes")
-async def listar_indicacoes():
-    """Lista indicações registradas"""
-    try:
-        resp = supabase.table("indicacoes").select("*").order("data_indicacao", desc=True).execute()
-        return resp.data or []
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def listar_indicacoes(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    placa: Optional[str] = None,
+    ait: Optional[str] = None,
+    condutor_id: Optional[str] = None,
+    status: Optional[str] = None,
+    desde: Optional[str] = None,
+    ate: Optional[str] = None,
+):
+    """Lista indicações registradas (mais recentes primeiro, paginado por cursor)"""
+    pagina = await banco.executar(
+        db_listar_indicacoes, limite, cursor, placa, ait, condutor_id, status, desde, ate
+    )
+    return _responder_pagina(response, pagina)
 
 @app.post("/indicacoes")
 async def registrar_indicacao(payload: IndicacaoRequest):
@@ -365,18 +633,18 @@ async def registrar_indicacao(payload: IndicacaoRequest):
 
     # Verifica condutor
     try:
-        condutor = supabase.table("condutores").select("id").eq("id", payload.condutorId).single().execute()
+        condutor = await banco.executar(supabase.table("condutores").select("id").eq("id", payload.condutorId).single().execute)
     except Exception:
         raise HTTPException(status_code=404, detail="Condutor não encontrado")
 
     try:
-        resp = supabase.table("indicacoes").insert({
+        resp = await banco.executar(supabase.table("indicacoes").insert({
             "ait": payload.ait,
             "placa": payload.placa,
             "condutor_id": payload.condutorId,
             "data_indicacao": data_indicacao,
             "status": "registrado",
-        }).select("*").single().execute()
+        }).select("*").single().execute)
         return resp.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -395,15 +663,22 @@ async def iniciar_consulta(request: IniciarConsultaRequest):
     print(f"{'='*50}\n")
     
     # Cria registro da consulta e veículos no Supabase
-    db_insert_consulta(consulta_id, request.veiculos)
+    await banco.executar(db_insert_consulta, consulta_id, request.veiculos)
+    eventos.iniciar(consulta_id, [v.placa for v in request.veiculos])
     
-    # Processa em thread separada (necessário para Playwright no Windows)
-    thread = threading.Thread(
-        target=processar_consulta_background,
-        args=(consulta_id, request.veiculos),
-        daemon=True
-    )
-    thread.start()
+    if motor_async is not None:
+        # Motor async: roda no próprio event loop da API
+        tarefa = asyncio.create_task(processar_consulta_async(consulta_id, request.veiculos))
+        _tarefas_consulta.add(tarefa)
+        tarefa.add_done_callback(_tarefas_consulta.discard)
+    else:
+        # Processa em thread separada (necessário para Playwright no Windows)
+        thread = threading.Thread(
+            target=processar_consulta_background,
+            args=(consulta_id, request.veiculos),
+            daemon=True
+        )
+        thread.start()
     
     return {"consulta_id": consulta_id}
 
@@ -416,7 +691,7 @@ async def listar_veiculos_configurados():
 @app.get("/consultas/{consulta_id}/status")
 async def obter_status(consulta_id: str):
     """Retorna o status atual da consulta"""
-    data = db_get_consulta_com_status(consulta_id)
+    data = await banco.executar(db_get_consulta_com_status, consulta_id)
     consulta = data["consulta"]
     veiculos = data["veiculos"]
 
@@ -429,10 +704,49 @@ async def obter_status(consulta_id: str):
         created_at=consulta.get("created_at", "")
     )
 
+@app.get("/consultas/{consulta_id}/events")
+async def eventos_da_consulta(consulta_id: str, request: Request):
+    """Progresso da consulta via Server-Sent Events (sem polling no banco)"""
+    cabecalhos = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    assinatura = eventos.assinar(consulta_id)
+
+    if assinatura is None:
+        # Consulta de outro processo ou já fora da retenção: um snapshot do banco e fim
+        data = await banco.executar(db_get_consulta_com_status, consulta_id)
+        snapshot = snapshot_do_banco(data["consulta"], data["veiculos"])
+
+        async def snapshot_unico():
+            yield formatar_sse("snapshot", snapshot)
+
+        return StreamingResponse(snapshot_unico(), media_type="text/event-stream", headers=cabecalhos)
+
+    snapshot, fila = assinatura
+
+    async def transmitir():
+        try:
+            yield formatar_sse("snapshot", snapshot)
+            if snapshot["status"] in STATUS_FINAIS:
+                return
+            while True:
+                try:
+                    evento, dados = await asyncio.wait_for(fila.get(), timeout=INTERVALO_PING_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                yield formatar_sse(evento, dados)
+                if evento == "status" and dados["status"] in STATUS_FINAIS:
+                    return
+        finally:
+            eventos.cancelar(consulta_id, fila)
+
+    return StreamingResponse(transmitir(), media_type="text/event-stream", headers=cabecalhos)
+
 @app.get("/consultas/{consulta_id}/resultado")
 async def obter_resultado(consulta_id: str):
     """Retorna o resultado completo da consulta"""
-    data = db_get_consulta_com_status(consulta_id)
+    data = await banco.executar(db_get_consulta_com_status, consulta_id)
     consulta = data["consulta"]
 
     if consulta.get("status") != "completed":
@@ -441,7 +755,7 @@ async def obter_resultado(consulta_id: str):
             detail=f"Consulta ainda não foi concluída. Status atual: {consulta.get('status')}"
         )
 
-    multas = db_get_multas(consulta_id)
+    multas = await banco.executar(db_get_multas, consulta_id)
 
     # Pegar data de hoje para PDFs
     data_hoje = datetime.now().strftime("%d-%m-%Y")
@@ -462,20 +776,59 @@ async def obter_resultado(consulta_id: str):
 
 @app.get("/consultas/{consulta_id}/excel")
 async def baixar_excel(consulta_id: str):
-    """Baixa o Excel da consulta"""
-    data = db_get_consulta_com_status(consulta_id)
+    """Baixa o Excel da consulta (gerado a partir das multas no primeiro download)"""
+    data = await banco.executar(db_get_consulta_com_status, consulta_id)
     consulta = data["consulta"]
-    excel_path = consulta.get("excel_path")
 
-    if not excel_path or not os.path.exists(excel_path):
+    if consulta.get("status") != "completed" or not consulta.get("total_multas"):
         raise HTTPException(status_code=404, detail="Excel não encontrado")
 
+    # No pool do banco: a geração (só no primeiro download) lê as multas do Supabase
+    excel_path = await banco.executar(
+        planilhas.obter,
+        consulta_id,
+        versao_conteudo(consulta),
+        lambda: db_get_multas(consulta_id),
+        [v.get("placa") for v in data["veiculos"]],
+    )
+
     return FileResponse(
         excel_path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         filename=f"resultado_detran_{consulta_id}.xlsx"
     )
 
+@app.get("/consultas/{consulta_id}/exportar/{formato}")
+async def exportar_multas(consulta_id: str, formato: str):
+    """Exporta as multas da consulta em CSV, NDJSON ou Parquet, em streaming"""
+    formato = formato.lower()
+    if formato not in exportacao_multas.FORMATOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido: {formato}. Use {', '.join(exportacao_multas.FORMATOS)}",
+        )
+    if formato == "parquet" and not exportacao_multas.parquet_disponivel():
+        raise HTTPException(status_code=501, detail="Exportação Parquet requer o pyarrow (pip install pyarrow)")
+
+    data = await banco.executar(db_get_consulta_com_status, consulta_id)
+    consulta = data["consulta"]
+    if consulta.get("status") != "completed":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Consulta ainda não foi concluída. Status atual: {consulta.get('status')}"
+        )
+
+    # Gerador síncrono: o Starlette o consome numa thread, página a página
+    corpo = exportacao_multas.exportar(
+        formato,
+        lambda depois_de_id, limite: db_get_multas_pagina(consulta_id, depois_de_id, limite),
+    )
+    return StreamingResponse(
+        corpo,
+        media_type=exportacao_multas.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="multas_{consulta_id}.{formato}"'},
+    )
+
 @app.get("/consultas/{consulta_id}/pdf/{filename}")
 async def baixar_pdf(consulta_id: str, filename: str):
     """Baixa um PDF específico"""
@@ -494,29 +847,54 @@ async def baixar_pdf(consulta_id: str, filename: str):
     )
 
 @app.get("/consultas/historico")
-async def listar_historico():
-    """Lista todas as consultas"""
-    try:
-        return db_get_historico()
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def listar_historico(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    desde: Optional[str] = None,
+    ate: Optional[str] = None,
+):
+    """Lista as consultas (mais recentes primeiro, paginado por cursor)"""
+    pagina = await banco.executar(db_get_historico, limite, cursor, status, desde, ate)
+    return _responder_pagina(response, pagina)
 
 @app.get("/health")
 async def health_check():
-    """Health check da API"""
-    try:
-        historico = db_get_historico()
-        total = len(historico)
-    except Exception:
-        total = None
+    """Liveness: só estado em memória, sem acessar o banco (ver /ready)"""
     return {
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
-        "consultas_ativas": total,
+        "consultas_ativas": eventos.ativas(),
+        "banco": banco.estatisticas(),
+        "escrita_lote": escrita.estatisticas(),
+        "cache_leitura": cache_leitura.estatisticas(),
     }
 
+def db_verificar_conexao():
+    """Consulta mínima (uma linha, uma coluna) para a verificação de prontidão."""
+    _supabase_or_http_error()
+    supabase.table("consultas").select("id").limit(1).execute()
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: banco acessível e motor de scraping no ar; 503 se algo falhar"""
+    verificacoes: Dict[str, Any] = {}
+    try:
+        await asyncio.wait_for(banco.executar(db_verificar_conexao), timeout=TIMEOUT_PRONTIDAO_S)
+        verificacoes["banco"] = "ok"
+    except Exception as e:
+        verificacoes["banco"] = f"erro: {e.__class__.__name__}"
+    motor_ativo = motor_async.ativo if motor_async is not None else pool_navegadores.ativo
+    verificacoes["motor"] = "ok" if motor_ativo else "parado"
+
+    pronto = all(v == "ok" for v in verificacoes.values())
+    return JSONResponse(
+        status_code=200 if pronto else 503,
+        content={"status": "ready" if pronto else "not_ready", "verificacoes": verificacoes},
+    )
+
 @app.get("/")
 async def root():
     """Endpoint raiz"""
@@ -524,7 +902,8 @@ async def root():
         "message": "DETRAN-CE API",
         "version": "1.0.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready",
     }
 
 # ================= STARTUP =================
@@ -539,6 +918,21 @@ async def startup_event():
     print(f"🏥 Health Check: http://localhost:8000/health")
     print(f"🌐 Frontend: http://localhost:3000")
     print("="*60 + "\n")
+    if motor_async is not None:
+        await motor_async.iniciar()
+    else:
+        pool_navegadores.iniciar()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if motor_async is not None:
+        await motor_async.encerrar()
+    else:
+        pool_navegadores.encerrar()
+    pipeline_pdf.encerrar()
+    # Status e multas ainda no buffer vão ao banco antes de fechar a sessão
+    escrita.encerrar()
+    banco.encerrar()
 
 # ================= RODAR SERVIDOR =================
 
@@ -0,0 +1,128 @@
+"""
+Acesso ao Supabase sem bloquear o event loop da API.
+
+O cliente do supabase-py (2.x) é síncrono: cada .execute() faz um round
+trip HTTP inteiro na thread que o chama. Dentro de um `async def` isso
+trava o event loop e um SELECT lento segura todas as outras requisições.
+Aqui as chamadas vão para um pool de threads limitado (executar()) e o
+acesso às tabelas usa um cliente PostgREST próprio (conectar()), cuja
+sessão httpx tem pool de conexões keep-alive e HTTP/2 quando o pacote h2
+está instalado. A API só usa tabelas com a chave de serviço, então não
+precisa do cliente completo do supabase-py (auth, storage).
+
+    DETRAN_DB_THREADS     threads do pool de acesso ao banco (padrão: 16)
+    DETRAN_DB_CONEXOES    conexões HTTP mantidas com o Supabase (padrão: threads)
+    DETRAN_DB_TIMEOUT_S   timeout de cada requisição ao PostgREST (padrão: 30)
+"""
+
+import asyncio
+import collections
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+
+try:
+    import h2  # noqa: F401  (habilita http2=True no httpx)
+except ImportError:
+    h2 = None
+
+THREADS_BANCO = max(1, int(os.getenv("DETRAN_DB_THREADS", "16")))
+CONEXOES_BANCO = max(1, int(os.getenv("DETRAN_DB_CONEXOES", str(THREADS_BANCO))))
+TIMEOUT_BANCO_S = float(os.getenv("DETRAN_DB_TIMEOUT_S", "30"))
+
+# Quantas latências recentes entram nos percentis de estatisticas()
+JANELA_LATENCIAS = 2000
+
+
+def log(msg):
+    print(msg)
+
+
+class ClientePostgrest(SyncPostgrestClient):
+    """SyncPostgrestClient com pool de conexões dimensionado e HTTP/2 opcional."""
+
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=CONEXOES_BANCO, max_keepalive_connections=CONEXOES_BANCO),
+            http2=h2 is not None,
+        )
+
+
+class Banco:
+    """Pool de threads limitado para as chamadas síncronas ao Supabase."""
+
+    def __init__(self, threads=THREADS_BANCO):
+        self.threads = threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self._sessoes = []
+        # Latência total (fila do pool + round trip) das últimas chamadas, em ms
+        self._latencias = collections.deque(maxlen=JANELA_LATENCIAS)
+        self.chamadas = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="banco")
+            return self._executor
+
+    def conectar(self, url, chave, schema="public"):
+        """Cliente PostgREST (.table(), .rpc()) do projeto Supabase em `url`."""
+        cliente = ClientePostgrest(
+            f"{url.rstrip('/')}/rest/v1",
+            schema=schema,
+            headers={"apiKey": chave, "Authorization": f"Bearer {chave}"},
+            timeout=httpx.Timeout(TIMEOUT_BANCO_S),
+        )
+        with self._lock:
+            self._sessoes.append(cliente.session)
+        return cliente
+
+    async def executar(self, funcao, *args, **kwargs):
+        """Roda `funcao(*args, **kwargs)` no pool do banco e devolve o resultado."""
+        inicio = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), functools.partial(funcao, *args, **kwargs))
+        finally:
+            self._latencias.append((time.perf_counter() - inicio) * 1000)
+            self.chamadas += 1
+
+    def estatisticas(self):
+        latencias = sorted(self._latencias)
+
+        def percentil(p):
+            if not latencias:
+                return None
+            return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))], 1)
+
+        return {
+            "threads": self.threads,
+            "http2": h2 is not None,
+            "chamadas": self.chamadas,
+            "latencia_p50_ms": percentil(0.50),
+            "latencia_p99_ms": percentil(0.99),
+        }
+
+    def encerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            sessoes, self._sessoes = self._sessoes, []
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for sessao in sessoes:
+            sessao.close()
+
+
+banco = Banco()
@@ -0,0 +1,136 @@
+"""
+Benchmark do extrator de boletos: passada única (extrator_boleto.py) x legado.
+
+O texto das páginas é lido uma vez com o pdfplumber e os dois extratores
+rodam sobre o mesmo texto, então o tempo medido é só o da extração dos
+campos. Também confere se os dois devolvem os mesmos quatro campos.
+
+Uso:
+    python benchmark_extrator.py [pasta_com_pdfs] [--repeticoes N]
+    python benchmark_extrator.py --sintetico 500
+
+Sem pasta, usa boletos/ (o arquivo de boletos baixados); --sintetico gera
+um corpus de textos no layout do boleto quando não há PDFs à mão.
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+import detran_manual
+from extrator_boleto import extrair_campos
+
+
+def textos_dos_pdfs(pasta):
+    """Lista de (nome, paginas) com o texto das 2 primeiras páginas de cada PDF."""
+    import pdfplumber
+
+    corpus = []
+    for raiz, _, arquivos in os.walk(pasta):
+        for arquivo in sorted(arquivos):
+            if not arquivo.lower().endswith(".pdf"):
+                continue
+            caminho = os.path.join(raiz, arquivo)
+            try:
+                with pdfplumber.open(caminho) as pdf:
+                    corpus.append((caminho, [p.extract_text() or "" for p in pdf.pages[:2]]))
+            except Exception as e:
+                print(f"⚠️ Ignorando {caminho}: {e}")
+    return corpus
+
+
+def textos_sinteticos(quantidade, semente=42):
+    """Textos no formato do extrato do DETRAN-CE, com variações de layout."""
+    rnd = random.Random(semente)
+    orgaos = ["DETRAN-CE", "DEMUTRAN FORTALEZA", "DEMUTRAN CAUCAIA"]
+    corpus = []
+    for n in range(quantidade):
+        dia_inf, dia_venc = rnd.randint(1, 28), rnd.randint(1, 28)
+        data_inf = f"{dia_inf:02d}/{rnd.randint(1, 12):02d}/2025"
+        data_venc = f"{dia_venc:02d}/{rnd.randint(1, 12):02d}/2026"
+        codigo = " ".join(
+            f"{rnd.randrange(10 ** 11):011d} {rnd.randint(0, 9)}" for _ in range(4)
+        )
+        orgao = rnd.choice(orgaos)
+        ait = f"{rnd.choice('VFE')}{rnd.randrange(10 ** 9):09d}"
+        linha_multa = f"{orgao} | {ait} | 07455 | TRANSITAR EM VELOCIDADE {data_inf} {data_venc} 130,16 104,13"
+        cabecalho = [
+            "GOVERNO DO ESTADO DO CEARÁ",
+            "DEPARTAMENTO ESTADUAL DE TRÂNSITO",
+            f"EXTRATO DE DÉBITOS - Emitido em {rnd.randint(1, 28):02d}/01/2026",
+            "Placa: ABC1D23 Renavam: 00123456789",
+        ]
+        variante = n % 3
+        if variante == 0:
+            # Layout padrão: linha da multa com órgão e as duas datas
+            pagina = cabecalho + [codigo, "Descrição (Taxa / Multa)", linha_multa, "Total a pagar 104,13"]
+        elif variante == 1:
+            # Sem órgão na linha: cai no cabeçalho das datas
+            pagina = cabecalho + [
+                codigo, "Descrição (Taxa / Multa)", "TRANSITAR EM VELOCIDADE SUPERIOR",
+                "Data Infração Vencimento Valor", f"{ait} {data_inf} {data_venc} 130,16",
+                f"Órgão: {orgao}",
+            ]
+        else:
+            # Datas soltas: só a ordenação resolve
+            pagina = cabecalho + [
+                "Descrição (Taxa / Multa)", "", "ESTACIONAR EM LOCAL PROIBIDO",
+                f"Infração em {data_inf}", f"Pagar até {data_venc}", "Base legal 23/09/1997",
+            ]
+        corpus.append((f"sintetico_{n}", ["\n".join(pagina), "Página 2\nInstruções de pagamento"]))
+    return corpus
+
+
+def cronometrar(funcao, corpus, repeticoes):
+    resultados = None
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultados = [funcao(paginas) for _, paginas in corpus]
+    return (time.perf_counter() - inicio) / repeticoes, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o extrator de passada única com o legado")
+    parser.add_argument("pasta", nargs="?", default="boletos", help="pasta com PDFs (busca recursiva)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--sintetico", type=int, default=0, help="usa N textos gerados em vez de PDFs")
+    args = parser.parse_args()
+
+    if args.sintetico:
+        corpus = textos_sinteticos(args.sintetico)
+    elif os.path.isdir(args.pasta):
+        corpus = textos_dos_pdfs(args.pasta)
+    else:
+        corpus = []
+    if not corpus:
+        print(f"❌ Nenhum PDF em {args.pasta} (use --sintetico N)")
+        sys.exit(1)
+
+    repeticoes = max(1, args.repeticoes)
+    print(f"📄 Corpus: {len(corpus)} documento(s), {repeticoes} repetição(ões)")
+
+    # O legado imprime dezenas de linhas por PDF; o custo de formatar entra na
+    # medição, o do terminal não
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        tempo_legado, legado = cronometrar(detran_manual._extrair_campos_legado, corpus, repeticoes)
+    tempo_novo, novo = cronometrar(extrair_campos, corpus, repeticoes)
+
+    divergencias = [(nome, a, b) for (nome, _), a, b in zip(corpus, legado, novo) if tuple(a) != tuple(b)]
+
+    print(f"🐢 Legado:        {tempo_legado * 1000:8.1f} ms  ({tempo_legado / len(corpus) * 1e6:7.1f} µs/doc)")
+    print(f"⚡ Passada única: {tempo_novo * 1000:8.1f} ms  ({tempo_novo / len(corpus) * 1e6:7.1f} µs/doc)")
+    print(f"🚀 Speedup: {tempo_legado / max(tempo_novo, 1e-12):.1f}x")
+
+    if divergencias:
+        print(f"❌ {len(divergencias)} documento(s) com resultado diferente:")
+        for nome, a, b in divergencias[:10]:
+            print(f"   {nome}\n      legado: {a}\n      novo:   {b}")
+        sys.exit(1)
+    print("✅ Mesmos campos em todos os documentos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Perfil de bloqueio de recursos para os contextos de scraping.
+
+O fluxo só precisa do documento, dos scripts/estilos do próprio SPA, das
+chamadas XHR/fetch e do PDF do boleto. Imagens, fontes, mídia e scripts de
+analytics/terceiros são abortados via context.route, o que reduz latência
+de carregamento e banda por veículo.
+
+Perfis (DETRAN_BLOQUEIO):
+    off        - nada é bloqueado
+    padrao     - bloqueia imagem, mídia, fonte e hosts de analytics/anúncios
+    agressivo  - allowlist: só o que é do DETRAN (documento, script, estilo,
+                 XHR/fetch) e PDFs; todo o resto é bloqueado
+
+Por que o padrão é a lista de bloqueio e não a allowlist: a allowlist
+aborta tudo o que não reconhece, inclusive scripts e XHRs de outros hosts
+que o SPA da central venha a carregar (CDN, captcha, um novo subdomínio).
+Quando isso acontece a página não quebra com erro; o fluxo simplesmente
+para de achar a tabela ou o botão do boleto, e o veículo volta "sem
+multas". A lista de bloqueio só corta tipos que o fluxo comprovadamente
+não usa (imagem, mídia, fonte) e rastreadores conhecidos, então uma
+mudança no site não vira perda silenciosa de dados. O perfil agressivo
+fica disponível para quem validou a lista de hosts
+(DETRAN_HOSTS_PERMITIDOS) contra o site atual.
+
+DETRAN_HOSTS_PERMITIDOS acrescenta hosts (separados por vírgula) tratados
+como "do DETRAN".
+
+A "economia" de banda reportada é uma estimativa grosseira: requisição
+abortada não tem resposta, então o valor é só a contagem de bloqueadas
+vezes um tamanho típico por tipo (TAMANHO_ESTIMADO), não bytes medidos.
+"""
+
+import os
+import re
+from collections import Counter
+from urllib.parse import urlparse
+
+PERFIL_BLOQUEIO = os.getenv("DETRAN_BLOQUEIO", "padrao").lower()
+
+HOSTS_PERMITIDOS = ["detran.ce.gov.br"] + [
+    h.strip().lower() for h in os.getenv("DETRAN_HOSTS_PERMITIDOS", "").split(",") if h.strip()
+]
+
+TIPOS_PESADOS = {"image", "media", "font"}
+TIPOS_ESSENCIAIS = {"document", "script", "stylesheet", "xhr", "fetch"}
+
+REGEX_PDF = re.compile(r"\.pdf(\?|$)|gerar_boleto|boleto|extrato", re.I)
+REGEX_RASTREADORES = re.compile(
+    r"google-analytics|googletagmanager|doubleclick|googlesyndication|facebook\.(net|com)|"
+    r"hotjar|clarity\.ms|newrelic|nr-data|sentry|matomo|piwik",
+    re.I,
+)
+
+# Tamanho típico por tipo de recurso (bytes). Requisição abortada não tem
+# resposta, então a economia de banda é uma estimativa a partir destes valores.
+TAMANHO_ESTIMADO = {
+    "image": 30_000,
+    "media": 250_000,
+    "font": 40_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+    "other": 5_000,
+}
+
+
+def log(msg):
+    print(msg)
+
+
+def _host_permitido(url):
+    host = (urlparse(url).hostname or "").lower()
+    return any(host == h or host.endswith("." + h) for h in HOSTS_PERMITIDOS)
+
+
+def deve_bloquear(url, tipo, perfil=PERFIL_BLOQUEIO):
+    """Decide se a requisição (url, resource_type) é abortada no perfil dado."""
+    if perfil == "off":
+        return False
+    if REGEX_PDF.search(url):
+        return False
+    if perfil == "agressivo":
+        return not (tipo in TIPOS_ESSENCIAIS and _host_permitido(url))
+    # padrao
+    return tipo in TIPOS_PESADOS or bool(REGEX_RASTREADORES.search(url))
+
+
+class EstatisticasBloqueio:
+    """Requisições e bytes de um contexto (um veículo)."""
+
+    def __init__(self, perfil=PERFIL_BLOQUEIO):
+        self.perfil = perfil
+        self.bloqueadas = Counter()
+        self.permitidas = 0
+        self.bytes_recebidos = 0
+
+    def registrar(self, tipo, bloqueada):
+        if bloqueada:
+            self.bloqueadas[tipo] += 1
+        else:
+            self.permitidas += 1
+
+    def _ao_responder(self, response):
+        try:
+            self.bytes_recebidos += int(response.headers.get("content-length") or 0)
+        except (TypeError, ValueError):
+            pass
+
+    @property
+    def total_bloqueadas(self):
+        return sum(self.bloqueadas.values())
+
+    @property
+    def bytes_economizados_estimados(self):
+        """Estimativa grosseira: bloqueadas por tipo x TAMANHO_ESTIMADO (não é medição)."""
+        return sum(TAMANHO_ESTIMADO.get(tipo, TAMANHO_ESTIMADO["other"]) * qtd
+                   for tipo, qtd in self.bloqueadas.items())
+
+    def resumo(self):
+        return {
+            "perfil": self.perfil,
+            "requisicoes_bloqueadas": self.total_bloqueadas,
+            "bloqueadas_por_tipo": dict(self.bloqueadas),
+            "requisicoes_permitidas": self.permitidas,
+            "bytes_recebidos": self.bytes_recebidos,
+            "bytes_economizados_estimados": self.bytes_economizados_estimados,
+        }
+
+    def log_resumo(self):
+        if self.perfil == "off":
+            return
+        tipos = ", ".join(f"{t}={q}" for t, q in self.bloqueadas.most_common()) or "nenhuma"
+        log(f"🚫 Bloqueio '{self.perfil}': {self.total_bloqueadas} requisições bloqueadas ({tipos}); "
+            f"economia estimada (grosseira, por tamanho típico do tipo) ~{self.bytes_economizados_estimados / 1024:.0f} KB; "
+            f"{self.permitidas} permitidas, {self.bytes_recebidos / 1024:.0f} KB recebidos (medido)")
+
+
+def aplicar_bloqueio(context, perfil=PERFIL_BLOQUEIO):
+    """Instala o roteamento de bloqueio no contexto (API síncrona)."""
+    estatisticas = EstatisticasBloqueio(perfil)
+    if perfil == "off":
+        return estatisticas
+
+    def rotear(route, request):
+        bloquear = deve_bloquear(request.url, request.resource_type, perfil)
+        estatisticas.registrar(request.resource_type, bloquear)
+        if bloquear:
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    context.route("**/*", rotear)
+    context.on("response", estatisticas._ao_responder)
+    return estatisticas
+
+
+async def aplicar_bloqueio_async(context, perfil=PERFIL_BLOQUEIO):
+    """Versão para playwright.async_api."""
+    estatisticas = EstatisticasBloqueio(perfil)
+    if perfil == "off":
+        return estatisticas
+
+    async def rotear(route, request):
+        bloquear = deve_bloquear(request.url, request.resource_type, perfil)
+        estatisticas.registrar(request.resource_type, bloquear)
+        if bloquear:
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    await context.route("**/*", rotear)
+    context.on("response", estatisticas._ao_responder)
+    return estatisticas
@@ -0,0 +1,246 @@
+"""
+Pool de navegadores Chromium "quentes" compartilhado pelo processo.
+
+A API síncrona do Playwright fica presa à thread que a criou, então cada
+slot do pool é uma thread dona de um sync_playwright + navegador. Os jobs
+(ex.: processar_veiculo) entram numa fila única e o primeiro slot livre
+executa `fn(browser, *args)`; cada veículo continua abrindo o próprio
+contexto isolado.
+
+Antes de cada job o slot verifica se o navegador ainda está conectado e o
+recicla (fecha e abre outro) depois de MAX_VEICULOS veículos ou quando a
+memória da árvore de processos do navegador passa de MAX_MEMORIA_MB.
+"""
+
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from playwright.sync_api import sync_playwright
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ================= CONFIGURAÇÕES =================
+
+TAMANHO_POOL = max(1, int(os.getenv("DETRAN_POOL_NAVEGADORES", os.getenv("DETRAN_WORKERS", "3"))))
+MAX_VEICULOS_POR_NAVEGADOR = max(1, int(os.getenv("DETRAN_POOL_MAX_VEICULOS", "50")))
+MAX_MEMORIA_MB = float(os.getenv("DETRAN_POOL_MAX_MEMORIA_MB", "1500"))
+HEADLESS = os.getenv("DETRAN_HEADLESS", "0").lower() in ("1", "true", "sim")
+
+_ENCERRAR = object()
+
+# Serializa o start() dos drivers: o processo novo de cada slot é achado
+# pela diferença entre os filhos deste processo antes e depois
+_TRAVA_DRIVER = threading.Lock()
+
+
+def log(msg):
+    print(msg)
+
+
+def _pids_drivers():
+    """PIDs dos drivers do Playwright ("node ... run-driver") filhos deste processo."""
+    pids = set()
+    for filho in psutil.Process().children():
+        try:
+            if "run-driver" in filho.cmdline():
+                pids.add(filho.pid)
+        except psutil.Error:
+            pass
+    return pids
+
+
+class _SlotNavegador:
+    """Thread dona de um navegador; consome jobs da fila do pool."""
+
+    def __init__(self, pool: "BrowserPool", numero: int):
+        self.pool = pool
+        self.numero = numero
+        self.playwright = None
+        self.pid_driver = None
+        self.browser = None
+        self.veiculos = 0
+        self.reciclagens = 0
+        self.ocupado = False
+        self.thread = threading.Thread(target=self._loop, name=f"browser-pool-{numero}", daemon=True)
+
+    # ---------- ciclo de vida do navegador ----------
+
+    def _abrir(self):
+        if self.playwright is None:
+            self._iniciar_playwright()
+        self.browser = self.playwright.chromium.launch(headless=self.pool.headless)
+        self.veiculos = 0
+        log(f"🌐 Pool: navegador {self.numero} iniciado")
+
+    def _iniciar_playwright(self):
+        if psutil is None:
+            self.playwright = sync_playwright().start()
+            return
+        with _TRAVA_DRIVER:
+            antes = _pids_drivers()
+            self.playwright = sync_playwright().start()
+            novos = _pids_drivers() - antes
+        if len(novos) == 1:
+            self.pid_driver = novos.pop()
+        else:
+            log(f"⚠️ Pool: processo do driver do navegador {self.numero} não identificado; "
+                f"limite de memória (DETRAN_POOL_MAX_MEMORIA_MB) desligado neste slot")
+
+    def _fechar(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+
+    def _reciclar(self, motivo: str):
+        log(f"♻️ Pool: reciclando navegador {self.numero} ({motivo})")
+        self._fechar()
+        self.reciclagens += 1
+        self._abrir()
+
+    def memoria_mb(self) -> Optional[float]:
+        """RSS (MB) do driver do Playwright e dos processos do Chromium deste slot.
+
+        Retorna None quando não é possível medir (psutil ausente ou processo
+        do driver não identificado, avisado no log ao iniciar).
+        """
+        if self.pid_driver is None:
+            return None
+        try:
+            raiz = psutil.Process(self.pid_driver)
+            processos = [raiz] + raiz.children(recursive=True)
+            total = 0
+            for proc in processos:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except Exception:
+            return None
+
+    def _garantir_saudavel(self):
+        if self.browser is None:
+            self._abrir()
+            return
+        if not self.browser.is_connected():
+            self._reciclar("desconectado")
+            return
+        if self.veiculos >= self.pool.max_veiculos:
+            self._reciclar(f"{self.veiculos} veículos")
+            return
+        memoria = self.memoria_mb()
+        if memoria is not None and memoria > self.pool.max_memoria_mb:
+            self._reciclar(f"{memoria:.0f} MB")
+
+    # ---------- loop ----------
+
+    def _loop(self):
+        while True:
+            job = self.pool._fila.get()
+            if job is _ENCERRAR:
+                break
+            fn, args, kwargs, futuro = job
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            self.ocupado = True
+            try:
+                self._garantir_saudavel()
+                resultado = fn(self.browser, *args, **kwargs)
+                futuro.set_result(resultado)
+            except BaseException as e:
+                futuro.set_exception(e)
+                print(f"❌ Pool: erro no navegador {self.numero}:")
+                print(traceback.format_exc())
+            finally:
+                self.veiculos += 1
+                self.ocupado = False
+
+        self._fechar()
+        if self.playwright is not None:
+            try:
+                self.playwright.stop()
+            except Exception:
+                pass
+            self.playwright = None
+
+
+class BrowserPool:
+    """Pool de navegadores iniciado uma vez (startup) e reutilizado pelas consultas."""
+
+    def __init__(self, tamanho: int = TAMANHO_POOL, headless: bool = HEADLESS,
+                 max_veiculos: int = MAX_VEICULOS_POR_NAVEGADOR, max_memoria_mb: float = MAX_MEMORIA_MB):
+        self.tamanho = tamanho
+        self.headless = headless
+        self.max_veiculos = max_veiculos
+        self.max_memoria_mb = max_memoria_mb
+        self._fila: "queue.Queue" = queue.Queue()
+        self._slots: List[_SlotNavegador] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self._slots)
+
+    def iniciar(self):
+        with self._lock:
+            if self._slots:
+                return
+            self._slots = [_SlotNavegador(self, n) for n in range(1, self.tamanho + 1)]
+            for slot in self._slots:
+                slot.thread.start()
+            log(f"🌐 Pool de navegadores iniciado com {self.tamanho} slot(s)")
+            if psutil is None:
+                log("⚠️ Pool: psutil não instalado; limite de memória (DETRAN_POOL_MAX_MEMORIA_MB) desligado")
+
+    def encerrar(self):
+        with self._lock:
+            slots, self._slots = self._slots, []
+            for _ in slots:
+                self._fila.put(_ENCERRAR)
+        for slot in slots:
+            slot.thread.join(timeout=30)
+        if slots:
+            log("🌐 Pool de navegadores encerrado")
+
+    def submeter(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Enfileira `fn(browser, *args, **kwargs)` para o primeiro navegador livre."""
+        if not self._slots:
+            self.iniciar()
+        futuro: Future = Future()
+        self._fila.put((fn, args, kwargs, futuro))
+        return futuro
+
+    def executar(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Versão bloqueante de submeter()."""
+        return self.submeter(fn, *args, **kwargs).result()
+
+    def status(self) -> dict:
+        return {
+            "tamanho": self.tamanho,
+            "fila": self._fila.qsize(),
+            "navegadores": [
+                {
+                    "slot": s.numero,
+                    "ocupado": s.ocupado,
+                    "conectado": bool(s.browser and s.browser.is_connected()),
+                    "veiculos": s.veiculos,
+                    "reciclagens": s.reciclagens,
+                    "memoria_mb": s.memoria_mb(),
+                }
+                for s in self._slots
+            ],
+        }
+
+
+# Instância única do processo
+pool = BrowserPool()
@@ -0,0 +1,80 @@
+"""
+Cache em memória das leituras de consulta (status e multas) da API.
+
+LRU com TTL: entradas de consultas encerradas não expiram (o conteúdo não
+muda mais) e só saem por LRU; as de consultas em andamento expiram em
+DETRAN_CACHE_LEITURA_TTL_S e são invalidadas quando o worker grava algo
+daquela consulta no banco (invalidar). Um valor lido do banco só é
+guardado se nenhuma invalidação aconteceu durante a leitura, então o cache
+nunca volta a servir um estado anterior a uma escrita já feita.
+
+    DETRAN_CACHE_LEITURA_MAX    entradas no cache (padrão: 256)
+    DETRAN_CACHE_LEITURA_TTL_S  validade das entradas de consultas em andamento (padrão: 2)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRADAS = max(1, int(os.getenv("DETRAN_CACHE_LEITURA_MAX", "256")))
+TTL_S = float(os.getenv("DETRAN_CACHE_LEITURA_TTL_S", "2"))
+
+
+class CacheLeitura:
+    """LRU/TTL por (tipo, consulta_id), com invalidação por consulta."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS, ttl_s=TTL_S):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # (tipo, consulta_id) -> (valor, expira_em ou None)
+        self._geracao = 0               # incrementada a cada invalidação
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+
+    def obter(self, tipo, consulta_id, carregar, imutavel=lambda valor: False):
+        """Valor em cache ou `carregar()`; `imutavel(valor)` decide se a entrada expira."""
+        chave = (tipo, consulta_id)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                valor, expira_em = entrada
+                if expira_em is None or expira_em > time.monotonic():
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._entradas[chave]
+            self.faltas += 1
+            geracao = self._geracao
+
+        valor = carregar()
+
+        with self._lock:
+            if self._geracao == geracao:
+                expira_em = None if imutavel(valor) else time.monotonic() + self.ttl_s
+                self._entradas[chave] = (valor, expira_em)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return valor
+
+    def invalidar(self, consulta_id):
+        """Descarta o que está em cache da consulta (chamado depois de cada escrita)."""
+        with self._lock:
+            self._geracao += 1
+            for chave in [c for c in self._entradas if c[1] == consulta_id]:
+                del self._entradas[chave]
+            self.invalidacoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "entradas": len(self._entradas),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": round(self.acertos / total, 3) if total else None,
+                "invalidacoes": self.invalidacoes,
+            }
@@ -0,0 +1,156 @@
+"""
+Cache persistente (SQLite) dos dados extraídos dos boletos.
+
+A chave é o SHA-256 dos bytes do PDF mais a versão do extrator, então o
+mesmo boleto nunca é parseado duas vezes (reprocessamento, diagnostico.py,
+reconsulta do veículo) e qualquer mudança no extrator invalida tudo sozinha.
+O arquivo é limitado por número de entradas: ao passar do teto (checado a
+cada LOTE_DESPEJO gravações), as menos usadas recentemente são removidas.
+
+DETRAN_CACHE_PDF      caminho do arquivo SQLite ("off" desliga o cache)
+DETRAN_CACHE_PDF_MAX  máximo de entradas mantidas
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CAMINHO_CACHE = os.getenv("DETRAN_CACHE_PDF", "cache_pdf.sqlite3")
+MAX_ENTRADAS = max(1, int(os.getenv("DETRAN_CACHE_PDF_MAX", "50000")))
+LOTE_DESPEJO = 64
+
+
+def log(msg):
+    print(msg)
+
+
+def chave_pdf(conteudo, versao):
+    """SHA-256 dos bytes do PDF + versão do extrator."""
+    return f"{hashlib.sha256(conteudo).hexdigest()}:{versao}"
+
+
+class CachePDF:
+    """Tabela chave -> resultado da extração (JSON), com contadores de acerto/erro e despejo LRU.
+
+    Os contadores ficam no próprio arquivo, então somam o que os processos
+    do pool de parsing fizeram.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE, max_entradas=MAX_ENTRADAS):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._conexao = None
+        self._gravacoes = 0
+
+    def _conectar(self):
+        if self._conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS extracoes (
+                    chave TEXT PRIMARY KEY,
+                    dados TEXT NOT NULL,
+                    acessado_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_extracoes_acesso ON extracoes (acessado_em);
+                CREATE TABLE IF NOT EXISTS contadores (
+                    nome TEXT PRIMARY KEY,
+                    valor INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO contadores VALUES ('acertos', 0), ('faltas', 0), ('despejos', 0);
+            """)
+            self._conexao = conexao
+        return self._conexao
+
+    def _contar(self, conexao, nome, quantidade=1):
+        conexao.execute("UPDATE contadores SET valor = valor + ? WHERE nome = ?", (quantidade, nome))
+
+    def obter(self, chave):
+        """Resultado gravado para a chave (já decodificado do JSON) ou None."""
+        with self._lock:
+            conexao = self._conectar()
+            with conexao:
+                linha = conexao.execute("SELECT dados FROM extracoes WHERE chave = ?", (chave,)).fetchone()
+                if linha is None:
+                    self._contar(conexao, "faltas")
+                    return None
+                conexao.execute("UPDATE extracoes SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+                self._contar(conexao, "acertos")
+        return json.loads(linha[0])
+
+    def gravar(self, chave, dados):
+        with self._lock:
+            conexao = self._conectar()
+            with conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO extracoes (chave, dados, acessado_em) VALUES (?, ?, ?)",
+                    (chave, json.dumps(dados, ensure_ascii=False), time.time()),
+                )
+                self._gravacoes += 1
+                if self._gravacoes % LOTE_DESPEJO != 1:
+                    return
+                despejadas = conexao.execute(
+                    "DELETE FROM extracoes WHERE chave IN ("
+                    "SELECT chave FROM extracoes ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,),
+                ).rowcount
+                if despejadas > 0:
+                    self._contar(conexao, "despejos", despejadas)
+
+    def estatisticas(self):
+        with self._lock:
+            conexao = self._conectar()
+            contadores = dict(conexao.execute("SELECT nome, valor FROM contadores").fetchall())
+            entradas = conexao.execute("SELECT COUNT(*) FROM extracoes").fetchone()[0]
+        consultas = contadores["acertos"] + contadores["faltas"]
+        return {
+            "entradas": entradas,
+            "max_entradas": self.max_entradas,
+            "acertos": contadores["acertos"],
+            "faltas": contadores["faltas"],
+            "despejos": contadores["despejos"],
+            "taxa_acerto": round(contadores["acertos"] / consultas, 3) if consultas else 0.0,
+        }
+
+    def limpar(self):
+        with self._lock:
+            conexao = self._conectar()
+            with conexao:
+                conexao.execute("DELETE FROM extracoes")
+                conexao.execute("UPDATE contadores SET valor = 0")
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def cache_padrao():
+    """Cache do processo atual (None se DETRAN_CACHE_PDF=off ou o arquivo não abre).
+
+    Cada processo (inclusive os workers de parsing) abre sua própria conexão.
+    """
+    global _cache, _cache_pid
+    if CAMINHO_CACHE.lower() in ("", "off", "0"):
+        return None
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            cache = CachePDF()
+            try:
+                cache._conectar()
+            except sqlite3.Error as e:
+                log(f"⚠️ Cache de PDFs indisponível ({CAMINHO_CACHE}): {e}")
+                return None
+            _cache, _cache_pid = cache, os.getpid()
+        return _cache
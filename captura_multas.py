@@ -0,0 +1,248 @@
+"""
+Captura da resposta de rede que alimenta a tabela de multas do DETRAN.
+
+A tela de multas é um SPA: a tabela é montada a partir de uma resposta JSON
+do backend. Em vez de ler a tabela linha a linha (uma ida ao navegador por
+linha), escutamos as respostas XHR/fetch da página e montamos os registros
+da planilha direto do payload estruturado. Cada multa do payload é casada
+com a sua linha da tabela pelo AIT (a ordem do JSON não precisa ser a da
+tela, que o SPA pode reordenar); os checkboxes marcados são os dessas
+linhas. Se nenhuma resposta reconhecível aparecer, ou se alguma multa não
+casar com exatamente uma linha, o fluxo volta para a leitura do DOM
+(processar_multas).
+
+DETRAN_CAPTURA_MULTAS=dom desliga a captura; DETRAN_URL_MULTAS ajusta o
+padrão (regex) das URLs candidatas.
+"""
+
+import os
+import re
+
+from formatacao import formatar_valor_br
+
+MODO_CAPTURA = os.getenv("DETRAN_CAPTURA_MULTAS", "rede").lower()
+REGEX_URL_MULTAS = re.compile(os.getenv("DETRAN_URL_MULTAS", r"multa|infra|debito|autua|taxa"), re.I)
+
+# Chaves (normalizadas: minúsculas, só letras/números) aceitas para cada campo,
+# em ordem de preferência
+CHAVES_AIT = ("ait", "numeroait", "numait", "numeroauto", "autoinfracao", "numeroautoinfracao", "auto")
+CHAVES_AIT_ORIGINARIA = ("aitoriginaria", "numeroaitoriginaria", "autooriginario", "originaria")
+CHAVES_MOTIVO = ("descricaoinfracao", "descricao", "motivo", "infracao", "descricaomulta", "desc")
+CHAVES_DATA_INFRACAO = ("datainfracao", "dtinfracao", "datahorainfracao", "datacometimento", "datadainfracao")
+CHAVES_VENCIMENTO = ("datavencimento", "dtvencimento", "vencimento", "datalimite")
+CHAVES_VALOR = ("valororiginal", "valormulta", "valor", "valorinfracao")
+CHAVES_VALOR_A_PAGAR = ("valorapagar", "valorpagar", "valoratualizado", "valorcomdesconto", "valortotal", "valordesconto")
+
+REGEX_DATA_BR = re.compile(r"\d{2}/\d{2}/\d{4}")
+REGEX_DATA_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+REGEX_PALAVRA = re.compile(r"[0-9A-Z]+")
+
+
+def log(msg):
+    print(msg)
+
+
+def _normalizar_chave(chave):
+    return re.sub(r"[^0-9a-z]", "", str(chave).lower())
+
+
+def _campo(item, chaves):
+    """Primeiro valor não vazio de `item` cuja chave normalizada está em `chaves`."""
+    normalizado = {_normalizar_chave(k): v for k, v in item.items()}
+    for chave in chaves:
+        valor = normalizado.get(chave)
+        if valor not in (None, "", []):
+            return valor
+    return None
+
+
+def _parece_multa(item):
+    if not isinstance(item, dict):
+        return False
+    return _campo(item, CHAVES_AIT) is not None and (
+        _campo(item, CHAVES_VALOR_A_PAGAR) is not None or _campo(item, CHAVES_VALOR) is not None
+    )
+
+
+def encontrar_lista_multas(payload):
+    """Procura no JSON a maior lista de objetos com cara de multa (AIT + valor)."""
+    melhor = None
+    pilha = [payload]
+    while pilha:
+        atual = pilha.pop()
+        if isinstance(atual, list):
+            if atual and all(isinstance(x, dict) for x in atual) and sum(map(_parece_multa, atual)) >= max(1, len(atual) // 2):
+                if melhor is None or len(atual) > len(melhor):
+                    melhor = atual
+            pilha.extend(x for x in atual if isinstance(x, (list, dict)))
+        elif isinstance(atual, dict):
+            pilha.extend(v for v in atual.values() if isinstance(v, (list, dict)))
+    return melhor
+
+
+def _data_br(valor):
+    if valor is None:
+        return "-"
+    texto = str(valor)
+    match = REGEX_DATA_BR.search(texto)
+    if match:
+        return match.group(0)
+    match = REGEX_DATA_ISO.search(texto)
+    if match:
+        ano, mes, dia = match.groups()
+        return f"{dia}/{mes}/{ano}"
+    return "-"
+
+
+def _valor_float(valor):
+    if valor is None:
+        return 0.0
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = re.sub(r"[^\d,.-]", "", str(valor))
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return float(texto)
+    except ValueError:
+        return 0.0
+
+
+def _valor_br(valor):
+    if valor is None:
+        return "-"
+    return f"R$ {formatar_valor_br(_valor_float(valor))}"
+
+
+def multas_do_payload(itens, placa):
+    """Monta (multas_lista, total, indices_validos) a partir da lista do payload.
+
+    Só entram multas com valor a pagar > 0, como na leitura do DOM; os
+    índices são as posições na lista, que seguem a ordem das linhas da tabela.
+    """
+    multas = []
+    indices = []
+    total = 0.0
+
+    for i, item in enumerate(itens):
+        bruto_pagar = _campo(item, CHAVES_VALOR_A_PAGAR)
+        bruto_valor = _campo(item, CHAVES_VALOR)
+        if bruto_pagar is None:
+            bruto_pagar = bruto_valor
+        if bruto_valor is None:
+            bruto_valor = bruto_pagar
+
+        valor_pagar = _valor_float(bruto_pagar)
+        if valor_pagar <= 0:
+            continue
+
+        indices.append(i)
+        total += valor_pagar
+        motivo = _campo(item, CHAVES_MOTIVO)
+        multas.append({
+            "Placa": placa,
+            "#": len(multas) + 1,
+            "AIT": str(_campo(item, CHAVES_AIT) or "-").strip(),
+            "AIT Originária": str(_campo(item, CHAVES_AIT_ORIGINARIA) or "-").strip(),
+            "Motivo": re.sub(r"\s+", " ", str(motivo)).strip() if motivo else "-",
+            "Data Infração": _data_br(_campo(item, CHAVES_DATA_INFRACAO)),
+            "Data Vencimento": _data_br(_campo(item, CHAVES_VENCIMENTO)),
+            "Valor": _valor_br(bruto_valor),
+            "Valor a Pagar": _valor_br(bruto_pagar),
+            "Órgão Autuador": "-",
+            "Código de pagamento em barra": "-",
+        })
+
+    return multas, total, indices
+
+
+def casar_com_linhas(multas, textos_linhas):
+    """Reordena as multas pela tabela: (multas, indices das linhas) ou None.
+
+    Cada multa precisa ter o AIT em exatamente uma linha ainda não usada;
+    qualquer divergência devolve None (o chamador volta para o DOM).
+    """
+    palavras = [set(REGEX_PALAVRA.findall(str(texto).upper())) for texto in textos_linhas]
+    usadas = set()
+    por_linha = []
+    for multa in multas:
+        ait = re.sub(r"[^0-9A-Z]", "", multa["AIT"].upper())
+        linhas = [i for i, p in enumerate(palavras) if ait and ait in p and i not in usadas]
+        if len(linhas) != 1:
+            log(f"⚠️ Captura de rede: AIT {multa['AIT']} casa com {len(linhas)} linha(s) da tabela")
+            return None
+        usadas.add(linhas[0])
+        por_linha.append((linhas[0], multa))
+
+    por_linha.sort(key=lambda par: par[0])
+    for numero, (_, multa) in enumerate(por_linha, 1):
+        multa["#"] = numero
+    return [multa for _, multa in por_linha], [i for i, _ in por_linha]
+
+
+class CapturaMultas:
+    """Escuta as respostas JSON da página e guarda as candidatas à listagem de multas.
+
+    O handler só guarda a referência da resposta; o corpo é lido depois
+    (multas() / multas_async()), quando a tabela já apareceu.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.respostas = []
+        self.ativa = MODO_CAPTURA != "dom"
+        if self.ativa:
+            page.on("response", self._ao_receber)
+
+    def _ao_receber(self, response):
+        try:
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return
+            if "json" not in (response.headers.get("content-type") or ""):
+                return
+            if not REGEX_URL_MULTAS.search(response.url):
+                return
+            self.respostas.append(response)
+        except Exception:
+            pass
+
+    def _escolher(self, payloads, placa, textos_linhas):
+        # A resposta mais recente que bate com a tabela vence
+        for url, payload in reversed(payloads):
+            itens = encontrar_lista_multas(payload)
+            if not itens:
+                continue
+            if len(itens) != len(textos_linhas):
+                log(f"⚠️ Captura de rede: {len(itens)} itens em {url}, tabela tem {len(textos_linhas)} linhas")
+                continue
+            multas, total, _ = multas_do_payload(itens, placa)
+            casadas = casar_com_linhas(multas, textos_linhas)
+            if casadas is None:
+                continue
+            log(f"📡 Multas lidas da resposta de rede: {url}")
+            multas, indices = casadas
+            return multas, total, indices
+        return None
+
+    def multas(self, placa, textos_linhas):
+        """(multas_lista, total, indices das linhas da tabela) do payload, ou None para cair no DOM."""
+        if not self.ativa:
+            return None
+        payloads = []
+        for response in self.respostas:
+            try:
+                payloads.append((response.url, response.json()))
+            except Exception:
+                continue
+        return self._escolher(payloads, placa, textos_linhas)
+
+    async def multas_async(self, placa, textos_linhas):
+        if not self.ativa:
+            return None
+        payloads = []
+        for response in self.respostas:
+            try:
+                payloads.append((response.url, await response.json()))
+            except Exception:
+                continue
+        return self._escolher(payloads, placa, textos_linhas)
@@ -0,0 +1,503 @@
+"""
+Versão asyncio do fluxo de consulta do detran_manual.py.
+
+Mesmas etapas (formulário, tabela de multas, opções de pagamento e boleto),
+mas com playwright.async_api: um único event loop dirige várias páginas ao
+mesmo tempo, sem uma thread do sistema por veículo. O parsing (linhas da
+tabela e PDF) reaproveita as funções puras do detran_manual.py; a extração
+do PDF, que usa CPU, roda em thread para não travar o loop.
+
+Observação (Windows): o loop precisa ser um ProactorEventLoop para que o
+Playwright consiga abrir o processo do driver.
+"""
+
+import asyncio
+import os
+import re
+import time
+
+from playwright.async_api import async_playwright, TimeoutError, expect
+
+from detran_manual import (
+    URL,
+    TIMEOUT_MULTAS,
+    TIMEOUT_TABELA,
+    DELAY_SCROLL,
+    DELAY_CHECKBOX,
+    DELAY_DIGITACAO,
+    TETO_OPCOES_PAGAMENTO,
+    TETO_PIX,
+    TETO_DOWNLOAD_BOLETO,
+    TETO_BOLETO_DIRETO,
+    REGEX_URL_BOLETO,
+    JS_HREF_BOLETO,
+    SELETOR_CAMPO_PLACA,
+    SELETOR_CAMPO_RENAVAM,
+    JS_CAMPO_PREENCHIDO,
+    SELETORES_PIX,
+    SELETOR_CODIGO_PIX,
+    REGEX_BOTAO_CONSULTAR,
+    REGEX_BOTAO_FECHAR,
+    REGEX_CLIQUE_AQUI,
+    SELETORES_COPIAR_PIX,
+    SELETORES_BAIXAR_BOLETO,
+    log,
+    formatar_valor_br,
+    extrair_pendencias,
+    selecionar_linhas_validas,
+    JS_TEXTOS_LINHAS,
+    JS_MARCAR_CHECKBOXES,
+    extrair_boleto_do_pdf,
+    montar_multa,
+    aplicar_dados_boleto,
+    preparar_pasta_boletos,
+    normalizar_campo,
+    nome_arquivo_pdf,
+    arquivar_pdf,
+)
+from esperas import MedidorEsperas, esperar_async, medir_async
+from captura_multas import CapturaMultas
+from bloqueio_recursos import aplicar_bloqueio_async
+
+PAGINAS_SIMULTANEAS = max(1, int(os.getenv("DETRAN_ASYNC_PAGINAS", "10")))
+HEADLESS = os.getenv("DETRAN_HEADLESS", "0").lower() in ("1", "true", "sim")
+
+# ================= FORM =================
+
+async def preencher_campo(page, seletor, texto, medidor=None):
+    """Digita o texto e espera o campo (com máscara) refletir o valor."""
+    campo = page.locator(seletor)
+    teto = max(500, len(texto) * DELAY_DIGITACAO * 1000)
+
+    for delay in (0, DELAY_DIGITACAO * 1000):
+        await campo.click(force=True)
+        await page.keyboard.press("Control+A")
+        await page.keyboard.press("Backspace")
+        await campo.press_sequentially(texto, delay=delay)
+        if await esperar_async(medidor, f"digitar {seletor}", teto, lambda t: page.wait_for_function(
+            JS_CAMPO_PREENCHIDO, arg=[seletor, normalizar_campo(texto)], timeout=t
+        )):
+            return True
+    return False
+
+async def preencher_dados(page, placa, renavam, medidor=None):
+    """Preenche placa e renavam e espera a máscara aceitar os valores"""
+    await preencher_campo(page, SELETOR_CAMPO_PLACA, placa, medidor)
+    await preencher_campo(page, SELETOR_CAMPO_RENAVAM, renavam, medidor)
+
+# ================= AÇÕES =================
+
+async def fechar_popup(page):
+    try:
+        await page.get_by_role("button", name=REGEX_BOTAO_FECHAR).click(timeout=3000)
+    except:
+        pass
+
+async def acessar_taxas_multas(page):
+    await page.get_by_text("Taxas / Multas", exact=False).click()
+
+async def clicar_consultar(page):
+    async with page.expect_navigation(wait_until="networkidle"):
+        await page.get_by_role("button", name=REGEX_BOTAO_CONSULTAR).click()
+
+# ================= MULTAS =================
+
+async def abrir_detalhe_multas(page):
+    await page.get_by_text(REGEX_CLIQUE_AQUI).first.wait_for(timeout=TIMEOUT_MULTAS)
+    await page.get_by_text(REGEX_CLIQUE_AQUI).first.click()
+    await page.wait_for_load_state("networkidle")
+    log("🔍 Tela de multas aberta")
+
+async def textos_linhas_tabela(page):
+    """Espera a tabela de multas e devolve o texto de cada linha, na ordem da tela."""
+    tabela = page.locator("table")
+    await tabela.wait_for(timeout=TIMEOUT_TABELA)
+    return await tabela.locator("tbody tr").evaluate_all(JS_TEXTOS_LINHAS)
+
+async def processar_multas(page):
+    tabela = page.locator("table")
+    await tabela.wait_for(timeout=TIMEOUT_TABELA)
+
+    textos = await tabela.locator("tbody tr").evaluate_all(JS_TEXTOS_LINHAS)
+    return selecionar_linhas_validas(textos)
+
+async def _marcar_checkbox_linha(linha, i, medidor=None):
+    """Clique real no checkbox de uma linha (fallback do modo em lote)."""
+    await linha.scroll_into_view_if_needed(timeout=TIMEOUT_TABELA)
+
+    # Clica no elemento real do checkbox (Material UI)
+    checkbox = linha.locator(
+        'mat-checkbox label, mat-checkbox span, input[type="checkbox"]'
+    ).first
+
+    await checkbox.click(force=True)
+    await esperar_async(medidor, f"checkbox linha {i}", (DELAY_SCROLL + DELAY_CHECKBOX) * 1000,
+                        lambda t: expect(linha.locator('input[type="checkbox"]').first).to_be_checked(timeout=t))
+
+async def marcar_checkboxes_multas(page, indices, medidor=None):
+    linhas = page.locator("table").locator("tbody tr")
+
+    try:
+        estados = await linhas.evaluate_all(JS_MARCAR_CHECKBOXES, list(indices))
+    except Exception as e:
+        log(f"⚠️ Seleção em lote falhou: {e}")
+        estados = [False] * len(indices)
+
+    marcadas = sum(1 for ok in estados if ok)
+    pendentes = [i for i, ok in zip(indices, estados) if not ok]
+    if marcadas:
+        log(f"☑️ {marcadas} multa(s) selecionada(s) em lote")
+
+    for i in pendentes:
+        try:
+            await _marcar_checkbox_linha(linhas.nth(i), i, medidor)
+            marcadas += 1
+            log(f"☑️ Multa {marcadas} selecionada (linha {i})")
+        except Exception as e:
+            log(f"⚠️ Falha ao marcar linha {i}: {e}")
+
+    log(f"✅ {marcadas} multas selecionadas com sucesso")
+
+# ================= PAGAMENTO =================
+
+async def clicar_ver_opcoes_pagamento(page, medidor=None):
+    """Clica no botão verde 'Ver opções de pagamento' e espera a tela de opções"""
+    try:
+        botao_opcoes = page.locator('button:has-text("Ver opções de pagamento")').first
+        await botao_opcoes.wait_for(timeout=10000, state="visible")
+        await botao_opcoes.click()
+        log("✅ Clicou em 'Ver opções de pagamento'")
+        opcoes = page.locator(", ".join(SELETORES_COPIAR_PIX + SELETORES_BAIXAR_BOLETO)).first
+        await esperar_async(medidor, "opções de pagamento", TETO_OPCOES_PAGAMENTO,
+                            lambda t: opcoes.wait_for(state="visible", timeout=t))
+        return True
+    except Exception as e:
+        log(f"⚠️ Erro ao clicar em 'Ver opções de pagamento': {e}")
+        return False
+
+async def extrair_codigo_pix_copia_cola(page, medidor=None):
+    """Extrai o código PIX Copia e Cola da nova tela"""
+    try:
+        # Aguarda o QR Code e o código aparecerem
+        await esperar_async(medidor, "código pix", TETO_PIX,
+                            lambda t: page.locator(SELETOR_CODIGO_PIX).first.wait_for(state="visible", timeout=t))
+
+        for seletor in SELETORES_PIX:
+            try:
+                elemento = page.locator(seletor).first
+                if await elemento.is_visible():
+                    if 'input' in seletor:
+                        codigo_pix = await elemento.input_value()
+                    else:
+                        codigo_pix = await elemento.inner_text()
+
+                    if codigo_pix and len(codigo_pix) > 30:
+                        log(f"💳 Código PIX Copia e Cola extraído ({len(codigo_pix)} caracteres)")
+                        log(f"   Início: {codigo_pix[:50]}...")
+                        return codigo_pix.strip()
+            except:
+                continue
+
+        # Fallback: procura no texto da página
+        texto_pagina = await page.inner_text("body")
+        match = re.search(r'(\d{30,}[^\s]*br\.gov\.bcb[^\s]+)', texto_pagina)
+        if match:
+            codigo_pix = match.group(1)
+            log(f"💳 Código PIX encontrado por regex ({len(codigo_pix)} caracteres)")
+            return codigo_pix.strip()
+
+        log("⚠️ Código PIX Copia e Cola não encontrado")
+        return "-"
+
+    except Exception as e:
+        log(f"⚠️ Erro ao extrair código PIX: {e}")
+        return "-"
+
+async def obter_codigo_pix(page, medidor=None):
+    """Clica em "Copiar Chave Pix" e extrai o código PIX Copia e Cola."""
+    try:
+        botao_encontrado = False
+        for seletor in SELETORES_COPIAR_PIX:
+            try:
+                botao = page.locator(seletor).first
+                if await botao.is_visible():
+                    await botao.click()
+                    log(f"✅ Clicou em 'Copiar Chave Pix' usando seletor: {seletor}")
+                    botao_encontrado = True
+                    break
+            except:
+                continue
+
+        if not botao_encontrado:
+            log("⚠️ Botão 'Copiar Chave Pix' não encontrado, tentando extrair direto...")
+
+        return await extrair_codigo_pix_copia_cola(page, medidor)
+
+    except Exception as e:
+        log(f"⚠️ Erro ao clicar em 'Copiar Chave Pix': {e}")
+        return "-"
+
+async def clicar_baixar_boleto(page):
+    """Clica em "Baixar boleto para pagamento à vista"."""
+    try:
+        for seletor in SELETORES_BAIXAR_BOLETO:
+            try:
+                botao = page.locator(seletor).first
+                if await botao.is_visible():
+                    await botao.click()
+                    log(f"💵 Clicou em 'Baixar boleto' usando seletor: {seletor}")
+                    return True
+            except:
+                continue
+
+        log("⚠️ Botão 'Baixar boleto' não encontrado")
+
+    except Exception as e:
+        log(f"⚠️ Erro ao clicar em 'Baixar boleto': {e}")
+    return False
+
+async def baixar_boleto(page, pasta_boletos, medidor=None):
+    """Clica em "Baixar boleto", espera o download e salva em pasta_boletos.
+
+    Retorna o caminho ou None.
+    """
+    try:
+        async with medir_async(medidor, "download boleto", TETO_DOWNLOAD_BOLETO):
+            async with page.expect_download(timeout=TETO_DOWNLOAD_BOLETO) as download_info:
+                if not await clicar_baixar_boleto(page):
+                    raise RuntimeError("botão 'Baixar boleto' indisponível")
+                log("⏳ Aguardando download do boleto...")
+
+        download = await download_info.value
+        nome_arquivo = download.suggested_filename or f"boleto_{int(time.time())}.pdf"
+        caminho_pdf = os.path.join(pasta_boletos, nome_arquivo)
+        await download.save_as(caminho_pdf)
+        log(f"💾 Boleto salvo: {caminho_pdf}")
+        return caminho_pdf
+    except Exception as e:
+        log(f"⚠️ Erro ao baixar boleto: {e}")
+        return None
+
+async def baixar_pdf_direto(page, context, clicar, medidor=None, prefixo="boleto"):
+    """Caminho rápido do boleto (ver detran_manual.baixar_pdf_direto).
+
+    `clicar` é uma corrotina sem argumentos que devolve True se clicou.
+    Retorna (bytes, nome_arquivo) ou None.
+    """
+    try:
+        url = await page.evaluate(JS_HREF_BOLETO)
+    except Exception:
+        url = None
+    if url:
+        try:
+            async with medir_async(medidor, f"{prefixo} direto (GET)", TETO_BOLETO_DIRETO):
+                resposta = await context.request.get(url, timeout=TETO_BOLETO_DIRETO)
+                corpo = await resposta.body()
+            if resposta.ok and corpo.startswith(b"%PDF"):
+                log(f"⚡ {prefixo.capitalize()} obtido direto do link ({len(corpo)} bytes)")
+                return corpo, nome_arquivo_pdf(resposta.headers, url, prefixo)
+        except Exception as e:
+            log(f"⚠️ GET direto do {prefixo} falhou: {e}")
+
+    capturado = {}
+
+    def eh_pdf(url):
+        return bool(REGEX_URL_BOLETO.search(url))
+
+    async def interceptar(route, request):
+        try:
+            resposta = await route.fetch()
+            corpo = await resposta.body()
+        except Exception:
+            await route.abort()
+            return
+        if corpo.startswith(b"%PDF"):
+            capturado["pdf"] = (corpo, nome_arquivo_pdf(resposta.headers, request.url, prefixo))
+            await route.fulfill(status=204, body="")
+        else:
+            await route.fulfill(response=resposta)
+
+    paginas_antes = set(context.pages)
+    await context.route(eh_pdf, interceptar)
+    try:
+        async with medir_async(medidor, f"{prefixo} direto (clique)", TETO_BOLETO_DIRETO):
+            async with context.expect_event("response", predicate=lambda r: "pdf" in capturado,
+                                            timeout=TETO_BOLETO_DIRETO):
+                if not await clicar():
+                    raise RuntimeError(f"botão do {prefixo} indisponível")
+    except Exception as e:
+        log(f"⚠️ Caminho rápido do {prefixo} não capturou o PDF: {e}")
+    finally:
+        await context.unroute(eh_pdf, interceptar)
+        for aba in context.pages:
+            if aba not in paginas_antes:
+                try:
+                    await aba.close()
+                except Exception:
+                    pass
+
+    if "pdf" in capturado:
+        corpo, nome = capturado["pdf"]
+        log(f"⚡ {prefixo.capitalize()} capturado na requisição ({len(corpo)} bytes)")
+        return corpo, nome
+    return None
+
+# ================= PROCESSAMENTO =================
+
+async def processar_veiculo(browser, veiculo, indice, pipeline=None):
+    """Versão async de detran_manual.processar_veiculo (mesmo contrato de `pipeline`)."""
+    log("\n" + "=" * 50)
+    log(f"🚗 CONSULTA {indice} | {veiculo['placa']}")
+
+    pasta_boletos = preparar_pasta_boletos()
+
+    context = await browser.new_context(accept_downloads=True, service_workers="block")
+    bloqueio = await aplicar_bloqueio_async(context)
+    page = await context.new_page()
+    multas_lista = []
+    medidor = MedidorEsperas(veiculo["placa"])
+    captura = CapturaMultas(page)
+
+    try:
+        await page.goto(URL)
+        await fechar_popup(page)
+        await acessar_taxas_multas(page)
+        await preencher_dados(page, veiculo["placa"], veiculo["renavam"], medidor)
+        await clicar_consultar(page)
+
+        texto = (await page.inner_text("body")).lower()
+        qtd_multas = extrair_pendencias(texto)
+
+        log(f"📄 Multas encontradas: {qtd_multas}")
+
+        total = 0.0
+
+        if qtd_multas > 0:
+            await abrir_detalhe_multas(page)
+
+            capturado = None
+            if captura.ativa:
+                capturado = await captura.multas_async(veiculo["placa"], await textos_linhas_tabela(page))
+            if capturado:
+                multas_lista, total, indices = capturado
+                log(f"💰 Total calculado: R$ {formatar_valor_br(total)}")
+            else:
+                motivos, total, indices = await processar_multas(page)
+
+                for numero, motivo in enumerate(motivos, 1):
+                    multas_lista.append(montar_multa(motivo, veiculo["placa"], numero))
+
+            await marcar_checkboxes_multas(page, indices, medidor)
+
+            if not await clicar_ver_opcoes_pagamento(page, medidor):
+                log("⚠️ Não foi possível clicar em 'Ver opções de pagamento'")
+                return total, multas_lista
+
+            codigo_pix = await obter_codigo_pix(page, medidor)
+
+            dados_pdf = ("-", "-", "-", "-")
+            direto = await baixar_pdf_direto(page, context, lambda: clicar_baixar_boleto(page), medidor)
+            if direto:
+                # Parse direto dos bytes; o arquivo em disco é gravado em segundo plano
+                fonte_pdf, nome_arquivo = direto
+                arquivar_pdf(fonte_pdf, pasta_boletos, nome_arquivo)
+            else:
+                fonte_pdf = await baixar_boleto(page, pasta_boletos, medidor)
+            quantidade_grupo = len(indices)
+            registros = []
+            if fonte_pdf and pipeline is not None:
+                pipeline.agendar(
+                    multas_lista, fonte_pdf,
+                    lambda dados, registros_pdf: aplicar_dados_boleto(
+                        multas_lista, quantidade_grupo, codigo_pix, dados, registros_pdf),
+                )
+                return total, multas_lista
+            if fonte_pdf:
+                # Extração de texto usa CPU: roda fora do event loop
+                dados_pdf, registros = await asyncio.to_thread(extrair_boleto_do_pdf, fonte_pdf)
+                log(f"🏢 Órgão Autuador: {dados_pdf[0]}")
+                log(f"📄 Descrição PDF: {dados_pdf[1]}")
+                log(f"📅 Datas do PDF - Infração: {dados_pdf[2]}, Vencimento: {dados_pdf[3]}")
+
+            aplicar_dados_boleto(multas_lista, quantidade_grupo, codigo_pix, dados_pdf, registros)
+
+        return total, multas_lista
+
+    except TimeoutError:
+        log("❌ Timeout")
+        return 0.0, []
+    finally:
+        medidor.log_resumo()
+        bloqueio.log_resumo()
+        await page.close()
+        await context.close()
+
+# ================= MOTOR =================
+
+class MotorAsync:
+    """Um navegador dirigido pelo event loop atual, com limite de páginas simultâneas."""
+
+    def __init__(self, paginas_simultaneas: int = PAGINAS_SIMULTANEAS, headless: bool = HEADLESS):
+        self.paginas_simultaneas = paginas_simultaneas
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._semaforo = None
+        self._lock = None
+
+    @property
+    def ativo(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def iniciar(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._semaforo = asyncio.Semaphore(self.paginas_simultaneas)
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self._browser is None or not self._browser.is_connected():
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+                log(f"🌐 Motor async iniciado ({self.paginas_simultaneas} páginas simultâneas)")
+
+    async def encerrar(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def processar(self, veiculo, indice, pipeline=None):
+        """Processa um veículo assim que houver vaga no limite de páginas."""
+        await self.iniciar()
+        async with self._semaforo:
+            if not self._browser.is_connected():
+                await self.iniciar()
+            return await processar_veiculo(self._browser, veiculo, indice, pipeline)
+
+
+async def main(veiculos=None):
+    from detran_manual import VEICULOS, salvar_no_excel
+
+    veiculos = veiculos or VEICULOS
+    motor = MotorAsync()
+    try:
+        resultados = await asyncio.gather(*[
+            motor.processar(v, i) for i, v in enumerate(veiculos, 1)
+        ])
+    finally:
+        await motor.encerrar()
+
+    total_geral = sum(total for total, _ in resultados)
+    todas_multas = [m for _, multas in resultados for m in multas]
+    if todas_multas:
+        salvar_no_excel(todas_multas)
+    log(f"\n💵 TOTAL GERAL: R$ {formatar_valor_br(total_geral)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
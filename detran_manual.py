@@ -1,17 +1,25 @@
 import time
 import re
+import io
+import atexit
+import multiprocessing
 
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from playwright.sync_api import sync_playwright, TimeoutError
+from urllib.parse import unquote, urlparse
+from playwright.sync_api import sync_playwright, TimeoutError, expect
 import pandas as pd
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
-try:
-    import pdfplumber
-except ImportError:
-    pdfplumber = None
+from esperas import MedidorEsperas, esperar, medir
+from captura_multas import CapturaMultas
+from formatacao import formatar_valor_br
+from bloqueio_recursos import aplicar_bloqueio
+from cache_pdf import cache_padrao, chave_pdf
+from extrator_boleto import extrair_boleto, extrair_campos, indexar_por_ait, normalizar_ait
+from texto_pdf import obter_backend
+from manifesto_pdfs import ManifestoReprocessamento
+from excel_streaming import escrever_dataframe, escrever_planilha, larguras_automaticas
 
 # ================= CONFIGURAÇÕES =================
 
@@ -28,48 +36,73 @@ TIMEOUT_PADRAO = 20000
 TIMEOUT_MULTAS = 20000
 TIMEOUT_TABELA = 20000
 
+# Delays antigos: hoje são só o teto das esperas por evento (esperas.py)
 DELAY_SCROLL = 0.2  # reduzido de 0.4
 DELAY_CHECKBOX = 0.2  # reduzido de 0.4
 DELAY_EMITIR = 2  # reduzido de 4
 DELAY_DIGITACAO = 0.1  # reduzido de 0.3
 
+TETO_OPCOES_PAGAMENTO = 5000  # antes: 2000 ms + 3000 ms fixos
+TETO_PIX = 2000
+TETO_DOWNLOAD_BOLETO = 30000
+TETO_BOLETO_DIRETO = 15000
+
+# Grava os PDFs baixados em boletos/<data>/ (em segundo plano, sem travar o parsing)
+ARQUIVAR_PDFS = os.getenv("DETRAN_ARQUIVAR_PDFS", "1").lower() not in ("0", "false", "nao")
+
 REGEX_BOTAO_CONSULTAR = re.compile("consultar|confirmar|pesquisar", re.I)
 REGEX_BOTAO_FECHAR = re.compile("fechar", re.I)
 REGEX_BOTAO_EMITIR = re.compile("emitir", re.I)
 REGEX_CLIQUE_AQUI = re.compile("clique aqui", re.I)
 REGEX_VALOR = re.compile(r"R\$[\s]*([\d.,]+)")
 REGEX_MULTAS = re.compile(r"possui\s+(\d+)\s+multa", re.I)
+# Só o endpoint que gera o boleto/extrato (ou um .pdf no fim do caminho):
+# XHRs que apenas citam "boleto" na URL não passam pela interceptação
+REGEX_URL_BOLETO = re.compile(r"/gerar_boleto(?:[/?#]|$)|\.pdf(?:[?#]|$)", re.I)
+REGEX_NOME_ARQUIVO = re.compile(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)", re.I)
 
 # ================= UTIL =================
 
 def log(msg):
     print(msg)
 
-def formatar_valor_br(valor):
-    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
 # ================= FORM =================
 
-def preencher_dados(page, placa, renavam):
-    """Preenche placa e renavam com delay entre caracteres"""
-    campo_placa = page.locator('input[placeholder*="Placa" i]')
-    campo_renavam = page.locator('input[placeholder*="Renavam" i]')
-    
-    # Limpa e preenche placa com delay
-    campo_placa.click(force=True)
-    page.keyboard.press("Control+A")
-    page.keyboard.press("Backspace")
-    for char in placa:
-        page.keyboard.press(char)
-        time.sleep(DELAY_DIGITACAO)
-    
-    # Limpa e preenche renavam com delay
-    campo_renavam.click(force=True)
-    page.keyboard.press("Control+A")
-    page.keyboard.press("Backspace")
-    for char in renavam:
-        page.keyboard.press(char)
-        time.sleep(DELAY_DIGITACAO)
+SELETOR_CAMPO_PLACA = 'input[placeholder*="Placa" i]'
+SELETOR_CAMPO_RENAVAM = 'input[placeholder*="Renavam" i]'
+
+# Compara o valor do campo ignorando a máscara (hífen, espaços...)
+JS_CAMPO_PREENCHIDO = """([seletor, esperado]) => {
+    const el = document.querySelector(seletor);
+    return !!el && el.value.replace(/[^0-9a-z]/gi, '').toUpperCase() === esperado;
+}"""
+
+def normalizar_campo(texto):
+    return re.sub(r"[^0-9A-Za-z]", "", texto).upper()
+
+def preencher_campo(page, seletor, texto, medidor=None):
+    """Digita o texto e espera o campo (com máscara) refletir o valor.
+
+    Se a máscara perder teclas digitadas rápido, redigita com DELAY_DIGITACAO.
+    """
+    campo = page.locator(seletor)
+    teto = max(500, len(texto) * DELAY_DIGITACAO * 1000)
+
+    for delay in (0, DELAY_DIGITACAO * 1000):
+        campo.click(force=True)
+        page.keyboard.press("Control+A")
+        page.keyboard.press("Backspace")
+        campo.press_sequentially(texto, delay=delay)
+        if esperar(medidor, f"digitar {seletor}", teto, lambda t: page.wait_for_function(
+            JS_CAMPO_PREENCHIDO, arg=[seletor, normalizar_campo(texto)], timeout=t
+        )):
+            return True
+    return False
+
+def preencher_dados(page, placa, renavam, medidor=None):
+    """Preenche placa e renavam e espera a máscara aceitar os valores"""
+    preencher_campo(page, SELETOR_CAMPO_PLACA, placa, medidor)
+    preencher_campo(page, SELETOR_CAMPO_RENAVAM, renavam, medidor)
 
 # ================= AÇÕES =================
 
@@ -100,20 +133,33 @@ def extrair_valor(texto):
         return float(valores[-1].replace(".", "").replace(",", "."))
     return 0.0
 
-def processar_multas(page):
+# Lê o texto de todas as linhas numa única ida ao navegador
+JS_TEXTOS_LINHAS = "linhas => linhas.map(l => l.innerText)"
+
+def textos_linhas_tabela(page):
+    """Espera a tabela de multas e devolve o texto de cada linha, na ordem da tela."""
     tabela = page.locator("table")
     tabela.wait_for(timeout=TIMEOUT_TABELA)
-
-    linhas = tabela.locator("tbody tr")
-    qtd = linhas.count()
-
+    return tabela.locator("tbody tr").evaluate_all(JS_TEXTOS_LINHAS)
+
+# Marca, numa única ida ao navegador, os checkboxes (Material) das linhas
+# indicadas; devolve o estado final de cada uma
+JS_MARCAR_CHECKBOXES = """(linhas, indices) => indices.map(i => {
+    const linha = linhas[i];
+    const input = linha && linha.querySelector('mat-checkbox input[type="checkbox"], input[type="checkbox"]');
+    if (!input || input.disabled) return false;
+    if (!input.checked) input.click();
+    return input.checked;
+})"""
+
+def selecionar_linhas_validas(textos):
+    """Filtra as linhas com valor > 0. Retorna (motivos, total, indices_validos)."""
     indices_validos = []
     total = 0.0
     motivos = []
 
-    for i in range(qtd):
-        linha = linhas.nth(i)
-        texto = linha.inner_text().replace("\n", " ")
+    for i, texto in enumerate(textos):
+        texto = texto.replace("\n", " ")
         valor = extrair_valor(texto)
 
         if valor > 0:
@@ -125,30 +171,52 @@ def processar_multas(page):
     log(f"💰 Total calculado: R$ {formatar_valor_br(total)}")
     return motivos, total, indices_validos
 
+def processar_multas(page):
+    tabela = page.locator("table")
+    tabela.wait_for(timeout=TIMEOUT_TABELA)
+
+    textos = tabela.locator("tbody tr").evaluate_all(JS_TEXTOS_LINHAS)
+    return selecionar_linhas_validas(textos)
+
 # ================= SELEÇÃO CORRETA DAS MULTAS =================
 
-def marcar_checkboxes_multas(page, indices):
+def _marcar_checkbox_linha(linha, i, medidor=None):
+    """Clique real no checkbox de uma linha (fallback do modo em lote)."""
+    # scroll_into_view_if_needed já espera o elemento ficar estável
+    linha.scroll_into_view_if_needed(timeout=TIMEOUT_TABELA)
+
+    # 🔥 CLICA NO ELEMENTO REAL DO CHECKBOX (Material UI)
+    checkbox = linha.locator(
+        'mat-checkbox label, mat-checkbox span, input[type="checkbox"]'
+    ).first
+
+    checkbox.click(force=True)
+    # Espera o input refletir a seleção (teto = antigo DELAY_CHECKBOX)
+    esperar(medidor, f"checkbox linha {i}", (DELAY_SCROLL + DELAY_CHECKBOX) * 1000,
+            lambda t: expect(linha.locator('input[type="checkbox"]').first).to_be_checked(timeout=t))
+
+def marcar_checkboxes_multas(page, indices, medidor=None):
     tabela = page.locator("table")
     linhas = tabela.locator("tbody tr")
 
-    marcadas = 0
+    # 1) Marca tudo numa única avaliação na página
+    try:
+        estados = linhas.evaluate_all(JS_MARCAR_CHECKBOXES, list(indices))
+    except Exception as e:
+        log(f"⚠️ Seleção em lote falhou: {e}")
+        estados = [False] * len(indices)
 
-    for i in indices:
-        linha = linhas.nth(i)
-        linha.scroll_into_view_if_needed()
-        time.sleep(DELAY_SCROLL)
+    marcadas = sum(1 for ok in estados if ok)
+    pendentes = [i for i, ok in zip(indices, estados) if not ok]
+    if marcadas:
+        log(f"☑️ {marcadas} multa(s) selecionada(s) em lote")
 
+    # 2) Linhas que o lote não conseguiu marcar: clique real, uma a uma
+    for i in pendentes:
         try:
-            # 🔥 CLICA NO ELEMENTO REAL DO CHECKBOX (Material UI)
-            checkbox = linha.locator(
-                'mat-checkbox label, mat-checkbox span, input[type="checkbox"]'
-            ).first
-
-            checkbox.click(force=True)
-            time.sleep(DELAY_CHECKBOX)
+            _marcar_checkbox_linha(linhas.nth(i), i, medidor)
             marcadas += 1
             log(f"☑️ Multa {marcadas} selecionada (linha {i})")
-
         except Exception as e:
             log(f"⚠️ Falha ao marcar linha {i}: {e}")
 
@@ -189,20 +257,22 @@ def extrair_codigo_pix(page):
 
     log(f"✅ {marcadas} multas selecionadas com sucesso")
 
-def clicar_ver_opcoes_pagamento(page):
-    """Clica no botão verde 'Ver opções de pagamento'"""
+def clicar_ver_opcoes_pagamento(page, medidor=None):
+    """Clica no botão verde 'Ver opções de pagamento' e espera a tela de opções"""
     try:
         botao_opcoes = page.locator('button:has-text("Ver opções de pagamento")').first
         botao_opcoes.wait_for(timeout=10000, state="visible")
         botao_opcoes.click()
         log("✅ Clicou em 'Ver opções de pagamento'")
-        page.wait_for_timeout(2000)
+        opcoes = page.locator(", ".join(SELETORES_COPIAR_PIX + SELETORES_BAIXAR_BOLETO)).first
+        esperar(medidor, "opções de pagamento", TETO_OPCOES_PAGAMENTO,
+                lambda t: opcoes.wait_for(state="visible", timeout=t))
         return True
     except Exception as e:
         log(f"⚠️ Erro ao clicar em 'Ver opções de pagamento': {e}")
         return False
 
-def escolher_forma_pagamento(page, forma="pix"):
+def escolher_forma_pagamento(page, forma="pix", medidor=None):
     """
     Escolhe a forma de pagamento na tela de opções.
     forma: 'pix', 'boleto' ou 'parcelado'
@@ -211,7 +281,8 @@ def escolher_forma_pagamento(page, forma="pix"):
         if forma.lower() == "pix":
             # PIX já vem selecionado por padrão, só aguarda carregar
             log("💳 Pagamento Via PIX selecionado (padrão)")
-            page.wait_for_timeout(2000)
+            esperar(medidor, "pix carregado", TETO_PIX,
+                    lambda t: page.locator(SELETOR_CODIGO_PIX).first.wait_for(state="visible", timeout=t))
             return True
         
         elif forma.lower() == "boleto":
@@ -219,7 +290,7 @@ def escolher_forma_pagamento(page, forma="pix"):
             botao_boleto.wait_for(timeout=5000, state="visible")
             botao_boleto.click()
             log("💵 Selecionado: Boleto para pagamento à vista")
-            page.wait_for_timeout(2000)
+            esperar(medidor, "forma boleto", 2000, lambda t: page.wait_for_load_state("networkidle", timeout=t))
             return True
         
         elif forma.lower() == "parcelado":
@@ -227,7 +298,7 @@ def escolher_forma_pagamento(page, forma="pix"):
             botao_parcelado.wait_for(timeout=5000, state="visible")
             botao_parcelado.click()
             log("💳 Selecionado: Pagamento parcelado")
-            page.wait_for_timeout(2000)
+            esperar(medidor, "forma parcelado", 2000, lambda t: page.wait_for_load_state("networkidle", timeout=t))
             return True
         
         else:
@@ -238,25 +309,27 @@ def escolher_forma_pagamento(page, forma="pix"):
         log(f"⚠️ Erro ao escolher forma de pagamento: {e}")
         return False
 
-def extrair_codigo_pix_copia_cola(page):
+# Seletor para o campo "Pix Copia e Cola:"
+SELETORES_PIX = [
+    'input[value*="br.gov.bcb"]',  # Input com código PIX
+    'input[id*="pix"]',
+    'input[name*="pix"]',
+    'code:has-text("br.gov.bcb")',  # Elemento code com o código
+    'pre:has-text("br.gov.bcb")',  # Elemento pre com o código
+    'div:has-text("Pix Copia e Cola:") + input',  # Input logo após o label
+]
+SELETOR_CODIGO_PIX = ", ".join(SELETORES_PIX)
+
+def extrair_codigo_pix_copia_cola(page, medidor=None):
     """Extrai o código PIX Copia e Cola da nova tela"""
     try:
         # Aguarda o QR Code e o código aparecerem
-        page.wait_for_timeout(2000)
-        
-        # Seletor para o campo "Pix Copia e Cola:"
-        seletores_pix = [
-            'input[value*="br.gov.bcb"]',  # Input com código PIX
-            'input[id*="pix"]',
-            'input[name*="pix"]',
-            'code:has-text("br.gov.bcb")',  # Elemento code com o código
-            'pre:has-text("br.gov.bcb")',  # Elemento pre com o código
-            'div:has-text("Pix Copia e Cola:") + input',  # Input logo após o label
-        ]
+        esperar(medidor, "código pix", TETO_PIX,
+                lambda t: page.locator(SELETOR_CODIGO_PIX).first.wait_for(state="visible", timeout=t))
         
         codigo_pix = None
         
-        for seletor in seletores_pix:
+        for seletor in SELETORES_PIX:
             try:
                 elemento = page.locator(seletor).first
                 if elemento.is_visible(timeout=2000):
@@ -290,22 +363,133 @@ def extrair_codigo_pix_copia_cola(page):
         log(f"⚠️ Erro ao extrair código PIX: {e}")
         return "-"
 
-def clicar_emitir(page, context, pasta_boletos):
-    """Clica em Emitir, espera aparecer o botão Baixar Extrato e baixa o PDF."""
+# URL do boleto/extrato quando o botão é um link comum (dispensa o clique)
+JS_HREF_BOLETO = """() => {
+    for (const a of document.querySelectorAll('a[href]')) {
+        const texto = (a.innerText || '').toLowerCase();
+        if (/^https?:/i.test(a.href) &&
+            (texto.includes('baixar boleto') || texto.includes('baixar extrato') || /gerar_boleto|\\.pdf(\\?|$)/i.test(a.href))) {
+            return a.href;
+        }
+    }
+    return null;
+}"""
+
+def nome_arquivo_pdf(headers, url, prefixo="boleto"):
+    """Nome do PDF a partir do Content-Disposition, da URL ou um nome com timestamp."""
+    match = REGEX_NOME_ARQUIVO.search(headers.get("content-disposition") or "")
+    if match:
+        return os.path.basename(unquote(match.group(1)).strip())
+    base = os.path.basename(urlparse(url).path)
+    if base.lower().endswith(".pdf"):
+        return base
+    return f"{prefixo}_{int(time.time() * 1000)}.pdf"
+
+def baixar_pdf_direto(page, context, clicar, medidor=None, prefixo="boleto"):
+    """Caminho rápido do boleto: busca os bytes do PDF pelo APIRequest do contexto.
+
+    1) Se o botão for um link, faz GET direto com os cookies da sessão.
+    2) Senão, clica (`clicar()`) com uma rota que intercepta a requisição do
+       PDF, busca o corpo via route.fetch() (mesma sessão) e responde 204 à
+       página: sem download, sem nova aba, sem viewer.
+
+    Retorna (bytes, nome_arquivo) ou None para cair no fluxo de download.
+    """
+    # 1) Link direto
+    try:
+        url = page.evaluate(JS_HREF_BOLETO)
+    except Exception:
+        url = None
+    if url:
+        try:
+            with medir(medidor, f"{prefixo} direto (GET)", TETO_BOLETO_DIRETO):
+                resposta = context.request.get(url, timeout=TETO_BOLETO_DIRETO)
+                corpo = resposta.body()
+            if resposta.ok and corpo.startswith(b"%PDF"):
+                log(f"⚡ {prefixo.capitalize()} obtido direto do link ({len(corpo)} bytes)")
+                return corpo, nome_arquivo_pdf(resposta.headers, url, prefixo)
+        except Exception as e:
+            log(f"⚠️ GET direto do {prefixo} falhou: {e}")
+
+    # 2) Intercepta a requisição disparada pelo clique
+    capturado = {}
+
+    def eh_pdf(url):
+        return bool(REGEX_URL_BOLETO.search(url))
+
+    def interceptar(route, request):
+        try:
+            resposta = route.fetch()
+            corpo = resposta.body()
+        except Exception:
+            route.abort()
+            return
+        if corpo.startswith(b"%PDF"):
+            capturado["pdf"] = (corpo, nome_arquivo_pdf(resposta.headers, request.url, prefixo))
+            route.fulfill(status=204, body="")
+        else:
+            # Página intermediária (ex.: HTML que carrega o PDF): segue normalmente
+            route.fulfill(response=resposta)
+
+    paginas_antes = set(context.pages)
+    context.route(eh_pdf, interceptar)
+    try:
+        with medir(medidor, f"{prefixo} direto (clique)", TETO_BOLETO_DIRETO):
+            with context.expect_event("response", predicate=lambda r: "pdf" in capturado,
+                                      timeout=TETO_BOLETO_DIRETO):
+                if not clicar():
+                    raise RuntimeError(f"botão do {prefixo} indisponível")
+    except Exception as e:
+        log(f"⚠️ Caminho rápido do {prefixo} não capturou o PDF: {e}")
+    finally:
+        context.unroute(eh_pdf, interceptar)
+        # Fecha abas que o clique possa ter aberto
+        for aba in context.pages:
+            if aba not in paginas_antes:
+                try:
+                    aba.close()
+                except Exception:
+                    pass
+
+    if "pdf" in capturado:
+        corpo, nome = capturado["pdf"]
+        log(f"⚡ {prefixo.capitalize()} capturado na requisição ({len(corpo)} bytes)")
+        return corpo, nome
+    return None
+
+def salvar_pdf(conteudo, pasta_boletos, nome_arquivo):
+    caminho = os.path.join(pasta_boletos, nome_arquivo)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    log(f"💾 PDF salvo: {caminho}")
+    return caminho
+
+# Uma única thread de escrita: os arquivos saem na ordem em que foram pedidos
+_arquivador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arquivo-pdf")
+atexit.register(_arquivador.shutdown, wait=True)
+
+def arquivar_pdf(conteudo, pasta_boletos, nome_arquivo):
+    """Agenda a gravação do PDF em disco (write-behind).
+
+    Retorna o Future com o caminho, ou None se o arquivamento está desligado
+    (DETRAN_ARQUIVAR_PDFS=0).
+    """
+    if not ARQUIVAR_PDFS:
+        return None
+    return _arquivador.submit(salvar_pdf, bytes(conteudo), pasta_boletos, nome_arquivo)
+
+def clicar_emitir(page, context, pasta_boletos, medidor=None):
+    """Clica em Emitir, espera aparecer o botão Baixar Extrato e baixa o PDF.
+
+    Retorna a fonte do PDF para extrair_boleto_do_pdf: os bytes (caminho
+    rápido, com o arquivo gravado em segundo plano) ou o caminho do download.
+    """
     botao_emitir = page.get_by_role("button", name=REGEX_BOTAO_EMITIR)
     botao_emitir.wait_for(timeout=TIMEOUT_TABELA)
 
-    def salvar_download(download):
-        nome_arquivo = download.suggested_filename or f"extrato_{int(time.time())}.pdf"
-        caminho_destino = os.path.join(pasta_boletos, nome_arquivo)
-        download.save_as(caminho_destino)
-        log(f"💾 Boleto salvo via download: {caminho_destino}")
-        return caminho_destino
-
     # 1) Clica em Emitir para revelar o botão "Baixar Extrato"
     botao_emitir.click()
     log("🧾 Emitir clicado")
-    page.wait_for_timeout(800)
 
     # Localiza o botão Baixar Extrato (ou variações) mostrado na imagem
     seletor_baixar = (
@@ -321,19 +505,36 @@ def clicar_emitir(page, context, pasta_boletos):
         log("⚠️ Botão Baixar Extrato não apareceu.")
         return None
 
-    # 2) Clica em Baixar Extrato - isso abre o PDF em nova aba
-    botao_baixar.click(force=True)
-    log("⬇️ Baixar Extrato clicado")
-    page.wait_for_timeout(2000)
+    # 2) Caminho rápido: bytes do PDF direto pelo APIRequest do contexto
+    def clicar():
+        botao_baixar.click(force=True)
+        log("⬇️ Baixar Extrato clicado")
+        return True
 
-    # 3) Captura a nova página/aba que abriu com o PDF
-    paginas = context.pages
-    pagina_pdf = None
-    
-    for p in reversed(paginas):
-        if "gerar_boleto" in p.url or "pdf" in p.url.lower():
-            pagina_pdf = p
-            break
+    direto = baixar_pdf_direto(page, context, clicar, medidor, prefixo="extrato")
+    if direto:
+        # Parse direto dos bytes; o arquivo em disco é gravado em segundo plano
+        conteudo, nome_arquivo = direto
+        arquivar_pdf(conteudo, pasta_boletos, nome_arquivo)
+        return conteudo
+
+    # 3) Fallback: nova aba com o PDF + download pelo viewer
+    return _baixar_extrato_pela_aba(page, context, pasta_boletos, botao_baixar)
+
+def _baixar_extrato_pela_aba(page, context, pasta_boletos, botao_baixar):
+    """Fluxo antigo: abre o PDF em nova aba e dispara o download pelo viewer."""
+    # Clica em Baixar Extrato - isso abre o PDF em nova aba
+    try:
+        with context.expect_page(timeout=TETO_BOLETO_DIRETO) as nova_aba:
+            botao_baixar.click(force=True)
+        log("⬇️ Baixar Extrato clicado")
+        pagina_pdf = nova_aba.value
+    except Exception:
+        pagina_pdf = None
+        for p in reversed(context.pages):
+            if "gerar_boleto" in p.url or "pdf" in p.url.lower():
+                pagina_pdf = p
+                break
     
     if not pagina_pdf:
         log("⚠️ Nenhuma aba PDF encontrada")
@@ -341,9 +542,8 @@ def clicar_emitir(page, context, pasta_boletos):
     
     log(f"📄 PDF aberto em nova aba")
     pagina_pdf.wait_for_load_state("load", timeout=15000)
-    page.wait_for_timeout(3000)
     
-    # 4) Clica no ícone de download no viewer do PDF
+    # Clica no ícone de download no viewer do PDF
     try:
         # Procura especificamente pelo botão "Baixar Extrato" dentro da página
         seletores_download = [
@@ -362,44 +562,39 @@ def clicar_emitir(page, context, pasta_boletos):
         ]
         
         log("🔍 Procurando botão de download...")
-        botao_download_encontrado = False
         
-        for seletor in seletores_download:
-            try:
-                botao = pagina_pdf.locator(seletor).first
-                if botao.is_visible(timeout=1000):
-                    log(f"✅ Encontrou botão com seletor: {seletor}")
-                    botao.click(force=True)
-                    log("✅ Clicou no botão de download")
-                    botao_download_encontrado = True
-                    page.wait_for_timeout(1000)
-                    break
-            except Exception as e:
-                pass
+        # O clique acontece dentro do expect_download: termina quando o download começa
+        with pagina_pdf.expect_download(timeout=25000) as download_info:
+            botao_download_encontrado = False
+            for seletor in seletores_download:
+                try:
+                    botao = pagina_pdf.locator(seletor).first
+                    if botao.is_visible():
+                        log(f"✅ Encontrou botão com seletor: {seletor}")
+                        botao.click(force=True)
+                        log("✅ Clicou no botão de download")
+                        botao_download_encontrado = True
+                        break
+                except Exception as e:
+                    pass
+            
+            if not botao_download_encontrado:
+                log("⚠️ Botão visual não encontrado, tentando Ctrl+S...")
+                pagina_pdf.keyboard.press("Control+S")
         
-        if not botao_download_encontrado:
-            log("⚠️ Botão visual não encontrado, tentando Ctrl+S...")
-            pagina_pdf.keyboard.press("Control+S")
-            page.wait_for_timeout(1500)
+        download = download_info.value
+        nome_arquivo = download.suggested_filename or f"extrato_{int(time.time())}.pdf"
+        caminho_destino = os.path.join(pasta_boletos, nome_arquivo)
+        download.save_as(caminho_destino)
+        log(f"💾 PDF salvo: {caminho_destino}")
         
-        # Aguarda o download
-        try:
-            with pagina_pdf.expect_download(timeout=25000) as download_info:
-                page.wait_for_timeout(2000)
-            
-            download = download_info.value
-            nome_arquivo = download.suggested_filename or f"extrato_{int(time.time())}.pdf"
-            caminho_destino = os.path.join(pasta_boletos, nome_arquivo)
-            download.save_as(caminho_destino)
-            log(f"💾 PDF salvo: {caminho_destino}")
-            
-            pagina_pdf.close()
-            return caminho_destino
-        except TimeoutError:
-            log("⚠️ Timeout esperando download")
-            pagina_pdf.close()
-            return None
+        pagina_pdf.close()
+        return caminho_destino
         
+    except TimeoutError:
+        log("⚠️ Timeout esperando download")
+        pagina_pdf.close()
+        return None
     except Exception as e:
         log(f"⚠️ Erro ao tentar baixar PDF: {e}")
         try:
@@ -408,230 +603,443 @@ def clicar_emitir(page, context, pasta_boletos):
             pass
         return None
 
-def extrair_dados_do_pdf(caminho_pdf):
-    """Extrai código de pagamento, órgão autuador, descrição e datas do PDF."""
+def _abrir_fonte_pdf(fonte):
+    """Normaliza a fonte do PDF para algo que o backend de texto abre.
+
+    Aceita caminho (str/PathLike) ou buffer em memória (bytes, bytearray,
+    memoryview). Retorna (fonte_pdf, descricao) ou (None, descricao) se não
+    for um PDF válido.
+    """
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        buffer = memoryview(fonte)
+        descricao = f"<PDF em memória, {buffer.nbytes} bytes>"
+        if bytes(buffer[:4]) != b'%PDF':
+            log(f"⚠️ {descricao} não é um PDF válido")
+            return None, descricao
+        return io.BytesIO(buffer), descricao
+
+    caminho_pdf = os.fspath(fonte)
+    # Valida se o arquivo existe e é PDF
+    if not os.path.exists(caminho_pdf):
+        log(f"⚠️ Arquivo não encontrado: {caminho_pdf}")
+        return None, caminho_pdf
+    
+    with open(caminho_pdf, 'rb') as f:
+        header = f.read(10)
+        if not header.startswith(b'%PDF'):
+            log(f"⚠️ Arquivo {caminho_pdf} não é um PDF válido")
+            return None, caminho_pdf
+    return caminho_pdf, caminho_pdf
+
+# "compilado" (extrator_boleto.py, passada única) ou "legado"
+EXTRATOR_PDF = os.getenv("DETRAN_EXTRATOR", "compilado").lower()
+
+# Backend de texto (texto_pdf.py): pdfplumber é a referência, pdfium o rápido
+BACKEND_PDF = obter_backend()
+
+# Suba sempre que a extração mudar de resultado: invalida o cache de PDFs
+EXTRATOR_VERSAO = f"4:{EXTRATOR_PDF}:{BACKEND_PDF.nome if BACKEND_PDF else '-'}"
+
+DADOS_PDF_VAZIOS = ("-", "-", "-", "-")
+
+
+def _ler_conteudo_pdf(fonte_pdf):
+    """Bytes do PDF (de caminho ou buffer), ou None se não der para ler."""
+    if isinstance(fonte_pdf, (bytes, bytearray, memoryview)):
+        return bytes(fonte_pdf)
     try:
-        if not pdfplumber:
-            log("⚠️ pdfplumber não está instalado")
-            return "-", "-", "-", "-"
-        
-        # Valida se o arquivo existe e é PDF
-        if not os.path.exists(caminho_pdf):
-            log(f"⚠️ Arquivo não encontrado: {caminho_pdf}")
-            return "-", "-", "-", "-"
+        with open(os.fspath(fonte_pdf), 'rb') as f:
+            return f.read()
+    except (OSError, TypeError):
+        return None
+
+
+def extrair_dados_do_pdf(fonte_pdf):
+    """Extrai código de pagamento, órgão autuador, descrição e datas do PDF.
+
+    `fonte_pdf` pode ser o caminho do arquivo ou os bytes do PDF (bytes,
+    bytearray ou memoryview), sem passar pelo disco.
+    """
+    return extrair_boleto_do_pdf(fonte_pdf)[0]
+
+
+def extrair_boleto_do_pdf(fonte_pdf):
+    """(dados_pdf, registros_ait) numa leitura só do PDF.
+
+    dados_pdf é a tupla de extrair_dados_do_pdf (visão do boleto inteiro);
+    registros_ait tem um dicionário por linha de multa do boleto, com AIT,
+    órgão, datas, valores e o código de pagamento. O resultado fica no
+    cache de PDFs (cache_pdf.py), indexado pelo hash do conteúdo.
+    """
+    cache = cache_padrao() if BACKEND_PDF is not None else None
+    conteudo = _ler_conteudo_pdf(fonte_pdf) if cache is not None else None
+    if conteudo is None:
+        return _extrair_boleto_sem_cache(fonte_pdf)
+
+    chave = chave_pdf(conteudo, EXTRATOR_VERSAO)
+    try:
+        salvo = cache.obter(chave)
+    except Exception as e:
+        log(f"⚠️ Erro ao ler cache de PDFs: {e}")
+        salvo = None
+    if salvo is not None:
+        log(f"♻️ Dados do PDF vindos do cache ({chave[:12]})")
+        return tuple(salvo["campos"]), salvo["registros"]
+
+    dados, registros = _extrair_boleto_sem_cache(conteudo)
+    # Resultado vazio pode ser falha transitória: só guarda o que foi extraído
+    if tuple(dados) != DADOS_PDF_VAZIOS:
+        try:
+            cache.gravar(chave, {"campos": list(dados), "registros": registros})
+        except Exception as e:
+            log(f"⚠️ Erro ao gravar cache de PDFs: {e}")
+    return dados, registros
+
+
+def _extrair_boleto_sem_cache(fonte_pdf):
+    """Parsing do PDF propriamente dito (sempre abre o arquivo)."""
+    try:
+        if BACKEND_PDF is None:
+            log("⚠️ Nenhum backend de texto de PDF instalado (pdfplumber/pypdfium2)")
+            return DADOS_PDF_VAZIOS, []
         
-        with open(caminho_pdf, 'rb') as f:
-            header = f.read(10)
-            if not header.startswith(b'%PDF'):
-                log(f"⚠️ Arquivo {caminho_pdf} não é um PDF válido")
-                return "-", "-", "-", "-"
+        fonte, _ = _abrir_fonte_pdf(fonte_pdf)
+        if fonte is None:
+            return DADOS_PDF_VAZIOS, []
         
-        with pdfplumber.open(caminho_pdf) as pdf:
-            texto = ""
-            linhas = []
-            for page in pdf.pages[:2]:  # Lê primeiras 2 páginas (cabeçalho e descrição)
-                conteudo = page.extract_text() or ""
-                texto += conteudo
-                linhas.extend(conteudo.splitlines())
-
-            log("🔎 Prévia do PDF (linhas iniciais):")
-            for l in linhas[:8]:
-                log(f"   {l}")
-
-            codigo_pagamento = "-"
-            descricao_pdf = "-"
-            orgao = "-"
-            data_infracao_pdf = "-"
-            vencimento_pdf = "-"
-
-            # 1) Extrai código de pagamento - procura por padrão numérico específico
-            # Geralmente tem 47-48 dígitos em grupos separados por espaços
-            for i, linha in enumerate(linhas):
-                linha_limpa = linha.strip()
-                apenas_digitos = re.sub(r"\D", "", linha_limpa)
-                
-                # Código de barras tem 47-48 dígitos e geralmente está em linha própria
-                # Não deve conter texto além de números e espaços
-                if len(apenas_digitos) >= 47 and len(apenas_digitos) <= 48:
-                    # Verifica se linha tem pouco texto além de números (evita linhas com descrição)
-                    if len(linha_limpa.replace(" ", "")) == len(apenas_digitos):
-                        codigo_pagamento = linha_limpa
-                        log(f"💳 Código de Pagamento encontrado: {codigo_pagamento}")
-                        break
-            
-            # 2) Extrai órgão autuador - NOVA ABORDAGEM: pega da linha da multa
-            # Procura pela linha que contém DETRAN/DEMUTRAN | código | descrição
-            for i, linha in enumerate(linhas):
-                if ("DETRAN" in linha or "DEMUTRAN" in linha) and "|" in linha:
-                    # Extrai o órgão que está antes do primeiro "|"
-                    match_orgao = re.match(r"^([^|]+)", linha)
-                    if match_orgao:
-                        orgao = match_orgao.group(1).strip()
-                        log(f"🏢 Órgão Autuador encontrado (linha da multa): {orgao}")
-                        break
-            
-            # FALLBACK: Se não encontrou na linha da multa, procura por padrões
-            if orgao == "-":
-                # Procura por padrões de órgãos específicos
-                padrao_orgaos = [
-                    (r"DEMUTRAN\s+[A-Z]+", "DEMUTRAN"),
-                    (r"DETRAN-[A-Z]{2}", "DETRAN"),
-                    (r"SEMOB", "SEMOB"),
-                    (r"POL[IÍ]CIA\s+MILITAR", "PM"),
-                    (r"POL[IÍ]CIA\s+FEDERAL", "PF"),
-                    (r"POL[IÍ]CIA\s+RODOVI[ÁA]RIA", "PRF"),
-                ]
-                
-                for pattern, fallback in padrao_orgaos:
-                    match = re.search(pattern, texto, re.IGNORECASE)
-                    if match:
-                        orgao = match.group(0).strip()
-                        log(f"🏢 Órgão Autuador encontrado (padrão): {orgao}")
-                        break
-            
-            # 3) Extrai descrição: pega a linha logo após "Descrição (Taxa / Multa)"
-            for i, linha in enumerate(linhas):
-                linha_low = linha.lower()
-                if "descri" in linha_low and "taxa" in linha_low:
-                    for proxima in linhas[i+1:]:
-                        proxima_limpa = proxima.strip()
-                        if proxima_limpa:
-                            descricao_pdf = proxima_limpa
-                            break
+        # Lê no máximo as 2 primeiras páginas (cabeçalho e descrição)
+        with BACKEND_PDF.paginas(fonte) as paginas:
+            if EXTRATOR_PDF == "legado":
+                paginas = list(paginas)
+                return _extrair_campos_legado(paginas), extrair_boleto(paginas)[1]
+            return extrair_boleto(paginas)
+    except Exception as e:
+        log(f"⚠️ Erro ao ler PDF: {e}")
+        return DADOS_PDF_VAZIOS, []
+
+
+def _extrair_campos_legado(paginas):
+    """Extrator original (várias passadas com log detalhado), mantido para comparação.
+
+    Use DETRAN_EXTRATOR=legado para voltar a ele; benchmark_extrator.py
+    compara os dois.
+    """
+    texto = ""
+    linhas = []
+    for conteudo in paginas:
+        texto += conteudo
+        linhas.extend(conteudo.splitlines())
+
+    log("🔎 Prévia do PDF (linhas iniciais):")
+    for l in linhas[:8]:
+        log(f"   {l}")
+
+    codigo_pagamento = "-"
+    descricao_pdf = "-"
+    orgao = "-"
+    data_infracao_pdf = "-"
+    vencimento_pdf = "-"
+
+    # 1) Extrai código de pagamento - procura por padrão numérico específico
+    # Geralmente tem 47-48 dígitos em grupos separados por espaços
+    for i, linha in enumerate(linhas):
+        linha_limpa = linha.strip()
+        apenas_digitos = re.sub(r"\D", "", linha_limpa)
+
+        # Código de barras tem 47-48 dígitos e geralmente está em linha própria
+        # Não deve conter texto além de números e espaços
+        if len(apenas_digitos) >= 47 and len(apenas_digitos) <= 48:
+            # Verifica se linha tem pouco texto além de números (evita linhas com descrição)
+            if len(linha_limpa.replace(" ", "")) == len(apenas_digitos):
+                codigo_pagamento = linha_limpa
+                log(f"💳 Código de Pagamento encontrado: {codigo_pagamento}")
+                break
+
+    # 2) Extrai órgão autuador - NOVA ABORDAGEM: pega da linha da multa
+    # Procura pela linha que contém DETRAN/DEMUTRAN | código | descrição
+    for i, linha in enumerate(linhas):
+        if ("DETRAN" in linha or "DEMUTRAN" in linha) and "|" in linha:
+            # Extrai o órgão que está antes do primeiro "|"
+            match_orgao = re.match(r"^([^|]+)", linha)
+            if match_orgao:
+                orgao = match_orgao.group(1).strip()
+                log(f"🏢 Órgão Autuador encontrado (linha da multa): {orgao}")
+                break
+
+    # FALLBACK: Se não encontrou na linha da multa, procura por padrões
+    if orgao == "-":
+        # Procura por padrões de órgãos específicos
+        padrao_orgaos = [
+            (r"DEMUTRAN\s+[A-Z]+", "DEMUTRAN"),
+            (r"DETRAN-[A-Z]{2}", "DETRAN"),
+            (r"SEMOB", "SEMOB"),
+            (r"POL[IÍ]CIA\s+MILITAR", "PM"),
+            (r"POL[IÍ]CIA\s+FEDERAL", "PF"),
+            (r"POL[IÍ]CIA\s+RODOVI[ÁA]RIA", "PRF"),
+        ]
+
+        for pattern, fallback in padrao_orgaos:
+            match = re.search(pattern, texto, re.IGNORECASE)
+            if match:
+                orgao = match.group(0).strip()
+                log(f"🏢 Órgão Autuador encontrado (padrão): {orgao}")
+                break
+
+    # 3) Extrai descrição: pega a linha logo após "Descrição (Taxa / Multa)"
+    for i, linha in enumerate(linhas):
+        linha_low = linha.lower()
+        if "descri" in linha_low and "taxa" in linha_low:
+            for proxima in linhas[i+1:]:
+                proxima_limpa = proxima.strip()
+                if proxima_limpa:
+                    descricao_pdf = proxima_limpa
                     break
-            
-            # 4) Extrai datas - procura especificamente pela linha da multa com as duas datas
-            datas_encontradas = re.findall(r"\d{2}/\d{2}/\d{4}", texto)
-            log(f"📅 Datas encontradas no PDF: {datas_encontradas}")
-            
-            # Exibe contexto das linhas para debug
-            log("📄 Linhas do PDF (primeiras 50):")
-            for idx, l in enumerate(linhas[:50]):
-                log(f"   [{idx}] {l}")
-            
-            # MÉTODO PRINCIPAL: Procura pela linha com DETRAN, código da infração e as 2 datas
-            # Exemplo: DETRAN-CE | V607910965 | 07455 | TRANSITAR EM VELOCIDADE 06/11/2025 30/01/2026 130,16 104,13
-            data_infra_encontrada = False
-            vencimento_encontrado = False
-            
-            for i, linha in enumerate(linhas):
-                linha_strip = linha.strip()
-                
-                # Procura por linha que contenha padrão de multa DETRAN-CE | código | descrição + duas datas
-                if ("DETRAN" in linha or "DEMUTRAN" in linha or "|" in linha) and re.search(r"\d{2}/\d{2}/\d{4}", linha):
-                    # Encontra todas as datas nesta linha específica
-                    datas_na_linha = re.findall(r"\d{2}/\d{2}/\d{4}", linha)
-                    
-                    if len(datas_na_linha) >= 2:
-                        # A primeira data é a infração, a segunda é o vencimento
-                        data_infracao_pdf = datas_na_linha[0]
-                        vencimento_pdf = datas_na_linha[1]
-                        
-                        log(f"✅ LINHA DA MULTA ENCONTRADA [{i}]: {linha_strip}")
-                        log(f"✅ Data Infração: {data_infracao_pdf}")
-                        log(f"✅ Vencimento: {vencimento_pdf}")
-                        
-                        data_infra_encontrada = True
-                        vencimento_encontrado = True
-                        break
-            
-            # MÉTODO ALTERNATIVO 1: Se não encontrou na linha da multa, procura pelos cabeçalhos
-            if not data_infra_encontrada or not vencimento_encontrado:
-                log("⚠️  Método principal não encontrou. Tentando método alternativo com cabeçalhos...")
-                
-                for i, linha in enumerate(linhas):
-                    linha_low = linha.lower().strip()
-                    
-                    # Procura pelo cabeçalho da tabela: "Descrição ... Data Infração Vencimento"
-                    if "data" in linha_low and "infra" in linha_low and "venci" in linha_low:
-                        log(f"🔍 Cabeçalho da tabela encontrado na linha {i}: '{linha}'")
-                        
-                        # A linha seguinte deve conter os dados da multa
-                        for j in range(1, 6):
-                            if i+j < len(linhas):
-                                proxima = linhas[i+j]
-                                datas_na_linha = re.findall(r"\d{2}/\d{2}/\d{4}", proxima)
-                                
-                                # Filtra datas que não são emissão/processamento (geralmente 2025/2026)
-                                if len(datas_na_linha) >= 2:
-                                    data_infracao_pdf = datas_na_linha[0]
-                                    vencimento_pdf = datas_na_linha[1]
-                                    
-                                    log(f"✅ Dados encontrados na linha +{j}: {proxima.strip()}")
-                                    log(f"✅ Data Infração: {data_infracao_pdf}")
-                                    log(f"✅ Vencimento: {vencimento_pdf}")
-                                    
-                                    data_infra_encontrada = True
-                                    vencimento_encontrado = True
-                                    break
-                        
-                        if data_infra_encontrada:
+            break
+
+    # 4) Extrai datas - procura especificamente pela linha da multa com as duas datas
+    datas_encontradas = re.findall(r"\d{2}/\d{2}/\d{4}", texto)
+    log(f"📅 Datas encontradas no PDF: {datas_encontradas}")
+
+    # Exibe contexto das linhas para debug
+    log("📄 Linhas do PDF (primeiras 50):")
+    for idx, l in enumerate(linhas[:50]):
+        log(f"   [{idx}] {l}")
+
+    # MÉTODO PRINCIPAL: Procura pela linha com DETRAN, código da infração e as 2 datas
+    # Exemplo: DETRAN-CE | V607910965 | 07455 | TRANSITAR EM VELOCIDADE 06/11/2025 30/01/2026 130,16 104,13
+    data_infra_encontrada = False
+    vencimento_encontrado = False
+
+    for i, linha in enumerate(linhas):
+        linha_strip = linha.strip()
+
+        # Procura por linha que contenha padrão de multa DETRAN-CE | código | descrição + duas datas
+        if ("DETRAN" in linha or "DEMUTRAN" in linha or "|" in linha) and re.search(r"\d{2}/\d{2}/\d{4}", linha):
+            # Encontra todas as datas nesta linha específica
+            datas_na_linha = re.findall(r"\d{2}/\d{2}/\d{4}", linha)
+
+            if len(datas_na_linha) >= 2:
+                # A primeira data é a infração, a segunda é o vencimento
+                data_infracao_pdf = datas_na_linha[0]
+                vencimento_pdf = datas_na_linha[1]
+
+                log(f"✅ LINHA DA MULTA ENCONTRADA [{i}]: {linha_strip}")
+                log(f"✅ Data Infração: {data_infracao_pdf}")
+                log(f"✅ Vencimento: {vencimento_pdf}")
+
+                data_infra_encontrada = True
+                vencimento_encontrado = True
+                break
+
+    # MÉTODO ALTERNATIVO 1: Se não encontrou na linha da multa, procura pelos cabeçalhos
+    if not data_infra_encontrada or not vencimento_encontrado:
+        log("⚠️  Método principal não encontrou. Tentando método alternativo com cabeçalhos...")
+
+        for i, linha in enumerate(linhas):
+            linha_low = linha.lower().strip()
+
+            # Procura pelo cabeçalho da tabela: "Descrição ... Data Infração Vencimento"
+            if "data" in linha_low and "infra" in linha_low and "venci" in linha_low:
+                log(f"🔍 Cabeçalho da tabela encontrado na linha {i}: '{linha}'")
+
+                # A linha seguinte deve conter os dados da multa
+                for j in range(1, 6):
+                    if i+j < len(linhas):
+                        proxima = linhas[i+j]
+                        datas_na_linha = re.findall(r"\d{2}/\d{2}/\d{4}", proxima)
+
+                        # Filtra datas que não são emissão/processamento (geralmente 2025/2026)
+                        if len(datas_na_linha) >= 2:
+                            data_infracao_pdf = datas_na_linha[0]
+                            vencimento_pdf = datas_na_linha[1]
+
+                            log(f"✅ Dados encontrados na linha +{j}: {proxima.strip()}")
+                            log(f"✅ Data Infração: {data_infracao_pdf}")
+                            log(f"✅ Vencimento: {vencimento_pdf}")
+
+                            data_infra_encontrada = True
+                            vencimento_encontrado = True
                             break
-            
-            # MÉTODO ALTERNATIVO 2: Usa lógica de ordenação e filtragem de datas
-            if not data_infra_encontrada or not vencimento_encontrado:
-                log("⚠️  Métodos anteriores falharam. Usando lógica de ordenação...")
-                
-                if len(datas_encontradas) >= 2:
+
+                if data_infra_encontrada:
+                    break
+
+    # MÉTODO ALTERNATIVO 2: Usa lógica de ordenação e filtragem de datas
+    if not data_infra_encontrada or not vencimento_encontrado:
+        log("⚠️  Métodos anteriores falharam. Usando lógica de ordenação...")
+
+        if len(datas_encontradas) >= 2:
+            try:
+                # Remove datas de emissão/geração (geralmente a mais recente e a de hoje)
+                # E remove datas muito antigas (leis/normas)
+                datas_validas = []
+                hoje = datetime.now()
+
+                for d in datas_encontradas:
                     try:
-                        # Remove datas de emissão/geração (geralmente a mais recente e a de hoje)
-                        # E remove datas muito antigas (leis/normas)
-                        datas_validas = []
-                        hoje = datetime.now()
-                        
-                        for d in datas_encontradas:
-                            try:
-                                dt = datetime.strptime(d, "%d/%m/%Y")
-                                # Filtra datas entre 2020 e 2030 (período válido para multas)
-                                if 2020 <= dt.year <= 2030:
-                                    datas_validas.append((d, dt))
-                            except:
-                                pass
-                        
-                        # Ordena por data
-                        datas_validas.sort(key=lambda x: x[1])
-                        log(f"📅 Datas válidas ordenadas: {[d[0] for d in datas_validas]}")
-                        
-                        if len(datas_validas) >= 2:
-                            # Infração geralmente é a data mais antiga (quando ocorreu)
-                            # Vencimento é posterior
-                            data_infracao_pdf = datas_validas[0][0]
-                            
-                            # Vencimento: procura uma data que seja posterior à infração
-                            for d, dt in datas_validas[1:]:
-                                if dt > datas_validas[0][1]:
-                                    vencimento_pdf = d
-                                    break
-                            
-                            log(f"🔄 Data Infração: {data_infracao_pdf}")
-                            log(f"🔄 Vencimento: {vencimento_pdf}")
-                    
-                    except Exception as e:
-                        log(f"❌ Erro no método de ordenação: {e}")
-
-            # Fallback final: se ainda não encontrou, usa últimas datas disponíveis
-            if (data_infracao_pdf == "-" or vencimento_pdf == "-") and len(datas_encontradas) >= 2:
-                if data_infracao_pdf == "-":
-                    data_infracao_pdf = datas_encontradas[0]
-                if vencimento_pdf == "-":
-                    vencimento_pdf = datas_encontradas[-1]
-                log(f"📅 Datas determinadas por fallback: Infração={data_infracao_pdf}, Vencimento={vencimento_pdf}")
-
-            # 5) Combina código de pagamento + descrição na variável final
-            resultado_pdf = descricao_pdf
-            if codigo_pagamento != "-":
-                if descricao_pdf != "-":
-                    resultado_pdf = f"{codigo_pagamento} | {descricao_pdf}"
-                else:
-                    resultado_pdf = codigo_pagamento
-
-        return orgao, resultado_pdf, data_infracao_pdf, vencimento_pdf
-    except Exception as e:
-        log(f"⚠️ Erro ao ler PDF: {e}")
-        return "-", "-", "-", "-"
+                        dt = datetime.strptime(d, "%d/%m/%Y")
+                        # Filtra datas entre 2020 e 2030 (período válido para multas)
+                        if 2020 <= dt.year <= 2030:
+                            datas_validas.append((d, dt))
+                    except:
+                        pass
+
+                # Ordena por data
+                datas_validas.sort(key=lambda x: x[1])
+                log(f"📅 Datas válidas ordenadas: {[d[0] for d in datas_validas]}")
+
+                if len(datas_validas) >= 2:
+                    # Infração geralmente é a data mais antiga (quando ocorreu)
+                    # Vencimento é posterior
+                    data_infracao_pdf = datas_validas[0][0]
+
+                    # Vencimento: procura uma data que seja posterior à infração
+                    for d, dt in datas_validas[1:]:
+                        if dt > datas_validas[0][1]:
+                            vencimento_pdf = d
+                            break
+
+                    log(f"🔄 Data Infração: {data_infracao_pdf}")
+                    log(f"🔄 Vencimento: {vencimento_pdf}")
+
+            except Exception as e:
+                log(f"❌ Erro no método de ordenação: {e}")
+
+    # Fallback final: se ainda não encontrou, usa últimas datas disponíveis
+    if (data_infracao_pdf == "-" or vencimento_pdf == "-") and len(datas_encontradas) >= 2:
+        if data_infracao_pdf == "-":
+            data_infracao_pdf = datas_encontradas[0]
+        if vencimento_pdf == "-":
+            vencimento_pdf = datas_encontradas[-1]
+        log(f"📅 Datas determinadas por fallback: Infração={data_infracao_pdf}, Vencimento={vencimento_pdf}")
+
+    # 5) Combina código de pagamento + descrição na variável final
+    resultado_pdf = descricao_pdf
+    if codigo_pagamento != "-":
+        if descricao_pdf != "-":
+            resultado_pdf = f"{codigo_pagamento} | {descricao_pdf}"
+        else:
+            resultado_pdf = codigo_pagamento
+
+    return orgao, resultado_pdf, data_infracao_pdf, vencimento_pdf
+
+
+WORKERS_REPROCESSAMENTO = max(1, int(os.getenv("DETRAN_REPROCESSAR_WORKERS", str(os.cpu_count() or 1))))
+LOTE_REPROCESSAMENTO = 16
+
+
+def listar_pdfs_arquivo(pasta_boletos="boletos"):
+    """Caminhos de todos os PDFs em boletos/<data>/, em ordem de pasta e nome."""
+    caminhos = []
+    for subpasta in sorted(os.listdir(pasta_boletos)):
+        caminho_subpasta = os.path.join(pasta_boletos, subpasta)
+        if os.path.isdir(caminho_subpasta):
+            for arquivo in sorted(os.listdir(caminho_subpasta)):
+                if arquivo.endswith('.pdf'):
+                    caminhos.append(os.path.join(caminho_subpasta, arquivo))
+    return caminhos
+
+
+def _extrair_com_tempo(caminho_pdf):
+    """extrair_boleto_do_pdf + tempo gasto (roda dentro do processo worker)."""
+    inicio = time.perf_counter()
+    dados, registros = extrair_boleto_do_pdf(caminho_pdf)
+    return caminho_pdf, dados, registros, (time.perf_counter() - inicio) * 1000
+
+
+def extrair_pdfs_em_paralelo(caminhos, workers=WORKERS_REPROCESSAMENTO, tamanho_lote=LOTE_REPROCESSAMENTO):
+    """Gera (caminho, dados_pdf, registros_ait, ms) para cada PDF, na ordem de `caminhos`.
+
+    Com workers > 1 o parsing é distribuído num pool de processos em lotes de
+    `tamanho_lote` arquivos; os resultados chegam conforme cada lote termina.
+    """
+    if workers <= 1 or len(caminhos) <= 1:
+        for caminho in caminhos:
+            yield _extrair_com_tempo(caminho)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        yield from executor.map(_extrair_com_tempo, caminhos, chunksize=max(1, tamanho_lote))
+
+
+COLUNAS_PDF = ["Órgão Autuador", "Código de pagamento em barra", "Data Infração", "Data Vencimento"]
 
-def reprocessar_pdfs_e_atualizar_excel():
-    """Reprocessa todos os PDFs existentes e atualiza o Excel"""
+
+def _vazio(serie):
+    return serie.isna() | (serie.astype(str).str.strip() == "-")
+
+
+def aplicar_pdfs_no_dataframe(df, resultados):
+    """Aplica os dados dos PDFs nas linhas do Excel.
+
+    Devolve {caminho_pdf: [linhas do Excel atualizadas por ele]} (linha 2 é
+    a primeira depois do cabeçalho).
+
+    `resultados` é uma lista de (caminho, dados_pdf, registros_ait). Cada
+    linha de AIT do boleto vai para as linhas do Excel com o mesmo AIT
+    (índice AIT -> linhas; o PDF mais recente vence). PDFs sem linha de AIT
+    preenchem, na ordem, as linhas ainda sem órgão e sem código, como antes.
+    Cada grupo é gravado com uma única atribuição no DataFrame.
+    """
+    for coluna in COLUNAS_PDF:
+        if coluna not in df.columns:
+            df[coluna] = "-"
+    df[COLUNAS_PDF] = df[COLUNAS_PDF].astype(object)
+
+    linhas_ait = []
+    sem_ait = []
+    for caminho_pdf, dados_pdf, registros in resultados:
+        if registros:
+            for r in registros:
+                linhas_ait.append((
+                    caminho_pdf, normalizar_ait(r["ait"]), r["orgao"],
+                    _compor_codigo("-", r["codigo_pagamento"], r["linha"]),
+                    r["data_infracao"], r["vencimento"],
+                ))
+        elif not (dados_pdf[0] == "-" and dados_pdf[1] == "-"):
+            sem_ait.append((caminho_pdf,) + tuple(dados_pdf))
+
+    linhas_por_pdf = {caminho_pdf: [] for caminho_pdf, _, _ in resultados}
+    casadas = pd.Series(False, index=df.index)
+    if linhas_ait and "AIT" in df.columns:
+        novos = (pd.DataFrame(linhas_ait, columns=["_caminho", "_ait"] + COLUNAS_PDF)
+                 .drop_duplicates("_ait", keep="last")
+                 .set_index("_ait"))
+        chaves = df["AIT"].astype(str).str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+        alvo = novos.reindex(chaves.values)
+        alvo.index = df.index
+        casadas = alvo["Órgão Autuador"].notna()
+        for coluna in ("Data Infração", "Data Vencimento"):
+            # Data não encontrada no PDF não apaga a do Excel
+            alvo[coluna] = alvo[coluna].where(alvo[coluna] != "-", df[coluna])
+        df.loc[casadas, COLUNAS_PDF] = alvo.loc[casadas, COLUNAS_PDF].values
+        for rotulo, caminho_pdf in alvo.loc[casadas, "_caminho"].items():
+            linhas_por_pdf[caminho_pdf].append(df.index.get_loc(rotulo) + 2)
+
+    if sem_ait:
+        livres = df.index[
+            _vazio(df["Órgão Autuador"]) & _vazio(df["Código de pagamento em barra"]) & ~casadas
+        ][:len(sem_ait)]
+        if len(livres):
+            novos = pd.DataFrame(sem_ait[:len(livres)], columns=["_caminho"] + COLUNAS_PDF, index=livres)
+            for coluna in ("Data Infração", "Data Vencimento"):
+                novos[coluna] = novos[coluna].where(novos[coluna] != "-", df.loc[livres, coluna])
+            df.loc[livres, COLUNAS_PDF] = novos[COLUNAS_PDF].values
+            for rotulo, caminho_pdf in novos["_caminho"].items():
+                linhas_por_pdf[caminho_pdf].append(df.index.get_loc(rotulo) + 2)
+
+    return linhas_por_pdf
+
+
+def reprocessar_pdfs_e_atualizar_excel(workers=WORKERS_REPROCESSAMENTO, tamanho_lote=LOTE_REPROCESSAMENTO,
+                                       completo=False, simulacao=False):
+    """Reprocessa os PDFs novos ou alterados e atualiza o Excel
+
+    O parsing roda em `workers` processos (DETRAN_REPROCESSAR_WORKERS); as
+    linhas são casadas pelo AIT (aplicar_pdfs_no_dataframe). O manifesto
+    (manifesto_pdfs.py) pula os PDFs já aplicados; `completo` reprocessa
+    tudo e `simulacao` só mostra o que seria feito.
+    """
     log("\n🔄 REPROCESSANDO PDFs EXISTENTES...")
     
     # Verifica se existe Excel
@@ -648,120 +1056,105 @@ def reprocessar_pdfs_e_atualizar_excel():
     
     log(f"📊 Excel carregado: {len(df)} multas")
     
-    # Mapeia PDFs por placa
-    pdfs_encontrados = {}
     pasta_boletos = "boletos"
     
     if not os.path.exists(pasta_boletos):
         log(f"❌ Pasta {pasta_boletos} não encontrada!")
         return
     
-    # Busca todos os PDFs
-    for subpasta in os.listdir(pasta_boletos):
-        caminho_subpasta = os.path.join(pasta_boletos, subpasta)
-        if os.path.isdir(caminho_subpasta):
-            for arquivo in os.listdir(caminho_subpasta):
-                if arquivo.endswith('.pdf'):
-                    caminho_completo = os.path.join(caminho_subpasta, arquivo)
-                    # Tenta extrair placa do nome do arquivo (Extrato_6601163057.pdf)
-                    # Na verdade, vamos processar todos os PDFs e associar pela data
-                    pdfs_encontrados[caminho_completo] = None
+    # Busca todos os PDFs e separa o que já foi aplicado
+    todos_pdfs = listar_pdfs_arquivo(pasta_boletos)
+    manifesto = ManifestoReprocessamento()
+    manifesto.conferir_planilha(EXCEL_ARQUIVO)
+    if completo:
+        novos, alterados, inalterados = todos_pdfs, [], []
+        manifesto.classificar([], EXTRATOR_VERSAO)
+    else:
+        novos, alterados, inalterados = manifesto.classificar(todos_pdfs, EXTRATOR_VERSAO)
+    pdfs_encontrados = novos + alterados
     
-    log(f"📄 Encontrados {len(pdfs_encontrados)} PDFs")
+    log(f"📄 Encontrados {len(todos_pdfs)} PDFs: {len(novos)} novos, {len(alterados)} alterados, "
+        f"{len(inalterados)} já aplicados{' (--full: reprocessando todos)' if completo else ''}")
+    if simulacao:
+        tamanho_total = sum(os.path.getsize(c) for c in pdfs_encontrados)
+        log(f"🧪 Simulação: {len(pdfs_encontrados)} PDF(s) pendente(s), {tamanho_total / 1024:.0f} KB")
+        for caminho in pdfs_encontrados[:20]:
+            log(f"   {'✳️' if caminho in novos else '✏️'} {caminho}")
+        if len(pdfs_encontrados) > 20:
+            log(f"   ... e mais {len(pdfs_encontrados) - 20}")
+        return
+    if not pdfs_encontrados:
+        log("✅ Nada a reprocessar")
+        try:
+            manifesto.esquecer_ausentes(todos_pdfs)
+            manifesto.salvar()  # guarda mtimes atualizados de PDFs só "tocados"
+        except OSError as e:
+            log(f"⚠️ Erro ao salvar manifesto: {e}")
+        return
+    log(f"⚙️ {workers} processo(s), lotes de {tamanho_lote}")
     
-    # Contador de atualizações
-    atualizados = 0
+    cache = cache_padrao()
+    antes_cache = cache.estatisticas() if cache is not None else None
+    inicio_total = time.perf_counter()
+    tempo_parsing_ms = 0.0
+    resultados = []
     
-    # Para cada PDF, extrai dados
-    for caminho_pdf in pdfs_encontrados.keys():
-        log(f"\n📑 Processando: {os.path.basename(caminho_pdf)}")
-        
-        orgao, codigo_barras, data_infracao, data_vencimento = extrair_dados_do_pdf(caminho_pdf)
-        
+    # Para cada PDF, extrai dados (em paralelo; resultados chegam em ordem)
+    for caminho_pdf, dados_pdf, registros, ms in extrair_pdfs_em_paralelo(pdfs_encontrados, workers, tamanho_lote):
+        tempo_parsing_ms += ms
+        orgao, codigo_barras = dados_pdf[0], dados_pdf[1]
         if orgao == "-" and codigo_barras == "-":
-            log(f"⚠️ Nenhum dado extraído de {os.path.basename(caminho_pdf)}")
-            continue
-        
-        log(f"   Órgão: {orgao}")
-        log(f"   Código: {codigo_barras[:50]}..." if len(codigo_barras) > 50 else f"   Código: {codigo_barras}")
-        log(f"   Data Infração: {data_infracao}")
-        log(f"   Data Vencimento: {data_vencimento}")
-        
-        # Procura no Excel pela data de vencimento ou data de infração
-        # Como não temos identificador único, vamos atualizar todas as linhas com órgão vazio
-        # e que tenham datas próximas ou vazias
-        
-        for idx in df.index:
-            # Se órgão já está preenchido, pula
-            if pd.notna(df.loc[idx, "Órgão Autuador"]) and df.loc[idx, "Órgão Autuador"] != "-":
-                continue
-            
-            # Se código já está preenchido, pula
-            if pd.notna(df.loc[idx, "Código de pagamento em barra"]) and df.loc[idx, "Código de pagamento em barra"] != "-":
-                continue
-            
-            # Atualiza primeira linha vazia encontrada
-            df.loc[idx, "Órgão Autuador"] = orgao
-            df.loc[idx, "Código de pagamento em barra"] = codigo_barras
-            
-            if data_infracao != "-":
-                df.loc[idx, "Data Infração"] = data_infracao
-            if data_vencimento != "-":
-                df.loc[idx, "Data Vencimento"] = data_vencimento
-            
-            atualizados += 1
-            log(f"   ✅ Atualizado linha {idx + 2}")  # +2 porque índice começa em 0 e tem cabeçalho
-            break  # Atualiza apenas 1 linha por PDF
+            log(f"⚠️ Nenhum dado extraído de {os.path.basename(caminho_pdf)} ({ms:.0f} ms)")
+        else:
+            log(f"📑 {os.path.basename(caminho_pdf)} ({ms:.0f} ms): {orgao}, {len(registros)} AIT(s)")
+        resultados.append((caminho_pdf, dados_pdf, registros))
+    
+    # Casa os PDFs com as linhas pelo AIT e grava tudo de uma vez
+    inicio_aplicacao = time.perf_counter()
+    linhas_por_pdf = aplicar_pdfs_no_dataframe(df, resultados)
+    atualizados = sum(len(linhas) for linhas in linhas_por_pdf.values())
+    log(f"🔗 {atualizados} linha(s) atualizadas em {(time.perf_counter() - inicio_aplicacao) * 1000:.0f} ms")
     
-    # Salva Excel atualizado
+    duracao = time.perf_counter() - inicio_total
+    if pdfs_encontrados:
+        log(f"\n⏱️ {len(pdfs_encontrados)} PDFs em {duracao:.2f}s "
+            f"({len(pdfs_encontrados) / max(duracao, 1e-9):.1f} PDFs/s; "
+            f"média {tempo_parsing_ms / len(pdfs_encontrados):.0f} ms por arquivo, "
+            f"{tempo_parsing_ms / 1000:.2f}s de parsing somado)")
+    if antes_cache is not None:
+        depois_cache = cache.estatisticas()
+        log(f"♻️ Cache de PDFs: {depois_cache['acertos'] - antes_cache['acertos']} acertos, "
+            f"{depois_cache['faltas'] - antes_cache['faltas']} faltas "
+            f"({depois_cache['entradas']} entradas)")
+    
+    # Salva Excel atualizado (formatação aplicada na mesma gravação)
     if atualizados > 0:
         try:
-            df.to_excel(EXCEL_ARQUIVO, index=False, sheet_name="Resultado DETRAN", engine='openpyxl')
+            escrever_dataframe(
+                EXCEL_ARQUIVO, df,
+                larguras=larguras_automaticas(df),
+                colunas_esquerda=(),
+                cor_cabecalho="4472C4",
+                quebrar_texto=False,
+            )
+            manifesto.marcar_planilha(EXCEL_ARQUIVO)
             log(f"\n✅ Excel atualizado com sucesso! {atualizados} multas atualizadas")
-            
-            # Aplica formatação
-            try:
-                wb = openpyxl.load_workbook(EXCEL_ARQUIVO)
-                ws = wb.active
-                
-                # Formata cabeçalho
-                for cell in ws[1]:
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                
-                # Bordas
-                thin_border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-                for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-                    for cell in row:
-                        cell.border = thin_border
-                
-                # Congela primeira linha
-                ws.freeze_panes = "A2"
-                
-                # Ajusta largura
-                for col in ws.columns:
-                    max_length = 0
-                    column = col[0].column_letter
-                    for cell in col:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    ws.column_dimensions[column].width = min(max_length + 2, 50)
-                
-                wb.save(EXCEL_ARQUIVO)
-                log("✅ Formatação aplicada")
-            except Exception as e:
-                log(f"⚠️ Erro ao formatar Excel: {e}")
         except Exception as e:
             log(f"❌ Erro ao salvar Excel: {e}")
+            # Sem Excel salvo, os PDFs continuam pendentes no manifesto
+            return
     else:
         log("\n⚠️ Nenhuma multa foi atualizada")
 
+    for caminho_pdf, linhas in linhas_por_pdf.items():
+        manifesto.registrar(caminho_pdf, EXTRATOR_VERSAO, linhas)
+    manifesto.esquecer_ausentes(todos_pdfs)
+    try:
+        manifesto.salvar()
+        log(f"🗂️ Manifesto atualizado: {manifesto.caminho}")
+    except OSError as e:
+        log(f"⚠️ Erro ao salvar manifesto: {e}")
+
 # ================= PROCESSAMENTO =================
 
 def extrair_pendencias(texto):
@@ -769,7 +1162,7 @@ def extrair_pendencias(texto):
     return int(match.group(1)) if match else 0
 
 def salvar_no_excel(multas_lista):
-    """Salva multas no Excel com formatação"""
+    """Salva multas no Excel com formatação (uma gravação, em streaming)"""
     if not multas_lista:
         log("⚠️ Nenhuma multa para salvar")
         return
@@ -781,106 +1174,288 @@ def salvar_no_excel(multas_lista):
         "Órgão Autuador", "Código de pagamento em barra"
     ]
     
-    df_novo = pd.DataFrame(multas_lista)
-    
-    # Reordena as colunas para garantir ordem correta
-    # Inclui apenas colunas que existem no DataFrame
-    colunas_existentes = [col for col in colunas_ordem if col in df_novo.columns]
-    df_novo = df_novo[colunas_existentes]
+    # Inclui apenas colunas que existem em alguma multa
+    presentes = set()
+    for multa in multas_lista:
+        presentes.update(multa)
+    colunas_existentes = [col for col in colunas_ordem if col in presentes]
     
     try:
-        # Tenta fechar arquivo se estiver aberto
-        import os
-        if os.path.exists(EXCEL_ARQUIVO):
-            try:
-                import gc
-                gc.collect()
-            except:
-                pass
-        
-        # Salva o novo DataFrame
-        df_novo.to_excel(EXCEL_ARQUIVO, index=False, sheet_name="Resultado DETRAN", engine='openpyxl')
+        escrever_planilha(
+            EXCEL_ARQUIVO,
+            colunas_existentes,
+            ([multa.get(col) for col in colunas_existentes] for multa in multas_lista),
+        )
+        log(f"✅ Dados salvos em: {EXCEL_ARQUIVO}")
     except PermissionError:
         log(f"⚠️ Arquivo {EXCEL_ARQUIVO} está aberto. Feche e tente novamente!")
-        return
     except Exception as e:
         log(f"⚠️ Erro ao salvar Excel: {e}")
-        return
+
+def montar_multa(motivo, placa, numero):
+    """Converte o texto de uma linha da tabela de multas no registro da planilha."""
+    # DEBUG: Mostra o texto bruto
+    log(f"\n🔍 TEXTO BRUTO MULTA {numero}:")
+    log(f"  {motivo[:200]}...")
+    
+    # Extrai AIT
+    ait = "-"
+    match_ait = re.search(r"([A-Z]{1,3}\d{6,})\s*--", motivo)
+    if match_ait:
+        ait = match_ait.group(1)
+    
+    # Extrai datas
+    datas = re.findall(r"\d{2}/\d{2}/\d{4}", motivo)
+    log(f"  🔍 Datas encontradas (ordem): {datas}")
+    
+    # Geralmente vem: [vencimento, data_infracao] - vamos inverter
+    if len(datas) >= 2:
+        # Assumindo que a primeira data é o vencimento e a segunda é a infração
+        # Se a primeira data for MAIOR que a segunda, está correto
+        # Senão, inverte
+        try:
+            data1 = datetime.strptime(datas[0], "%d/%m/%Y")
+            data2 = datetime.strptime(datas[1], "%d/%m/%Y")
+            
+            # Se data1 > data2, então data1 é vencimento e data2 é infração
+            if data1 > data2:
+                vencimento = datas[0]
+                data_infracao = datas[1]
+            else:
+                # Senão, assume ordem normal
+                data_infracao = datas[0]
+                vencimento = datas[1]
+        except:
+            # Se falhar o parse, usa ordem padrão
+            data_infracao = datas[0]
+            vencimento = datas[1]
+    elif len(datas) == 1:
+        data_infracao = datas[0]
+        vencimento = "-"
+    else:
+        data_infracao = "-"
+        vencimento = "-"
+    
+    # Extrai valores
+    valores = re.findall(r"R\$\s*([\d.,]+)", motivo)
+    valor = "-"
+    valor_a_pagar = "-"
+    if len(valores) == 1:
+        valor = f"R$ {valores[0]}"
+        valor_a_pagar = f"R$ {valores[0]}"
+    elif len(valores) >= 2:
+        valor = f"R$ {valores[-2]}"
+        valor_a_pagar = f"R$ {valores[-1]}"
+    
+    # Extrai descrição - versão SIMPLIFICADA
+    # Remove checkbox, AIT, datas e valores
+    descricao = motivo
+    # Remove checkbox vazio no início
+    descricao = re.sub(r"^\s*\□?\s*", "", descricao)
+    # Remove AIT
+    descricao = re.sub(r"[A-Z]{1,3}\d{6,}\s*--\s*", "", descricao)
+    # Remove datas
+    descricao = re.sub(r"\d{2}/\d{2}/\d{4}", "", descricao)
+    # Remove valores
+    descricao = re.sub(r"R\$\s*[\d.,]+", "", descricao)
+    # Remove espaços extras
+    descricao = re.sub(r"\s+", " ", descricao).strip()
+    
+    if not descricao:
+        descricao = "-"
     
-    # Formatar Excel
+    # Exibe informações da multa
+    log(f"\n✏️ MULTA {numero}")
+    log(f"  AIT: {ait}")
+    log(f"  📋 Descrição: {descricao}")
+    log(f"  📅 Data: {data_infracao} | Vencimento: {vencimento}")
+    log(f"  💰 Valor: {valor} → A Pagar: {valor_a_pagar}")
+    
+    return {
+        "Placa": placa,
+        "#": numero,
+        "AIT": ait,
+        "AIT Originária": "-",
+        "Motivo": descricao,
+        "Data Infração": data_infracao,
+        "Data Vencimento": vencimento,
+        "Valor": valor,
+        "Valor a Pagar": valor_a_pagar,
+        "Órgão Autuador": "-",
+        "Código de pagamento em barra": "-"
+    }
+
+def _compor_codigo(codigo_pix, codigo_pagamento, descricao):
+    """Código PIX | código de barras | descrição, omitindo o que faltar."""
+    return " | ".join(p for p in (codigo_pix, codigo_pagamento, descricao) if p and p != "-") or "-"
+
+
+def aplicar_dados_boleto(multas_lista, quantidade_multas_grupo, codigo_pix, dados_pdf, registros=None):
+    """Aplica órgão, código e datas do boleto nas multas do grupo selecionado.
+
+    Cada multa cujo AIT aparece numa linha do boleto (`registros`, de
+    extrair_boleto_do_pdf) recebe os dados da própria linha; as demais
+    recebem os dados gerais do boleto, como antes.
+    """
+    orgao_autuador, descricao_pdf, data_infracao_pdf, vencimento_pdf = dados_pdf
+    if descricao_pdf == "-" and codigo_pix != "-":
+        descricao_pdf = codigo_pix
+    elif codigo_pix != "-":
+        # Adiciona código PIX na descrição se encontrou
+        descricao_pdf = f"{codigo_pix} | {descricao_pdf}"
+
+    por_ait = indexar_por_ait(registros or [])
+
+    # Atualiza APENAS as multas deste grupo (últimas N multas adicionadas)
+    indice_inicio = len(multas_lista) - quantidade_multas_grupo
+    casadas = 0
+    
+    for j in range(indice_inicio, len(multas_lista)):
+        multa = multas_lista[j]
+        registro = por_ait.get(normalizar_ait(multa.get("AIT", "")))
+        if registro is not None:
+            casadas += 1
+            multa["Órgão Autuador"] = registro["orgao"]
+            multa["Código de pagamento em barra"] = _compor_codigo(
+                codigo_pix, registro["codigo_pagamento"], registro["linha"])
+            infracao, vencimento = registro["data_infracao"], registro["vencimento"]
+        else:
+            multa["Órgão Autuador"] = orgao_autuador
+            multa["Código de pagamento em barra"] = descricao_pdf
+            infracao, vencimento = data_infracao_pdf, vencimento_pdf
+        # Atualiza datas com as do PDF se foram encontradas
+        if infracao != "-":
+            multa["Data Infração"] = infracao
+        if vencimento != "-":
+            multa["Data Vencimento"] = vencimento
+
+    if por_ait:
+        log(f"🔗 {casadas}/{quantidade_multas_grupo} multa(s) casadas pelo AIT com as linhas do boleto")
+
+SELETORES_COPIAR_PIX = [
+    'button:has-text("Copiar Chave Pix")',
+    'button:has-text("Copiar")',
+    'button[class*="btn"]:has-text("Copiar")',
+    'a:has-text("Copiar Chave Pix")',
+    'button:text-is("Copiar Chave Pix")',
+]
+
+SELETORES_BAIXAR_BOLETO = [
+    'button:has-text("Baixar boleto")',
+    'button:has-text("Baixar boleto para pagamento à vista")',
+    'button:has-text("para pagamento à vista")',
+    'a:has-text("Baixar boleto")',
+]
+
+def obter_codigo_pix(page, medidor=None):
+    """Clica em "Copiar Chave Pix" e extrai o código PIX Copia e Cola."""
     try:
-        wb = openpyxl.load_workbook(EXCEL_ARQUIVO)
-        ws = wb.active
-        
-        header_fill = PatternFill("solid", fgColor="1F4E78")
-        header_font = Font(bold=True, color="FFFFFF")
-        center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        left = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        border = Border(
-            left=Side(style="thin"), right=Side(style="thin"),
-            top=Side(style="thin"), bottom=Side(style="thin")
-        )
+        botao_encontrado = False
+        for seletor in SELETORES_COPIAR_PIX:
+            try:
+                botao = page.locator(seletor).first
+                if botao.is_visible():
+                    botao.click()
+                    log(f"✅ Clicou em 'Copiar Chave Pix' usando seletor: {seletor}")
+                    botao_encontrado = True
+                    break
+            except:
+                continue
         
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center
-            cell.border = border
+        if not botao_encontrado:
+            log("⚠️ Botão 'Copiar Chave Pix' não encontrado, tentando extrair direto...")
         
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                cell.border = border
-                # Coluna E (Motivo) e K (Código barras) ficam alinhadas à esquerda
-                cell.alignment = left if cell.column in (5, 11) else center
+        # Extrai o código PIX que foi copiado (espera o código aparecer)
+        return extrair_codigo_pix_copia_cola(page, medidor)
         
-        # Define largura das colunas
-        larguras = {
-            "A": 12,  # Placa
-            "B": 5,   # #
-            "C": 15,  # AIT
-            "D": 18,  # AIT Originária
-            "E": 55,  # Motivo
-            "F": 14,  # Data Infração
-            "G": 14,  # Data Vencimento
-            "H": 16,  # Valor
-            "I": 16,  # Valor a Pagar
-            "J": 18,  # Órgão Autuador
-            "K": 55   # Código de pagamento em barra
-        }
-        for col, w in larguras.items():
-            ws.column_dimensions[col].width = w
+    except Exception as e:
+        log(f"⚠️ Erro ao clicar em 'Copiar Chave Pix': {e}")
+        return "-"
+
+def clicar_baixar_boleto(page):
+    """Clica em "Baixar boleto para pagamento à vista"."""
+    try:
+        for seletor in SELETORES_BAIXAR_BOLETO:
+            try:
+                botao = page.locator(seletor).first
+                if botao.is_visible():
+                    botao.click()
+                    log(f"💵 Clicou em 'Baixar boleto' usando seletor: {seletor}")
+                    return True
+            except:
+                continue
         
-        ws.freeze_panes = "A2"
-        wb.save(EXCEL_ARQUIVO)
-        log(f"✅ Dados salvos em: {EXCEL_ARQUIVO}")
+        log("⚠️ Botão 'Baixar boleto' não encontrado")
+            
     except Exception as e:
-        log(f"⚠️ Erro ao formatar Excel: {e}")
+        log(f"⚠️ Erro ao clicar em 'Baixar boleto': {e}")
+    return False
 
-def processar_veiculo(browser, veiculo, indice):
-    log("\n" + "=" * 50)
-    log(f"🚗 CONSULTA {indice} | {veiculo['placa']}")
+def baixar_boleto(page, pasta_boletos, medidor=None):
+    """Clica em "Baixar boleto", espera o download e salva em pasta_boletos.
 
-    # Cria pasta de download com data de hoje
+    Retorna o caminho ou None.
+    """
+    try:
+        # O clique acontece dentro do expect_download: termina assim que o download começa
+        with medir(medidor, "download boleto", TETO_DOWNLOAD_BOLETO):
+            with page.expect_download(timeout=TETO_DOWNLOAD_BOLETO) as download_info:
+                if not clicar_baixar_boleto(page):
+                    raise RuntimeError("botão 'Baixar boleto' indisponível")
+                log("⏳ Aguardando download do boleto...")
+        
+        download = download_info.value
+        nome_arquivo = download.suggested_filename or f"boleto_{int(time.time())}.pdf"
+        caminho_pdf = os.path.join(pasta_boletos, nome_arquivo)
+        download.save_as(caminho_pdf)
+        log(f"💾 Boleto salvo: {caminho_pdf}")
+        return caminho_pdf
+    except Exception as e:
+        log(f"⚠️ Erro ao baixar boleto: {e}")
+        return None
+
+def preparar_pasta_boletos():
+    """Cria (se preciso) e retorna a pasta de download com a data de hoje."""
     pasta_base = "boletos"
     data_hoje = datetime.now().strftime("%d-%m-%Y")
     pasta_boletos = os.path.join(pasta_base, data_hoje)
     
     if not os.path.exists(pasta_boletos):
-        os.makedirs(pasta_boletos)
+        os.makedirs(pasta_boletos, exist_ok=True)
         log(f"📁 Pasta '{pasta_boletos}' criada")
+    return pasta_boletos
+
+def processar_veiculo(browser, veiculo, indice, pipeline=None):
+    """Consulta um veículo e devolve (total, multas_lista).
+
+    Com `pipeline` (PipelinePDF), o parsing do boleto vai para o pool de
+    processos e o navegador é liberado na hora; quem consome o resultado
+    chama pipeline.concluir(multas_lista) antes de persistir.
+    """
+    log("\n" + "=" * 50)
+    log(f"🚗 CONSULTA {indice} | {veiculo['placa']}")
+
+    # Cria pasta de download com data de hoje
+    pasta_boletos = preparar_pasta_boletos()
 
     context = browser.new_context(
-        accept_downloads=True
+        accept_downloads=True,
+        # Sem service worker, toda requisição passa pelo roteamento de bloqueio
+        service_workers="block",
     )
+    bloqueio = aplicar_bloqueio(context)
     page = context.new_page()
     multas_lista = []
     numero_sequencial = 0
+    medidor = MedidorEsperas(veiculo["placa"])
+    # Escuta as respostas XHR antes de navegar: a listagem pode vir já na consulta
+    captura = CapturaMultas(page)
 
     try:
         page.goto(URL)
         fechar_popup(page)
         acessar_taxas_multas(page)
-        preencher_dados(page, veiculo["placa"], veiculo["renavam"])
+        preencher_dados(page, veiculo["placa"], veiculo["renavam"], medidor)
         clicar_consultar(page)
 
         texto = page.inner_text("body").lower()
@@ -893,224 +1468,59 @@ def processar_veiculo(browser, veiculo, indice):
 
         if qtd_multas > 0:
             abrir_detalhe_multas(page)
-            motivos, total, indices = processar_multas(page)
             
-            # Processa cada multa para salvar no Excel
-            for motivo in motivos:
-                numero_sequencial += 1
-                
-                # DEBUG: Mostra o texto bruto
-                log(f"\n🔍 TEXTO BRUTO MULTA {numero_sequencial}:")
-                log(f"  {motivo[:200]}...")
-                
-                # Extrai AIT
-                ait = "-"
-                match_ait = re.search(r"([A-Z]{1,3}\d{6,})\s*--", motivo)
-                if match_ait:
-                    ait = match_ait.group(1)
-                
-                # Extrai datas
-                datas = re.findall(r"\d{2}/\d{2}/\d{4}", motivo)
-                log(f"  🔍 Datas encontradas (ordem): {datas}")
-                
-                # Geralmente vem: [vencimento, data_infracao] - vamos inverter
-                if len(datas) >= 2:
-                    # Assumindo que a primeira data é o vencimento e a segunda é a infração
-                    # Se a primeira data for MAIOR que a segunda, está correto
-                    # Senão, inverte
-                    try:
-                        data1 = datetime.strptime(datas[0], "%d/%m/%Y")
-                        data2 = datetime.strptime(datas[1], "%d/%m/%Y")
-                        
-                        # Se data1 > data2, então data1 é vencimento e data2 é infração
-                        if data1 > data2:
-                            vencimento = datas[0]
-                            data_infracao = datas[1]
-                        else:
-                            # Senão, assume ordem normal
-                            data_infracao = datas[0]
-                            vencimento = datas[1]
-                    except:
-                        # Se falhar o parse, usa ordem padrão
-                        data_infracao = datas[0]
-                        vencimento = datas[1]
-                elif len(datas) == 1:
-                    data_infracao = datas[0]
-                    vencimento = "-"
-                else:
-                    data_infracao = "-"
-                    vencimento = "-"
-                
-                # Extrai valores
-                valores = re.findall(r"R\$\s*([\d.,]+)", motivo)
-                valor = "-"
-                valor_a_pagar = "-"
-                if len(valores) == 1:
-                    valor = f"R$ {valores[0]}"
-                    valor_a_pagar = f"R$ {valores[0]}"
-                elif len(valores) >= 2:
-                    valor = f"R$ {valores[-2]}"
-                    valor_a_pagar = f"R$ {valores[-1]}"
-                
-                # Extrai descrição - versão SIMPLIFICADA
-                # Remove checkbox, AIT, datas e valores
-                descricao = motivo
-                # Remove checkbox vazio no início
-                descricao = re.sub(r"^\s*\□?\s*", "", descricao)
-                # Remove AIT
-                descricao = re.sub(r"[A-Z]{1,3}\d{6,}\s*--\s*", "", descricao)
-                # Remove datas
-                descricao = re.sub(r"\d{2}/\d{2}/\d{4}", "", descricao)
-                # Remove valores
-                descricao = re.sub(r"R\$\s*[\d.,]+", "", descricao)
-                # Remove espaços extras
-                descricao = re.sub(r"\s+", " ", descricao).strip()
-                
-                if not descricao:
-                    descricao = "-"
+            # Preferência: payload da resposta de rede; DOM só como fallback
+            capturado = captura.multas(veiculo["placa"], textos_linhas_tabela(page)) if captura.ativa else None
+            if capturado:
+                multas_lista, total, indices = capturado
+                log(f"💰 Total calculado: R$ {formatar_valor_br(total)}")
+            else:
+                motivos, total, indices = processar_multas(page)
                 
-                # Exibe informações da multa
-                log(f"\n✏️ MULTA {numero_sequencial}")
-                log(f"  AIT: {ait}")
-                log(f"  📋 Descrição: {descricao}")
-                log(f"  📅 Data: {data_infracao} | Vencimento: {vencimento}")
-                log(f"  💰 Valor: {valor} → A Pagar: {valor_a_pagar}")
-                
-                multas_lista.append({
-                    "Placa": veiculo["placa"],
-                    "#": numero_sequencial,
-                    "AIT": ait,
-                    "AIT Originária": "-",
-                    "Motivo": descricao,
-                    "Data Infração": data_infracao,
-                    "Data Vencimento": vencimento,
-                    "Valor": valor,
-                    "Valor a Pagar": valor_a_pagar,
-                    "Órgão Autuador": "-",
-                    "Código de pagamento em barra": "-"
-                })
+                # Processa cada multa para salvar no Excel
+                for motivo in motivos:
+                    numero_sequencial += 1
+                    multas_lista.append(montar_multa(motivo, veiculo["placa"], numero_sequencial))
             
-            marcar_checkboxes_multas(page, indices)
+            marcar_checkboxes_multas(page, indices, medidor)
             
             # ========== NOVO FLUXO: Clica em "Ver opções de pagamento" ==========
-            if not clicar_ver_opcoes_pagamento(page):
+            # (espera a tela de opções carregar)
+            if not clicar_ver_opcoes_pagamento(page, medidor):
                 log("⚠️ Não foi possível clicar em 'Ver opções de pagamento'")
                 return total, multas_lista
             
-            # Aguarda a tela de opções carregar
-            page.wait_for_timeout(3000)
-            
-            # 1) Primeiro, clica em "Copiar Chave Pix" - múltiplos seletores
-            codigo_pix = "-"
-            try:
-                seletores_copiar = [
-                    'button:has-text("Copiar Chave Pix")',
-                    'button:has-text("Copiar")',
-                    'button[class*="btn"]:has-text("Copiar")',
-                    'a:has-text("Copiar Chave Pix")',
-                    'button:text-is("Copiar Chave Pix")',
-                ]
-                
-                botao_encontrado = False
-                for seletor in seletores_copiar:
-                    try:
-                        botao = page.locator(seletor).first
-                        if botao.is_visible(timeout=2000):
-                            botao.click()
-                            log(f"✅ Clicou em 'Copiar Chave Pix' usando seletor: {seletor}")
-                            botao_encontrado = True
-                            page.wait_for_timeout(1500)
-                            break
-                    except:
-                        continue
-                
-                if not botao_encontrado:
-                    log("⚠️ Botão 'Copiar Chave Pix' não encontrado, tentando extrair direto...")
-                
-                # Extrai o código PIX que foi copiado
-                codigo_pix = extrair_codigo_pix_copia_cola(page)
-                
-            except Exception as e:
-                log(f"⚠️ Erro ao clicar em 'Copiar Chave Pix': {e}")
-                codigo_pix = "-"
-            
-            # 2) Depois, clica em "Baixar boleto para pagamento à vista"
-            try:
-                seletores_boleto = [
-                    'button:has-text("Baixar boleto")',
-                    'button:has-text("Baixar boleto para pagamento à vista")',
-                    'button:has-text("para pagamento à vista")',
-                    'a:has-text("Baixar boleto")',
-                ]
-                
-                boleto_clicado = False
-                for seletor in seletores_boleto:
-                    try:
-                        botao = page.locator(seletor).first
-                        if botao.is_visible(timeout=2000):
-                            botao.click()
-                            log(f"💵 Clicou em 'Baixar boleto' usando seletor: {seletor}")
-                            boleto_clicado = True
-                            page.wait_for_timeout(2000)
-                            break
-                    except:
-                        continue
-                
-                if not boleto_clicado:
-                    log("⚠️ Botão 'Baixar boleto' não encontrado")
-                    
-            except Exception as e:
-                log(f"⚠️ Erro ao clicar em 'Baixar boleto': {e}")
-            
-            # Tenta baixar o boleto como PDF
-            orgao_autuador = "-"
-            descricao_pdf = codigo_pix if codigo_pix != "-" else "-"
-            data_infracao_pdf = "-"
-            vencimento_pdf = "-"
-            caminho_pdf = None
+            # 1) Primeiro, clica em "Copiar Chave Pix"
+            codigo_pix = obter_codigo_pix(page, medidor)
             
-            # Baixa o boleto em PDF
-            try:
-                # Aguarda o download começar após clicar em "Baixar boleto"
-                with page.expect_download(timeout=30000) as download_info:
-                    log("⏳ Aguardando download do boleto...")
-                    page.wait_for_timeout(3000)
-                
-                download = download_info.value
-                nome_arquivo = download.suggested_filename or f"boleto_{int(time.time())}.pdf"
-                caminho_pdf = os.path.join(pasta_boletos, nome_arquivo)
-                download.save_as(caminho_pdf)
-                log(f"💾 Boleto salvo: {caminho_pdf}")
-            except Exception as e:
-                log(f"⚠️ Erro ao baixar boleto: {e}")
-                caminho_pdf = None
-            if caminho_pdf:
-                orgao_autuador, descricao_pdf, data_infracao_pdf, vencimento_pdf = extrair_dados_do_pdf(caminho_pdf)
-                log(f"🏢 Órgão Autuador: {orgao_autuador}")
-                log(f"📄 Descrição PDF: {descricao_pdf}")
-                log(f"📅 Datas do PDF - Infração: {data_infracao_pdf}, Vencimento: {vencimento_pdf}")
-
-            # Adiciona código PIX na descrição se encontrou
-            if codigo_pix != "-":
-                if descricao_pdf != "-":
-                    descricao_pdf = f"{codigo_pix} | {descricao_pdf}"
-                else:
-                    descricao_pdf = codigo_pix
-
-            # Atualiza APENAS as multas deste grupo (últimas N multas adicionadas)
+            # 2) Depois, clica em "Baixar boleto para pagamento à vista" e baixa o PDF:
+            #    primeiro pelo caminho rápido (bytes direto), senão pelo download
+            dados_pdf = ("-", "-", "-", "-")
+            direto = baixar_pdf_direto(page, context, lambda: clicar_baixar_boleto(page), medidor)
+            if direto:
+                # Parse direto dos bytes; o arquivo em disco é gravado em segundo plano
+                fonte_pdf, nome_arquivo = direto
+                arquivar_pdf(fonte_pdf, pasta_boletos, nome_arquivo)
+            else:
+                fonte_pdf = baixar_boleto(page, pasta_boletos, medidor)
+            quantidade_grupo = len(indices)
+            registros = []
+            if fonte_pdf and pipeline is not None:
+                # Parsing em segundo plano: aplicado em pipeline.concluir(multas_lista)
+                pipeline.agendar(
+                    multas_lista, fonte_pdf,
+                    lambda dados, registros_pdf: aplicar_dados_boleto(
+                        multas_lista, quantidade_grupo, codigo_pix, dados, registros_pdf),
+                )
+                return total, multas_lista
+            if fonte_pdf:
+                dados_pdf, registros = extrair_boleto_do_pdf(fonte_pdf)
+                log(f"🏢 Órgão Autuador: {dados_pdf[0]}")
+                log(f"📄 Descrição PDF: {dados_pdf[1]}")
+                log(f"📅 Datas do PDF - Infração: {dados_pdf[2]}, Vencimento: {dados_pdf[3]}")
+
             # Usa len(indices) para saber quantas multas foram processadas
-            quantidade_multas_grupo = len(indices)
-            indice_inicio = len(multas_lista) - quantidade_multas_grupo
-            
-            for j in range(indice_inicio, len(multas_lista)):
-                multa = multas_lista[j]
-                multa["Órgão Autuador"] = orgao_autuador
-                multa["Código de pagamento em barra"] = descricao_pdf
-                # Atualiza datas com as do PDF se foram encontradas
-                if data_infracao_pdf != "-":
-                    multa["Data Infração"] = data_infracao_pdf
-                if vencimento_pdf != "-":
-                    multa["Data Vencimento"] = vencimento_pdf
+            aplicar_dados_boleto(multas_lista, quantidade_grupo, codigo_pix, dados_pdf, registros)
         
         return total, multas_lista
 
@@ -1118,6 +1528,8 @@ def processar_veiculo(browser, veiculo, indice):
         log("❌ Timeout")
         return 0.0, []
     finally:
+        medidor.log_resumo()
+        bloqueio.log_resumo()
         page.close()
         context.close()
 
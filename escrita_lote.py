@@ -0,0 +1,237 @@
+"""
+Escrita em lote (write-behind) do status dos veículos e das multas.
+
+Cada veículo de uma consulta gerava três round trips ao Supabase (status
+"processing", status "completed" e insert das multas). Aqui essas escritas
+entram num buffer e são gravadas juntas:
+
+    - status de veículo: coalescido por (consulta_id, placa), só o estado
+      mais recente vai ao banco, num upsert em lote em veiculos_consulta
+    - multas: acumuladas e gravadas num único upsert em multas
+
+O buffer é descarregado por uma thread quando passa de DETRAN_DB_LOTE
+linhas pendentes ou DETRAN_DB_FLUSH_MS desde a primeira pendência, e
+explicitamente no fim de cada consulta (descarregar) e no shutdown
+(encerrar). Se um lote falha, as linhas voltam para o buffer e a próxima
+descarga tenta de novo; descarregar() propaga o erro para quem fecha a
+consulta.
+
+Os dois upserts precisam de índice único: veiculos_consulta em
+(consulta_id, placa) e multas em (consulta_id, placa, numero), a posição
+da multa na listagem do veículo (o AIT não serve: vira "-" quando não é
+lido, e várias multas do mesmo veículo ficariam numa linha só). Com eles a
+nova tentativa de um lote é idempotente, mesmo quando a falha foi um
+timeout depois de o banco já ter gravado. Sem o índice de
+veiculos_consulta os status são gravados um a um (ainda coalescidos);
+sem o de multas elas vão por insert, e um lote que falhou com resultado
+incerto (a requisição pode ter chegado ao banco) é descartado em vez de
+reenviado, para não duplicar linhas.
+"""
+
+import os
+import threading
+import time
+
+import httpx
+
+LOTE_MAXIMO = max(1, int(os.getenv("DETRAN_DB_LOTE", "200")))
+INTERVALO_FLUSH_S = max(0.05, float(os.getenv("DETRAN_DB_FLUSH_MS", "1000")) / 1000)
+
+CHAVE_VEICULOS = "consulta_id,placa"
+CHAVE_MULTAS = "consulta_id,placa,numero"
+
+
+def log(msg):
+    print(msg)
+
+
+def resultado_incerto(erro):
+    """A requisição que falhou pode ter sido executada no banco?
+
+    Falhas ao conectar (ou esperando conexão livre no pool) garantem que
+    nada foi enviado; timeout de leitura e conexão caída no meio, não.
+    """
+    if isinstance(erro, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return False
+    return isinstance(erro, httpx.TransportError)
+
+
+class EscritaEmLote:
+    """Buffer write-behind de veiculos_consulta e multas."""
+
+    def __init__(self, cliente, lote_maximo=LOTE_MAXIMO, intervalo_s=INTERVALO_FLUSH_S, ao_gravar=None):
+        self.cliente = cliente
+        # ao_gravar(consulta_ids): chamado depois de cada lote gravado (ex.: invalidar caches de leitura)
+        self.ao_gravar = ao_gravar
+        self.lote_maximo = lote_maximo
+        self.intervalo_s = intervalo_s
+        self._cond = threading.Condition()
+        # Serializa as descargas: um status antigo nunca é gravado depois de um novo
+        self._trava_descarga = threading.Lock()
+        self._veiculos = {}   # (consulta_id, placa) -> dados coalescidos
+        self._multas = []
+        self._desde = None    # instante da pendência mais antiga
+        self._thread = None
+        self._encerrado = False
+        self._upsert_suportado = True
+        self._upsert_multas_suportado = True
+        self.round_trips = 0
+        self.linhas_gravadas = 0
+
+    # ---------- enfileirar ----------
+
+    def atualizar_veiculo(self, consulta_id, placa, dados):
+        with self._cond:
+            chave = (consulta_id, placa)
+            self._veiculos[chave] = {**self._veiculos.get(chave, {}), **dados}
+            self._marcar_pendente()
+
+    def inserir_multas(self, linhas):
+        if not linhas:
+            return
+        with self._cond:
+            self._multas.extend(linhas)
+            self._marcar_pendente()
+
+    def _marcar_pendente(self):
+        if self._desde is None:
+            self._desde = time.monotonic()
+        self._iniciar_thread()
+        if len(self._veiculos) + len(self._multas) >= self.lote_maximo:
+            self._cond.notify()
+
+    def _iniciar_thread(self):
+        if self._thread is None and not self._encerrado:
+            self._thread = threading.Thread(target=self._loop, name="escrita-lote", daemon=True)
+            self._thread.start()
+
+    # ---------- descarga ----------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._encerrado:
+                    pendentes = len(self._veiculos) + len(self._multas)
+                    if pendentes >= self.lote_maximo:
+                        break
+                    if self._desde is not None:
+                        restante = self.intervalo_s - (time.monotonic() - self._desde)
+                        if restante <= 0:
+                            break
+                        self._cond.wait(restante)
+                    else:
+                        self._cond.wait()
+                if self._encerrado:
+                    return
+            try:
+                self.descarregar()
+            except Exception as e:
+                log(f"⚠️ Falha ao gravar lote no banco (nova tentativa em {self.intervalo_s:.1f}s): {e}")
+                time.sleep(self.intervalo_s)
+
+    def descarregar(self):
+        """Grava tudo o que está pendente; em caso de erro devolve as linhas ao buffer e propaga."""
+        with self._trava_descarga:
+            with self._cond:
+                veiculos, self._veiculos = self._veiculos, {}
+                multas, self._multas = self._multas, []
+                self._desde = None
+            if not veiculos and not multas:
+                return
+            consultas = {consulta_id for consulta_id, _ in veiculos}
+            consultas.update(linha["consulta_id"] for linha in multas)
+
+            multas_enviadas = False
+            try:
+                if veiculos:
+                    self._gravar_veiculos(veiculos)
+                    veiculos = {}
+                if multas:
+                    multas_enviadas = True
+                    self._gravar_multas(multas)
+            except Exception as e:
+                if multas_enviadas and not self._upsert_multas_suportado and resultado_incerto(e):
+                    # Insert sem chave única: reenviar poderia duplicar as multas
+                    log(f"❌ {len(multas)} multa(s) descartada(s): o insert pode ter sido gravado ({e})")
+                    multas = []
+                self._devolver(veiculos, multas)
+                raise
+            finally:
+                # Mesmo numa falha parcial parte do lote pode ter sido gravada
+                if self.ao_gravar is not None:
+                    self.ao_gravar(consultas)
+
+    def _gravar_veiculos(self, veiculos):
+        if self._upsert_suportado:
+            # O PostgREST exige as mesmas colunas em todas as linhas do lote
+            grupos = {}
+            for (consulta_id, placa), dados in veiculos.items():
+                linha = {"consulta_id": consulta_id, "placa": placa, **dados}
+                grupos.setdefault(tuple(sorted(linha)), []).append(linha)
+            try:
+                for linhas in grupos.values():
+                    self.cliente.table("veiculos_consulta").upsert(
+                        linhas, on_conflict=CHAVE_VEICULOS
+                    ).execute()
+                    self.round_trips += 1
+                    self.linhas_gravadas += len(linhas)
+                return
+            except Exception as e:
+                if "42P10" not in str(e):  # sem índice único para o ON CONFLICT
+                    raise
+                log("⚠️ veiculos_consulta sem índice único (consulta_id, placa); gravando status um a um")
+                self._upsert_suportado = False
+
+        for (consulta_id, placa), dados in veiculos.items():
+            self.cliente.table("veiculos_consulta").update(dados).eq("consulta_id", consulta_id).eq("placa", placa).execute()
+            self.round_trips += 1
+            self.linhas_gravadas += 1
+
+    def _gravar_multas(self, multas):
+        if self._upsert_multas_suportado:
+            # Uma linha por chave: o ON CONFLICT não aceita a mesma chave duas vezes no lote
+            linhas = list({(m["consulta_id"], m["placa"], m["numero"]): m for m in multas}.values())
+            try:
+                self.cliente.table("multas").upsert(linhas, on_conflict=CHAVE_MULTAS).execute()
+                self.round_trips += 1
+                self.linhas_gravadas += len(linhas)
+                return
+            except Exception as e:
+                if "42P10" not in str(e):
+                    raise
+                log("⚠️ multas sem índice único (consulta_id, placa, numero); gravando com insert")
+                self._upsert_multas_suportado = False
+
+        self.cliente.table("multas").insert(multas).execute()
+        self.round_trips += 1
+        self.linhas_gravadas += len(multas)
+
+    def _devolver(self, veiculos, multas):
+        with self._cond:
+            for chave, dados in veiculos.items():
+                # O que chegou depois da falha é mais novo e prevalece
+                self._veiculos[chave] = {**dados, **self._veiculos.get(chave, {})}
+            self._multas[:0] = multas
+            if self._veiculos or self._multas:
+                self._desde = self._desde or time.monotonic()
+
+    def estatisticas(self):
+        with self._cond:
+            pendentes = len(self._veiculos) + len(self._multas)
+        return {
+            "pendentes": pendentes,
+            "round_trips": self.round_trips,
+            "linhas_gravadas": self.linhas_gravadas,
+        }
+
+    def encerrar(self):
+        """Para a thread e grava o que restou (chamado no shutdown da API)."""
+        with self._cond:
+            self._encerrado = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo_s + 5)
+        try:
+            self.descarregar()
+        except Exception as e:
+            log(f"❌ Escritas pendentes perdidas no encerramento: {e}")
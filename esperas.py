@@ -0,0 +1,108 @@
+"""
+Camada de esperas por evento do fluxo DETRAN.
+
+Cada etapa espera uma condição concreta (elemento visível, checkbox marcado,
+download iniciado...) e termina assim que ela acontece; o antigo delay fixo
+passa a ser só o teto (timeout). O MedidorEsperas registra quanto cada etapa
+realmente esperou, para o log do veículo.
+"""
+
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+
+def log(msg):
+    print(msg)
+
+
+class MedidorEsperas:
+    """Acumula o tempo gasto em cada etapa de espera de um veículo."""
+
+    def __init__(self, rotulo=""):
+        self.rotulo = rotulo
+        self.etapas = []
+
+    def registrar(self, etapa, ms, ok, teto_ms=None):
+        self.etapas.append({
+            "etapa": etapa,
+            "ms": round(ms, 1),
+            "ok": ok,
+            "teto_ms": teto_ms,
+        })
+
+    @property
+    def total_ms(self):
+        return sum(e["ms"] for e in self.etapas)
+
+    def resumo(self):
+        return {
+            "rotulo": self.rotulo,
+            "total_ms": round(self.total_ms, 1),
+            "etapas": list(self.etapas),
+        }
+
+    def log_resumo(self):
+        if not self.etapas:
+            return
+        log(f"⏱️ Esperas {self.rotulo}: {self.total_ms / 1000:.2f}s no total")
+        for e in self.etapas:
+            teto = f" / teto {e['teto_ms']:.0f} ms" if e["teto_ms"] is not None else ""
+            marca = "✅" if e["ok"] else "⌛"
+            log(f"   {marca} {e['etapa']}: {e['ms']:.0f} ms{teto}")
+
+
+def esperar(medidor, etapa, teto_ms, condicao):
+    """Executa `condicao(teto_ms)` (uma espera do Playwright) e mede quanto durou.
+
+    Retorna True se a condição foi satisfeita antes do teto; timeouts viram
+    False em vez de exceção, como acontecia com os sleeps fixos.
+    """
+    inicio = time.perf_counter()
+    ok = True
+    try:
+        condicao(teto_ms)
+    except (PlaywrightTimeoutError, AssertionError):
+        ok = False
+    if medidor is not None:
+        medidor.registrar(etapa, (time.perf_counter() - inicio) * 1000, ok, teto_ms)
+    return ok
+
+
+async def esperar_async(medidor, etapa, teto_ms, condicao):
+    """Versão async de esperar(): `condicao(teto_ms)` devolve um awaitable."""
+    inicio = time.perf_counter()
+    ok = True
+    try:
+        await condicao(teto_ms)
+    except (PlaywrightTimeoutError, AssertionError):
+        ok = False
+    if medidor is not None:
+        medidor.registrar(etapa, (time.perf_counter() - inicio) * 1000, ok, teto_ms)
+    return ok
+
+
+@contextmanager
+def medir(medidor, etapa, teto_ms=None):
+    """Mede um bloco que já espera por evento (ex.: expect_download)."""
+    inicio = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        if medidor is not None:
+            medidor.registrar(etapa, (time.perf_counter() - inicio) * 1000, ok, teto_ms)
+
+
+@asynccontextmanager
+async def medir_async(medidor, etapa, teto_ms=None):
+    inicio = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        if medidor is not None:
+            medidor.registrar(etapa, (time.perf_counter() - inicio) * 1000, ok, teto_ms)
@@ -0,0 +1,180 @@
+"""
+Barramento de eventos de progresso das consultas (em processo).
+
+Os workers publicam aqui cada transição de veículo e a mudança de status da
+consulta; o endpoint SSE GET /consultas/{id}/events entrega os eventos a
+quem está assistindo, sem consultar o banco a cada tick. O barramento
+guarda o estado atual de cada consulta, então quem conecta no meio recebe
+primeiro um "snapshot" completo e depois só as transições.
+
+Eventos (campo `event` do SSE):
+    snapshot   estado completo: status, veículos e totais
+    veiculo    um veículo mudou (placa, status, multas_count, valor_total, mensagem)
+    totais     totais parciais depois de cada veículo concluído
+    status     mudança de status da consulta (processing, completed, error)
+
+Consultas encerradas ficam em memória por DETRAN_EVENTOS_RETENCAO_S
+segundos para quem conectar logo depois do fim. Consultas que nunca encerram
+(worker que morreu no meio) saem depois de DETRAN_EVENTOS_MAX_IDADE_S
+segundos sem nenhum evento. A limpeza roda a cada publicação e assinatura.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+RETENCAO_S = float(os.getenv("DETRAN_EVENTOS_RETENCAO_S", "600"))
+MAX_IDADE_S = float(os.getenv("DETRAN_EVENTOS_MAX_IDADE_S", "3600"))
+INTERVALO_PING_S = 15  # comentário SSE para manter a conexão aberta em proxies
+STATUS_FINAIS = ("completed", "error")
+
+
+class _EstadoConsulta:
+    def __init__(self, placas):
+        self.status = "pending"
+        self.veiculos = {
+            placa: {"placa": placa, "status": "pending", "multas_count": 0, "valor_total": 0.0, "mensagem": None}
+            for placa in placas
+        }
+        self.encerrada_em = None
+        self.atualizada_em = time.monotonic()
+        self.assinantes = []  # (loop, fila)
+
+    def totais(self):
+        return {
+            "total_multas": sum(v.get("multas_count") or 0 for v in self.veiculos.values()),
+            "valor_total": sum(v.get("valor_total") or 0.0 for v in self.veiculos.values()),
+            "concluidos": sum(1 for v in self.veiculos.values() if v["status"] in STATUS_FINAIS),
+            "total_veiculos": len(self.veiculos),
+        }
+
+    def snapshot(self, consulta_id):
+        return {
+            "id": consulta_id,
+            "status": self.status,
+            "veiculos": list(self.veiculos.values()),
+            **self.totais(),
+        }
+
+
+class BarramentoEventos:
+    """Estado e assinantes por consulta; a publicação pode vir de qualquer thread."""
+
+    def __init__(self, retencao_s=RETENCAO_S, max_idade_s=MAX_IDADE_S):
+        self.retencao_s = retencao_s
+        self.max_idade_s = max_idade_s
+        self._lock = threading.Lock()
+        self._consultas = {}
+
+    # ---------- publicação (workers) ----------
+
+    def iniciar(self, consulta_id, placas):
+        with self._lock:
+            self._limpar_antigas()
+            self._consultas[consulta_id] = _EstadoConsulta(placas)
+
+    def veiculo(self, consulta_id, placa, dados):
+        with self._lock:
+            self._limpar_antigas()
+            estado = self._consultas.get(consulta_id)
+            if estado is None:
+                return
+            estado.atualizada_em = time.monotonic()
+            atual = estado.veiculos.setdefault(placa, {"placa": placa})
+            atual.update(dados)
+            novos = [("veiculo", dict(atual))]
+            if atual.get("status") in STATUS_FINAIS:
+                novos.append(("totais", estado.totais()))
+            self._entregar(estado, novos)
+
+    def status(self, consulta_id, status, **totais):
+        with self._lock:
+            self._limpar_antigas()
+            estado = self._consultas.get(consulta_id)
+            if estado is None:
+                return
+            estado.status = status
+            estado.atualizada_em = time.monotonic()
+            evento = {"id": consulta_id, "status": status, **estado.totais(), **totais}
+            if status in STATUS_FINAIS:
+                estado.encerrada_em = estado.atualizada_em
+            self._entregar(estado, [("status", evento)])
+
+    @staticmethod
+    def _entregar(estado, eventos):
+        for loop, fila in estado.assinantes:
+            for evento in eventos:
+                try:
+                    loop.call_soon_threadsafe(fila.put_nowait, evento)
+                except RuntimeError:
+                    pass  # event loop do assinante já fechou
+
+    def _limpar_antigas(self):
+        """Remove encerradas além da retenção e paradas além da idade máxima.
+
+        Quem tem assinante fica até o endpoint SSE cancelar a assinatura.
+        """
+        agora = time.monotonic()
+        for consulta_id in [
+            c for c, e in self._consultas.items()
+            if not e.assinantes and (
+                (e.encerrada_em is not None and agora - e.encerrada_em > self.retencao_s)
+                or agora - e.atualizada_em > self.max_idade_s
+            )
+        ]:
+            del self._consultas[consulta_id]
+
+    def ativas(self):
+        """Consultas deste processo ainda em andamento."""
+        with self._lock:
+            self._limpar_antigas()
+            return sum(1 for e in self._consultas.values() if e.status not in STATUS_FINAIS)
+
+    # ---------- assinatura (endpoint SSE) ----------
+
+    def assinar(self, consulta_id):
+        """(snapshot, fila) para a consulta, ou None se ela não está neste processo.
+
+        Precisa ser chamado dentro do event loop que vai ler a fila.
+        """
+        fila = asyncio.Queue()
+        with self._lock:
+            self._limpar_antigas()
+            estado = self._consultas.get(consulta_id)
+            if estado is None:
+                return None
+            estado.assinantes.append((asyncio.get_running_loop(), fila))
+            return estado.snapshot(consulta_id), fila
+
+    def cancelar(self, consulta_id, fila):
+        with self._lock:
+            estado = self._consultas.get(consulta_id)
+            if estado is not None:
+                estado.assinantes = [(l, f) for l, f in estado.assinantes if f is not fila]
+            self._limpar_antigas()
+
+
+def snapshot_do_banco(consulta, veiculos):
+    """Snapshot no mesmo formato do barramento, a partir das linhas do banco."""
+    veiculos = [
+        {c: v.get(c) for c in ("placa", "status", "multas_count", "valor_total", "mensagem")}
+        for v in veiculos
+    ]
+    return {
+        "id": consulta.get("id"),
+        "status": consulta.get("status", "pending"),
+        "veiculos": veiculos,
+        "total_multas": consulta.get("total_multas", 0),
+        "valor_total": consulta.get("valor_total", 0.0),
+        "concluidos": sum(1 for v in veiculos if v["status"] in STATUS_FINAIS),
+        "total_veiculos": len(veiculos),
+    }
+
+
+def formatar_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+eventos = BarramentoEventos()
@@ -0,0 +1,136 @@
+"""
+Escrita de planilhas formatadas em uma passada (openpyxl write_only).
+
+Cabeçalho, bordas, alinhamento, larguras e congelamento da primeira linha
+são definidos enquanto as linhas são gravadas: o arquivo é escrito uma vez,
+sem o ciclo to_excel -> load_workbook -> reformatar -> save, e a memória
+não cresce com o número de linhas. A gravação vai para um arquivo
+temporário e só substitui o destino no final (os.replace).
+"""
+
+import math
+import os
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+NOME_ABA = "Resultado DETRAN"
+
+# Larguras padrão da planilha de multas, por nome de coluna
+LARGURAS_MULTAS = {
+    "Placa": 12,
+    "#": 5,
+    "AIT": 15,
+    "AIT Originária": 18,
+    "Motivo": 55,
+    "Data Infração": 14,
+    "Data Vencimento": 14,
+    "Valor": 16,
+    "Valor a Pagar": 16,
+    "Órgão Autuador": 18,
+    "Código de pagamento em barra": 55,
+}
+
+# Colunas de texto longo, alinhadas à esquerda
+COLUNAS_ESQUERDA = ("Motivo", "Código de pagamento em barra")
+
+
+def _estilos(cor_cabecalho, quebrar_texto):
+    borda = Side(style="thin")
+    bordas = Border(left=borda, right=borda, top=borda, bottom=borda)
+    cabecalho = NamedStyle(
+        name="detran_cabecalho",
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill("solid", fgColor=cor_cabecalho),
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=quebrar_texto),
+        border=bordas,
+    )
+    centro = NamedStyle(
+        name="detran_centro",
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=quebrar_texto),
+        border=bordas,
+    )
+    esquerda = NamedStyle(
+        name="detran_esquerda",
+        alignment=Alignment(horizontal="left", vertical="top", wrap_text=quebrar_texto),
+        border=bordas,
+    )
+    return cabecalho, centro, esquerda
+
+
+def _valor_celula(valor):
+    # NaN/None viram célula vazia, como no to_excel
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    if hasattr(valor, "item"):  # escalares numpy
+        return valor.item()
+    return valor
+
+
+def escrever_planilha(caminho, colunas, linhas, larguras=None, colunas_esquerda=COLUNAS_ESQUERDA,
+                      cor_cabecalho="1F4E78", quebrar_texto=True, nome_aba=NOME_ABA):
+    """Grava `linhas` (iterável de sequências na ordem de `colunas`) em `caminho`.
+
+    `larguras` mapeia nome da coluna -> largura (padrão LARGURAS_MULTAS).
+    Devolve a quantidade de linhas de dados gravadas.
+    """
+    larguras = LARGURAS_MULTAS if larguras is None else larguras
+    wb = Workbook(write_only=True)
+    cabecalho, centro, esquerda = _estilos(cor_cabecalho, quebrar_texto)
+    for estilo in (cabecalho, centro, esquerda):
+        wb.add_named_style(estilo)
+
+    ws = wb.create_sheet(nome_aba)
+    ws.freeze_panes = "A2"
+    for i, coluna in enumerate(colunas, 1):
+        if coluna in larguras:
+            ws.column_dimensions[get_column_letter(i)].width = larguras[coluna]
+
+    def celula(valor, estilo):
+        c = WriteOnlyCell(ws, value=valor)
+        c.style = estilo
+        return c
+
+    ws.append([celula(coluna, cabecalho.name) for coluna in colunas])
+    estilos_coluna = [esquerda.name if coluna in colunas_esquerda else centro.name for coluna in colunas]
+
+    # Uma célula por coluna, reaproveitada: no modo write_only a linha é
+    # serializada dentro do append, então só o valor muda de uma linha para outra
+    modelos = [celula(None, e) for e in estilos_coluna]
+    total = 0
+    for linha in linhas:
+        for modelo, valor in zip(modelos, linha):
+            modelo.value = _valor_celula(valor)
+        ws.append(modelos)
+        total += 1
+
+    temporario = f"{caminho}.tmp"
+    try:
+        wb.save(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return total
+
+
+def larguras_automaticas(df, maximo=50):
+    """Largura = maior texto da coluna (cabeçalho incluído) + 2, até `maximo`."""
+    larguras = {}
+    for coluna in df.columns:
+        valores = df[coluna].dropna().astype(str)
+        maior = max(len(str(coluna)), int(valores.str.len().max()) if len(valores) else 0)
+        larguras[coluna] = min(maior + 2, maximo)
+    return larguras
+
+
+def escrever_dataframe(caminho, df, **opcoes):
+    """escrever_planilha() a partir de um DataFrame (sem o índice)."""
+    return escrever_planilha(
+        caminho,
+        [str(c) for c in df.columns],
+        df.itertuples(index=False, name=None),
+        **opcoes,
+    )
@@ -0,0 +1,136 @@
+"""
+Exportação das multas de uma consulta em CSV, NDJSON ou Parquet.
+
+As linhas vêm do banco em páginas (keyset pelo id, ver
+api_server.db_get_multas_pagina) e cada página vira um pedaço da resposta:
+a lista completa nunca fica em memória. CSV e NDJSON são gerados à medida
+que as páginas chegam; o Parquet precisa do rodapé no fim do arquivo,
+então é montado num arquivo temporário (um row group por página) e
+enviado em blocos depois. O Parquet usa o pyarrow, que é opcional.
+
+    DETRAN_EXPORT_PAGINA  linhas por consulta ao banco (padrão: 1000)
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+TAMANHO_PAGINA = int(os.getenv("DETRAN_EXPORT_PAGINA", "1000"))
+BLOCO_ARQUIVO = 1 << 16
+
+# Colunas exportadas (projeção da tabela multas)
+COLUNAS_EXPORTACAO = [
+    "placa", "numero", "ait", "ait_originaria", "motivo", "data_infracao",
+    "data_vencimento", "valor", "valor_a_pagar", "orgao_autuador", "codigo_pagamento",
+]
+
+# Formato -> media type da resposta (o formato também é a extensão do arquivo)
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def log(msg):
+    print(msg)
+
+
+def parquet_disponivel():
+    return pyarrow is not None
+
+
+def paginas_multas(buscar_pagina, tamanho=TAMANHO_PAGINA):
+    """Gera as páginas de `buscar_pagina(depois_de_id, tamanho)` até a última.
+
+    `buscar_pagina` devolve as linhas com id maior que `depois_de_id`
+    (None na primeira), em ordem de id; a coluna id é usada só como cursor.
+    """
+    ultimo_id = None
+    while True:
+        linhas = buscar_pagina(ultimo_id, tamanho)
+        if linhas:
+            ultimo_id = linhas[-1]["id"]
+            yield linhas
+        if len(linhas) < tamanho:
+            return
+
+
+def gerar_csv(paginas, colunas=COLUNAS_EXPORTACAO):
+    # BOM para o Excel abrir os acentos corretamente
+    buffer = io.StringIO()
+    buffer.write("\ufeff")
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(colunas)
+    for linhas in paginas:
+        escritor.writerows([linha.get(c) for c in colunas] for linha in linhas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    resto = buffer.getvalue()
+    if resto:
+        yield resto.encode("utf-8")
+
+
+def gerar_ndjson(paginas, colunas=COLUNAS_EXPORTACAO):
+    for linhas in paginas:
+        yield "".join(
+            json.dumps({c: linha.get(c) for c in colunas}, ensure_ascii=False) + "\n"
+            for linha in linhas
+        ).encode("utf-8")
+
+
+def _schema_parquet(colunas):
+    return pyarrow.schema([
+        (c, pyarrow.int64() if c == "numero" else pyarrow.string()) for c in colunas
+    ])
+
+
+def _valor_parquet(coluna, valor):
+    if valor is None:
+        return None
+    if coluna == "numero":
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return None
+    return str(valor)
+
+
+def gerar_parquet(paginas, colunas=COLUNAS_EXPORTACAO):
+    """Grava as páginas num Parquet temporário e devolve os bytes em blocos."""
+    if pyarrow is None:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+    schema = _schema_parquet(colunas)
+    # Até 32 MB fica em memória; acima disso o arquivo temporário vai para o disco
+    with tempfile.SpooledTemporaryFile(max_size=32 << 20) as temporario:
+        with pyarrow.parquet.ParquetWriter(temporario, schema, compression="zstd") as escritor:
+            for linhas in paginas:
+                tabela = pyarrow.Table.from_pydict(
+                    {c: [_valor_parquet(c, linha.get(c)) for linha in linhas] for c in colunas},
+                    schema=schema,
+                )
+                escritor.write_table(tabela)
+        temporario.seek(0)
+        for bloco in iter(lambda: temporario.read(BLOCO_ARQUIVO), b""):
+            yield bloco
+
+
+GERADORES = {
+    "csv": gerar_csv,
+    "ndjson": gerar_ndjson,
+    "parquet": gerar_parquet,
+}
+
+
+def exportar(formato, buscar_pagina, tamanho=TAMANHO_PAGINA):
+    """Gerador de bytes da exportação no `formato` (chave de FORMATOS)."""
+    return GERADORES[formato](paginas_multas(buscar_pagina, tamanho))
@@ -0,0 +1,262 @@
+"""
+Extrator de campos do boleto em passada única.
+
+Recebe o texto das páginas (lista ou gerador, ver texto_pdf.py) e produz os mesmos
+quatro campos do extrator original de detran_manual.py:
+(orgao, codigo_pagamento | descricao, data_infracao, vencimento).
+
+As linhas são percorridas uma vez, como uma máquina de estados, com os
+padrões já compilados; a passada termina cedo quando código, órgão,
+descrição e a linha da multa já foram encontrados (e, em extrair_boleto,
+quando a tabela de AITs já terminou), sem pedir as páginas seguintes ao
+backend de texto. As buscas sobre o texto
+inteiro (órgão por padrão, datas soltas) só rodam quando as regras
+principais falham, exatamente como no extrator antigo.
+
+Boletos com várias multas trazem uma linha por AIT
+("DETRAN-CE | V607910965 | 07455 | DESCRIÇÃO dd/mm/aaaa dd/mm/aaaa valor valor");
+extrair_boleto() devolve também um registro por linha dessas, na mesma
+passada, para casar cada multa com os próprios dados pelo AIT.
+"""
+
+import re
+from datetime import datetime
+
+REGEX_DATA = re.compile(r"\d{2}/\d{2}/\d{4}")
+REGEX_NAO_DIGITO = re.compile(r"\D")
+REGEX_ORGAO_LINHA = re.compile(r"^([^|]+)")
+
+# Órgãos procurados no texto inteiro quando a linha da multa não tem órgão,
+# em ordem de prioridade (o primeiro padrão que casar vence)
+PADROES_ORGAOS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"DEMUTRAN\s+[A-Z]+",
+    r"DETRAN-[A-Z]{2}",
+    r"SEMOB",
+    r"POL[IÍ]CIA\s+MILITAR",
+    r"POL[IÍ]CIA\s+FEDERAL",
+    r"POL[IÍ]CIA\s+RODOVI[ÁA]RIA",
+))
+
+# Linha de multa do boleto: órgão | AIT | código da infração | descrição + datas + valores
+REGEX_LINHA_AIT = re.compile(
+    r"^\s*(?P<orgao>[^|]+?)\s*\|\s*(?P<ait>[A-Za-z0-9]{5,20})\s*\|\s*(?P<codigo>[\d-]{3,8})\s*\|\s*(?P<resto>.*\S)\s*$"
+)
+REGEX_VALOR = re.compile(r"\d{1,3}(?:\.\d{3})*,\d{2}")
+REGEX_NAO_ALFANUMERICO = re.compile(r"[^0-9A-Z]")
+
+# Linhas até onde os dados podem aparecer depois do cabeçalho "Data Infração / Vencimento"
+JANELA_CABECALHO = 5
+
+
+def _codigo_pagamento(linha):
+    """Linha só com os 47-48 dígitos da linha digitável (e espaços), ou None."""
+    linha_limpa = linha.strip()
+    if len(linha_limpa) < 47:
+        return None
+    qtd_digitos = len(REGEX_NAO_DIGITO.sub("", linha_limpa))
+    if 47 <= qtd_digitos <= 48 and len(linha_limpa.replace(" ", "")) == qtd_digitos:
+        return linha_limpa
+    return None
+
+
+def normalizar_ait(ait):
+    """Chave de comparação do AIT: maiúsculas, só letras e números."""
+    return REGEX_NAO_ALFANUMERICO.sub("", str(ait).upper())
+
+
+def _registro_ait(linha):
+    """Registro da linha de multa do boleto, ou None se a linha não for uma."""
+    match = REGEX_LINHA_AIT.match(linha)
+    if not match:
+        return None
+    resto = match.group("resto")
+    datas = REGEX_DATA.findall(resto)
+    primeira_data = REGEX_DATA.search(resto)
+    descricao = resto[:primeira_data.start()].strip() if primeira_data else resto.strip()
+    depois_datas = resto[resto.rfind(datas[-1]) + 10:] if datas else resto
+    valores = REGEX_VALOR.findall(depois_datas)
+    return {
+        "ait": match.group("ait").upper(),
+        "orgao": match.group("orgao").strip(),
+        "codigo_infracao": match.group("codigo"),
+        "descricao": descricao or "-",
+        "data_infracao": datas[0] if len(datas) >= 1 else "-",
+        "vencimento": datas[1] if len(datas) >= 2 else "-",
+        "valor": valores[0] if len(valores) >= 1 else "-",
+        "valor_a_pagar": valores[1] if len(valores) >= 2 else (valores[0] if valores else "-"),
+        "linha": linha.strip(),
+    }
+
+
+def indexar_por_ait(registros):
+    """Dicionário AIT normalizado -> registro (a primeira ocorrência vence)."""
+    indice = {}
+    for registro in registros:
+        indice.setdefault(normalizar_ait(registro["ait"]), registro)
+    return indice
+
+
+def _datas_por_ordenacao(datas_encontradas):
+    """Infração = data válida mais antiga; vencimento = primeira posterior a ela."""
+    datas_validas = []
+    for d in datas_encontradas:
+        try:
+            dt = datetime.strptime(d, "%d/%m/%Y")
+        except ValueError:
+            continue
+        if 2020 <= dt.year <= 2030:
+            datas_validas.append((d, dt))
+    datas_validas.sort(key=lambda x: x[1])
+
+    if len(datas_validas) < 2:
+        return "-", "-"
+    infracao, dt_infracao = datas_validas[0]
+    for d, dt in datas_validas[1:]:
+        if dt > dt_infracao:
+            return infracao, d
+    return infracao, "-"
+
+
+def _texto_completo(lidas, restantes):
+    """Texto de todas as páginas (as já lidas + as que a passada não consumiu)."""
+    lidas.extend(restantes)
+    return "".join(lidas)
+
+
+def extrair_campos(paginas):
+    """(orgao, resultado_pdf, data_infracao, vencimento) a partir do texto das páginas.
+
+    `paginas` pode ser um gerador: páginas só são consumidas enquanto falta
+    algum campo (ou quando um fallback precisa do texto inteiro).
+    """
+    return _varrer(paginas, None)[0]
+
+
+def extrair_boleto(paginas):
+    """(campos, registros): os quatro campos e um registro por linha de AIT.
+
+    A passada só para cedo depois do fim da tabela de AITs (uma linha não
+    vazia que não é de AIT depois da última que é): uma tabela que continua
+    na página 2 é lida inteira. O código de pagamento do boleto vai em cada
+    registro.
+    """
+    registros = []
+    campos, codigo_pagamento = _varrer(paginas, registros)
+    for registro in registros:
+        registro["codigo_pagamento"] = codigo_pagamento or "-"
+    return campos, registros
+
+
+def _varrer(paginas, registros):
+    """Passada única -> (campos, codigo_pagamento ou None).
+
+    Com `registros` (lista), também coleta nela as linhas de AIT e só
+    termina cedo depois que a tabela de AITs acabou.
+    """
+    paginas = iter(paginas)
+    vistos = set()
+    lidas = []
+    codigo_pagamento = None
+    orgao = None
+    descricao_pdf = "-"
+    descricao_pendente = False   # viu "Descrição (Taxa / Multa)", espera a próxima linha não vazia
+    descricao_resolvida = False
+    datas_linha_multa = None     # método principal: linha DETRAN/| com duas datas
+    datas_cabecalho = None       # alternativo: até 5 linhas depois do cabeçalho das datas
+    ultimo_cabecalho = None
+    viu_ait = False
+    tabela_encerrada = registros is None  # sem registros, a tabela não importa
+
+    indice = 0
+    for conteudo in paginas:
+        lidas.append(conteudo)
+        for linha in conteudo.splitlines():
+            # Descrição: primeira linha não vazia depois do cabeçalho
+            if descricao_pendente:
+                proxima_limpa = linha.strip()
+                if proxima_limpa:
+                    descricao_pdf = proxima_limpa
+                    descricao_pendente = False
+                    descricao_resolvida = True
+
+            tem_detran = "DETRAN" in linha or "DEMUTRAN" in linha
+            tem_barra = "|" in linha
+
+            if not tabela_encerrada:
+                registro = _registro_ait(linha) if tem_barra else None
+                if registro is not None:
+                    viu_ait = True
+                    if registro["ait"] not in vistos:
+                        vistos.add(registro["ait"])
+                        registros.append(registro)
+                elif viu_ait and linha.strip():
+                    tabela_encerrada = True
+
+            if codigo_pagamento is None:
+                codigo_pagamento = _codigo_pagamento(linha)
+
+            if orgao is None and tem_detran and tem_barra:
+                match_orgao = REGEX_ORGAO_LINHA.match(linha)
+                if match_orgao:
+                    orgao = match_orgao.group(1).strip()
+
+            linha_low = None
+            if not descricao_resolvida and not descricao_pendente:
+                linha_low = linha.lower()
+                if "descri" in linha_low and "taxa" in linha_low:
+                    descricao_pendente = True
+
+            if datas_linha_multa is None and "/" in linha:
+                datas = REGEX_DATA.findall(linha)
+                if len(datas) >= 2:
+                    if tem_detran or tem_barra:
+                        datas_linha_multa = (datas[0], datas[1])
+                    elif (datas_cabecalho is None and ultimo_cabecalho is not None
+                          and indice - ultimo_cabecalho <= JANELA_CABECALHO):
+                        datas_cabecalho = (datas[0], datas[1])
+
+            if datas_linha_multa is None and datas_cabecalho is None:
+                if linha_low is None:
+                    linha_low = linha.lower()
+                if "data" in linha_low and "infra" in linha_low and "venci" in linha_low:
+                    ultimo_cabecalho = indice
+
+            indice += 1
+            if (tabela_encerrada and datas_linha_multa is not None and codigo_pagamento is not None
+                    and orgao is not None and descricao_resolvida):
+                break
+        else:
+            continue
+        break
+
+    texto = None
+    if orgao is None or orgao == "-":
+        orgao = "-"
+        texto = _texto_completo(lidas, paginas)
+        for padrao in PADROES_ORGAOS:
+            match = padrao.search(texto)
+            if match:
+                orgao = match.group(0).strip()
+                break
+
+    if datas_linha_multa is not None:
+        data_infracao_pdf, vencimento_pdf = datas_linha_multa
+    elif datas_cabecalho is not None:
+        data_infracao_pdf, vencimento_pdf = datas_cabecalho
+    else:
+        if texto is None:
+            texto = _texto_completo(lidas, paginas)
+        datas_encontradas = REGEX_DATA.findall(texto)
+        data_infracao_pdf, vencimento_pdf = "-", "-"
+        if len(datas_encontradas) >= 2:
+            data_infracao_pdf, vencimento_pdf = _datas_por_ordenacao(datas_encontradas)
+            if data_infracao_pdf == "-":
+                data_infracao_pdf = datas_encontradas[0]
+            if vencimento_pdf == "-":
+                vencimento_pdf = datas_encontradas[-1]
+
+    resultado_pdf = descricao_pdf
+    if codigo_pagamento is not None:
+        resultado_pdf = f"{codigo_pagamento} | {descricao_pdf}" if descricao_pdf != "-" else codigo_pagamento
+
+    return (orgao, resultado_pdf, data_infracao_pdf, vencimento_pdf), codigo_pagamento
@@ -0,0 +1,8 @@
+"""
+Formatação de valores para a planilha e os logs, sem dependências do
+scraping (usada por detran_manual, captura_multas e api).
+"""
+
+
+def formatar_valor_br(valor):
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
@@ -32,7 +32,8 @@ export async function GET(request: NextRequest) {
     
     const backendUrl = process.env.BACKEND_URL || 'http://localhost:8000';
     
-    const response = await fetch(`${backendUrl}/${path}`, {
+    // Repassa a query string (?limite=&cursor=...) e o cursor da próxima página
+    const response = await fetch(`${backendUrl}/${path}${request.nextUrl.search}`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
@@ -40,7 +41,12 @@ export async function GET(request: NextRequest) {
     });
 
     const data = await response.json();
-    return NextResponse.json(data, { status: response.status });
+    const headers = new Headers();
+    const proximoCursor = response.headers.get('X-Proximo-Cursor');
+    if (proximoCursor) {
+      headers.set('X-Proximo-Cursor', proximoCursor);
+    }
+    return NextResponse.json(data, { status: response.status, headers });
   } catch (error) {
     console.error('Proxy error:', error);
     return NextResponse.json(
@@ -0,0 +1,148 @@
+"""
+Manifesto do reprocessamento de boletos.
+
+Guarda, para cada PDF já aplicado no Excel, caminho, tamanho, mtime, hash
+do conteúdo, versão do extrator e as linhas do Excel que ele atualizou.
+Na próxima execução só os arquivos novos ou alterados são parseados:
+
+    - mesmo tamanho e mtime            -> inalterado (nem lê o arquivo)
+    - tamanho/mtime mudaram, mesmo hash -> inalterado (só atualiza o stat)
+    - hash ou versão do extrator mudou  -> alterado
+
+As linhas registradas só valem para o Excel em que foram aplicadas: o
+manifesto guarda também a identidade da planilha (tamanho, mtime e hash)
+e descarta todas as entradas quando ela mudou por fora (outra execução,
+edição manual, arquivo restaurado). PDFs que não atualizaram nenhuma
+linha não são registrados e entram de novo na próxima execução.
+
+DETRAN_MANIFESTO_PDFS muda o caminho do arquivo (JSON).
+"""
+
+import hashlib
+import json
+import os
+import time
+
+CAMINHO_MANIFESTO = os.getenv("DETRAN_MANIFESTO_PDFS", os.path.join("boletos", "manifesto_reprocessamento.json"))
+
+
+def log(msg):
+    print(msg)
+
+
+def hash_arquivo(caminho, bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+def identidade_arquivo(caminho):
+    stat = os.stat(caminho)
+    return {"tamanho": stat.st_size, "mtime": stat.st_mtime, "sha256": hash_arquivo(caminho)}
+
+
+def _mesmo_arquivo(caminho, identidade):
+    """O arquivo ainda é o descrito em `identidade`? (só lê o conteúdo se o stat mudou)"""
+    if not identidade:
+        return False
+    stat = os.stat(caminho)
+    if identidade["tamanho"] == stat.st_size and identidade["mtime"] == stat.st_mtime:
+        return True
+    return identidade["tamanho"] == stat.st_size and identidade["sha256"] == hash_arquivo(caminho)
+
+
+class ManifestoReprocessamento:
+    """Entradas por caminho do PDF; salvo em JSON com escrita atômica."""
+
+    def __init__(self, caminho=CAMINHO_MANIFESTO):
+        self.caminho = caminho
+        self.entradas = {}
+        self.planilha = None  # identidade do Excel em que as linhas foram aplicadas
+        # stat/hash calculados em classificar(), reaproveitados em registrar()
+        self._pendentes_info = {}
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+                self.entradas = dados.get("arquivos", {})
+                self.planilha = dados.get("planilha")
+            except (OSError, ValueError) as e:
+                log(f"⚠️ Manifesto {caminho} ilegível, reprocessando tudo: {e}")
+                self.entradas = {}
+                self.planilha = None
+
+    @staticmethod
+    def _chave(caminho_pdf):
+        return os.path.normpath(caminho_pdf)
+
+    def conferir_planilha(self, caminho_excel):
+        """Descarta as entradas se o Excel não é mais aquele em que foram aplicadas."""
+        if not _mesmo_arquivo(caminho_excel, self.planilha):
+            if self.entradas:
+                log(f"⚠️ {caminho_excel} mudou desde o último reprocessamento; reprocessando todos os PDFs")
+            self.entradas = {}
+        self.marcar_planilha(caminho_excel)
+
+    def marcar_planilha(self, caminho_excel):
+        """Guarda a identidade atual do Excel (chamar depois de gravá-lo)."""
+        self.planilha = identidade_arquivo(caminho_excel)
+
+    def classificar(self, caminhos, versao_extrator):
+        """Separa os PDFs em (novos, alterados, inalterados)."""
+        novos, alterados, inalterados = [], [], []
+        self._pendentes_info = {}
+        for caminho in caminhos:
+            chave = self._chave(caminho)
+            stat = os.stat(caminho)
+            entrada = self.entradas.get(chave)
+            if entrada is not None and entrada.get("extrator") == versao_extrator:
+                if entrada["tamanho"] == stat.st_size and entrada["mtime"] == stat.st_mtime:
+                    inalterados.append(caminho)
+                    continue
+                conteudo_hash = hash_arquivo(caminho)
+                if conteudo_hash == entrada["sha256"]:
+                    entrada["tamanho"], entrada["mtime"] = stat.st_size, stat.st_mtime
+                    inalterados.append(caminho)
+                    continue
+            else:
+                conteudo_hash = hash_arquivo(caminho)
+            self._pendentes_info[chave] = (stat.st_size, stat.st_mtime, conteudo_hash)
+            (alterados if entrada is not None else novos).append(caminho)
+        return novos, alterados, inalterados
+
+    def registrar(self, caminho_pdf, versao_extrator, linhas_atualizadas):
+        """Marca o PDF como aplicado; sem linhas atualizadas ele fica pendente."""
+        chave = self._chave(caminho_pdf)
+        if not linhas_atualizadas:
+            self.entradas.pop(chave, None)
+            return
+        info = self._pendentes_info.get(chave)
+        if info is None:
+            stat = os.stat(caminho_pdf)
+            info = (stat.st_size, stat.st_mtime, hash_arquivo(caminho_pdf))
+        tamanho, mtime, conteudo_hash = info
+        self.entradas[chave] = {
+            "tamanho": tamanho,
+            "mtime": mtime,
+            "sha256": conteudo_hash,
+            "extrator": versao_extrator,
+            "linhas_atualizadas": sorted(linhas_atualizadas),
+            "processado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def esquecer_ausentes(self, caminhos_existentes):
+        """Remove entradas de PDFs que não existem mais no arquivo."""
+        existentes = {self._chave(c) for c in caminhos_existentes}
+        for chave in [c for c in self.entradas if c not in existentes]:
+            del self.entradas[chave]
+
+    def salvar(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"planilha": self.planilha, "arquivos": self.entradas}, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.caminho)
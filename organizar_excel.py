@@ -1,7 +1,7 @@
 import os
 import pandas as pd
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+from excel_streaming import escrever_dataframe
 
 EXCEL_FILE = "resultado_detran_organizado.xlsx"
 SHEET_NAME = "Resultado DETRAN"
@@ -20,62 +20,25 @@ def formatar_excel():
         print(f"❌ Erro ao ler Excel: {e}")
         return
 
-    wb = openpyxl.load_workbook(EXCEL_FILE)
-    ws = wb[SHEET_NAME]
-
-    # ================= ESTILOS =================
-    header_fill = PatternFill("solid", fgColor="1F4E78")
-    header_font = Font(bold=True, color="FFFFFF")
-    center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    left = Alignment(horizontal="left", vertical="top", wrap_text=True)
-
-    border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin")
-    )
-
-    # ================= CABEÇALHO =================
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = center
-        cell.border = border
-
-    # ================= DADOS =================
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.border = border
-
-            # Colunas com texto longo
-            if cell.column in (5, 11):  # Motivo | Código de Barras
-                cell.alignment = left
-            else:
-                cell.alignment = center
-
     # ================= LARGURA COLUNAS =================
     larguras = {
-        "A": 12,  # Placa
-        "B": 5,   # #
-        "C": 15,  # AIT
-        "D": 18,  # AIT Originária
-        "E": 55,  # Motivo
-        "F": 14,  # Data Infração
-        "G": 16,  # Data Vencimento
-        "H": 16,  # Valor
-        "I": 18,  # Valor a Pagar
-        "J": 20,  # Órgão Autuador
-        "K": 55,  # Código de barras
+        "Placa": 12,
+        "#": 5,
+        "AIT": 15,
+        "AIT Originária": 18,
+        "Motivo": 55,
+        "Data Infração": 14,
+        "Data Vencimento": 16,
+        "Valor": 16,
+        "Valor a Pagar": 18,
+        "Órgão Autuador": 20,
+        "Código de pagamento em barra": 55,
     }
 
-    for col, width in larguras.items():
-        ws.column_dimensions[col].width = width
-
-    # ================= EXTRAS =================
-    ws.freeze_panes = "A2"
-
-    wb.save(EXCEL_FILE)
+    # ================= GRAVAÇÃO =================
+    # Cabeçalho, bordas, alinhamento, larguras e painel congelado numa única
+    # gravação em streaming (sem reabrir o arquivo para formatar)
+    escrever_dataframe(EXCEL_FILE, df, larguras=larguras, nome_aba=SHEET_NAME)
 
     print("\n✅ Excel formatado com sucesso!")
     print(f"📄 Arquivo: {EXCEL_FILE}")
@@ -0,0 +1,88 @@
+"""
+Paginação por cursor (keyset) das listagens da API.
+
+As listagens ordenam por uma coluna de data decrescente com o id como
+desempate. O cursor codifica (data, id) da última linha entregue e a
+próxima página pede só as linhas "depois" dela:
+
+    data < v  OU  (data = v E id < id_cursor)
+
+Linhas com a coluna NULL vêm primeiro (NULLS FIRST, o padrão do Postgres
+para ordem decrescente, explícito na consulta). Um cursor parado nelas
+guarda null como valor e a próxima página é o resto das NULL mais todas
+as preenchidas:
+
+    (data IS NULL E id < id_cursor)  OU  data IS NOT NULL
+
+Ao contrário de offset, o custo de cada página não cresce com a
+posição, e linhas novas inseridas no topo não deslocam as páginas
+seguintes. O corpo da resposta continua sendo a lista (formato que o
+frontend já consome); o cursor da próxima página vai no cabeçalho
+X-Proximo-Cursor, ausente na última página. Sem `limite` nem `cursor` a
+listagem vem inteira, como antes da paginação.
+
+    DETRAN_PAGINA_PADRAO  linhas por página quando só o `cursor` é informado (padrão: 100)
+"""
+
+import base64
+import json
+import os
+
+from fastapi import HTTPException
+
+LIMITE_PADRAO = max(1, int(os.getenv("DETRAN_PAGINA_PADRAO", "100")))
+LIMITE_MAXIMO = 500
+CABECALHO_CURSOR = "X-Proximo-Cursor"
+
+
+def codificar_cursor(valor, id_linha):
+    bruto = json.dumps([valor, id_linha], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id_linha = json.loads(bruto)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if valor is not None and (not isinstance(valor, (str, int, float)) or isinstance(valor, bool)):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(id_linha, (str, int, float)) or isinstance(id_linha, bool):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valor, id_linha
+
+
+def _literal(valor):
+    """Valor entre aspas para os filtros or=/and= do PostgREST.
+
+    Vírgula, parênteses, ponto e ":" (datas ISO) são sintaxe dentro de
+    or=(...); entre aspas eles valem como texto, e só aspas e barra
+    invertida precisam de escape.
+    """
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def pagina(consulta, coluna, limite=None, cursor=None):
+    """Aplica ordem, cursor e limite (+1, para saber se há próxima página) na consulta PostgREST."""
+    if cursor:
+        valor, id_linha = decodificar_cursor(cursor)
+        i = _literal(id_linha)
+        if valor is None:
+            consulta = consulta.or_(f"and({coluna}.is.null,id.lt.{i}),{coluna}.not.is.null")
+        else:
+            v = _literal(valor)
+            consulta = consulta.or_(f"{coluna}.lt.{v},and({coluna}.eq.{v},id.lt.{i})")
+    consulta = consulta.order(coluna, desc=True, nullsfirst=True).order("id", desc=True)
+    if limite is None:
+        return consulta
+    return consulta.limit(limite + 1)
+
+
+def fatiar(linhas, coluna, limite):
+    """(linhas da página, cursor da próxima ou None) a partir do resultado de pagina()."""
+    if limite is None or len(linhas) <= limite:
+        return linhas, None
+    linhas = linhas[:limite]
+    ultima = linhas[-1]
+    return linhas, codificar_cursor(ultima.get(coluna), ultima.get("id"))
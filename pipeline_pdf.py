@@ -0,0 +1,88 @@
+"""
+Pipeline produtor/consumidor para o parsing dos boletos.
+
+Os workers de scraping (produtores) só baixam o PDF e o enfileiram com
+agendar(); um pool de processos (consumidor) roda extrair_boleto_do_pdf, que
+é CPU puro. O navegador fica livre para o próximo veículo na hora, e quem
+vai persistir o resultado chama concluir(multas) para esperar o parsing e
+aplicar os dados do boleto nas multas daquele veículo.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from detran_manual import extrair_boleto_do_pdf, log
+
+WORKERS_PDF = max(1, int(os.getenv("DETRAN_PDF_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))))
+
+DADOS_VAZIOS = ("-", "-", "-", "-")
+
+
+class PipelinePDF:
+    """Fila de PDFs para parsing em processos separados."""
+
+    def __init__(self, workers: int = WORKERS_PDF):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        # id(multas_lista) -> (multas_lista, [(future, aplicar), ...])
+        self._pendentes: Dict[int, Tuple[list, List[tuple]]] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: o processo principal tem threads do Playwright; fork aqui não é seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                log(f"🧮 Pipeline de PDFs iniciado com {self.workers} processo(s)")
+            return self._executor
+
+    def agendar(self, multas_lista: list, fonte_pdf, aplicar: Callable[[tuple, list], None]):
+        """Enfileira o parsing de `fonte_pdf` (caminho ou bytes).
+
+        `aplicar(dados_pdf, registros_ait)` é chamado por concluir(multas_lista), na thread
+        de quem consome o resultado.
+        """
+        if isinstance(fonte_pdf, (bytearray, memoryview)):
+            fonte_pdf = bytes(fonte_pdf)
+        futuro = self._pool().submit(extrair_boleto_do_pdf, fonte_pdf)
+        with self._lock:
+            _, itens = self._pendentes.setdefault(id(multas_lista), (multas_lista, []))
+            itens.append((futuro, aplicar))
+        return futuro
+
+    def concluir(self, multas_lista: list) -> list:
+        """Espera os PDFs agendados para estas multas e aplica os dados extraídos."""
+        with self._lock:
+            _, itens = self._pendentes.pop(id(multas_lista), (None, []))
+        for futuro, aplicar in itens:
+            try:
+                dados_pdf, registros = futuro.result()
+            except Exception as e:
+                log(f"⚠️ Erro no parsing do PDF em segundo plano: {e}")
+                dados_pdf, registros = DADOS_VAZIOS, []
+            log(f"🏢 Órgão Autuador: {dados_pdf[0]}")
+            log(f"📄 Descrição PDF: {dados_pdf[1]}")
+            log(f"📅 Datas do PDF - Infração: {dados_pdf[2]}, Vencimento: {dados_pdf[3]}")
+            aplicar(dados_pdf, registros)
+        return multas_lista
+
+    @property
+    def pendentes(self) -> int:
+        with self._lock:
+            return sum(len(itens) for _, itens in self._pendentes.values())
+
+    def encerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Instância única do processo
+pipeline = PipelinePDF()
@@ -0,0 +1,149 @@
+"""
+Planilhas Excel por consulta, geradas sob demanda.
+
+A API não grava mais o EXCEL_ARQUIVO global (consultas simultâneas
+sobrescreviam o mesmo arquivo). O Excel de cada consulta é montado a
+partir das linhas da tabela `multas` no primeiro download e guardado em
+disco como <consulta_id>_<versao>.xlsx; os downloads seguintes servem o
+arquivo pronto.
+
+A versão do conteúdo vem da própria linha da consulta (status, total de
+multas e valor total): se ela mudar, a planilha é refeita e a antiga é
+apagada. Quando a pasta passa do orçamento de tamanho, as planilhas
+menos baixadas recentemente são removidas (o mtime é renovado a cada
+download).
+
+    DETRAN_PLANILHAS_DIR     pasta das planilhas (padrão: planilhas_consultas)
+    DETRAN_PLANILHAS_MAX_MB  orçamento da pasta em MB (padrão: 500)
+"""
+
+import glob
+import hashlib
+import os
+import threading
+
+from excel_streaming import escrever_planilha
+
+DIRETORIO_PLANILHAS = os.getenv("DETRAN_PLANILHAS_DIR", "planilhas_consultas")
+ORCAMENTO_MB = float(os.getenv("DETRAN_PLANILHAS_MAX_MB", "500"))
+
+# Coluna da tabela multas -> coluna da planilha (mesma ordem de salvar_no_excel)
+COLUNAS_MULTAS = [
+    ("placa", "Placa"),
+    ("numero", "#"),
+    ("ait", "AIT"),
+    ("ait_originaria", "AIT Originária"),
+    ("motivo", "Motivo"),
+    ("data_infracao", "Data Infração"),
+    ("data_vencimento", "Data Vencimento"),
+    ("valor", "Valor"),
+    ("valor_a_pagar", "Valor a Pagar"),
+    ("orgao_autuador", "Órgão Autuador"),
+    ("codigo_pagamento", "Código de pagamento em barra"),
+]
+
+
+def log(msg):
+    print(msg)
+
+
+def versao_conteudo(consulta):
+    """Versão curta do conteúdo da consulta (muda se status ou totais mudarem)."""
+    base = f"{consulta.get('status')}|{consulta.get('total_multas')}|{consulta.get('valor_total')}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
+
+
+def _numero(multa):
+    try:
+        return int(multa.get("numero") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PlanilhasConsultas:
+    """Cache em disco das planilhas por (consulta_id, versão), com orçamento de tamanho."""
+
+    def __init__(self, diretorio=DIRETORIO_PLANILHAS, orcamento_mb=ORCAMENTO_MB):
+        self.diretorio = diretorio
+        self.orcamento_bytes = int(orcamento_mb * 1024 * 1024)
+        self._trava = threading.Lock()
+        # Uma trava por planilha: dois downloads simultâneos da mesma consulta geram o arquivo uma vez
+        self._travas_planilha = {}
+
+    def caminho(self, consulta_id, versao):
+        return os.path.join(self.diretorio, f"{consulta_id}_{versao}.xlsx")
+
+    def _trava_planilha(self, caminho):
+        with self._trava:
+            return self._travas_planilha.setdefault(caminho, threading.Lock())
+
+    def obter(self, consulta_id, versao, carregar_multas, ordem_placas=()):
+        """Caminho da planilha da consulta, gerando-a se ainda não existir.
+
+        `carregar_multas()` devolve as linhas da tabela multas; só é chamada
+        quando a planilha precisa ser gerada. `ordem_placas` mantém os
+        veículos na ordem da consulta (dentro de cada um, pelo número).
+        """
+        caminho = self.caminho(consulta_id, versao)
+        with self._trava_planilha(caminho):
+            if os.path.exists(caminho):
+                os.utime(caminho)
+                return caminho
+
+            os.makedirs(self.diretorio, exist_ok=True)
+            posicao = {placa: i for i, placa in enumerate(ordem_placas)}
+            multas = sorted(
+                carregar_multas(),
+                key=lambda m: (posicao.get(m.get("placa"), len(posicao)), _numero(m)),
+            )
+            escrever_planilha(
+                caminho,
+                [coluna for _, coluna in COLUNAS_MULTAS],
+                ([multa.get(campo) for campo, _ in COLUNAS_MULTAS] for multa in multas),
+            )
+            log(f"📊 Planilha da consulta {consulta_id} gerada ({len(multas)} multa(s))")
+
+        with self._trava:
+            self._travas_planilha.pop(caminho, None)
+        self._remover_versoes_antigas(consulta_id, caminho)
+        self.despejar(manter=caminho)
+        return caminho
+
+    def _remover_versoes_antigas(self, consulta_id, atual):
+        for antigo in glob.glob(os.path.join(self.diretorio, f"{consulta_id}_*.xlsx")):
+            if antigo != atual:
+                self._remover(antigo)
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    def despejar(self, manter=None):
+        """Remove as planilhas usadas há mais tempo até caber no orçamento."""
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.diretorio, "*.xlsx")):
+            try:
+                stat = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((stat.st_mtime, stat.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidas = 0
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.orcamento_bytes:
+                break
+            if caminho == manter:
+                continue
+            self._remover(caminho)
+            total -= tamanho
+            removidas += 1
+        if removidas:
+            log(f"🧹 {removidas} planilha(s) antiga(s) removida(s) ({total / 1024 / 1024:.1f} MB em uso)")
+        return removidas
+
+
+planilhas = PlanilhasConsultas()
@@ -0,0 +1,34 @@
+"""Reprocessa o arquivo de boletos (boletos/<data>/*.pdf) e atualiza o Excel.
+
+Uso:
+    python reprocessar_pdfs.py [--workers N] [--lote N] [--full] [--dry-run]
+
+Por padrão só os PDFs novos ou alterados desde a última execução são
+parseados (manifesto em boletos/manifesto_reprocessamento.json).
+"""
+import argparse
+
+from detran_manual import LOTE_REPROCESSAMENTO, WORKERS_REPROCESSAMENTO, reprocessar_pdfs_e_atualizar_excel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocessa os PDFs de boletos e atualiza o Excel")
+    parser.add_argument("--workers", type=int, default=WORKERS_REPROCESSAMENTO,
+                        help="processos de parsing (padrão: DETRAN_REPROCESSAR_WORKERS ou núcleos da máquina)")
+    parser.add_argument("--lote", type=int, default=LOTE_REPROCESSAMENTO,
+                        help="PDFs enviados por vez a cada processo")
+    parser.add_argument("--full", action="store_true",
+                        help="ignora o manifesto e reprocessa todos os PDFs")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="só mostra quantos PDFs seriam processados")
+    args = parser.parse_args()
+    reprocessar_pdfs_e_atualizar_excel(
+        workers=max(1, args.workers),
+        tamanho_lote=max(1, args.lote),
+        completo=args.full,
+        simulacao=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Fixtures dos testes.
+
+Os boletos de teste são PDFs mínimos gerados aqui mesmo (texto em
+Helvetica, uma linha por linha do boleto), sem depender de gerador de PDF
+instalado: os dois backends de texto leem esses arquivos como leem os
+boletos reais.
+"""
+
+import pytest
+
+LINHA_DIGITAVEL = "85630000001 4 04130006202 7 60130202689 8 06128693005 1"
+
+PAGINAS_BOLETO = [
+    [
+        "GOVERNO DO ESTADO DO CEARA",
+        "DEPARTAMENTO ESTADUAL DE TRANSITO",
+        "Emitido em 15/01/2026",
+        "Descrição (Taxa / Multa) Data Infração Vencimento Valor",
+        "DETRAN-CE | V607910965 | 07455 | TRANSITAR EM VELOCIDADE 06/11/2025 30/01/2026 130,16 104,13",
+        "DEMUTRAN FORTALEZA | F123456789 | 55412 | ESTACIONAR EM LOCAL PROIBIDO 01/10/2025 28/02/2026 195,23 156,18",
+        "Total 260,31",
+        LINHA_DIGITAVEL,
+    ],
+    [
+        "Lei 9503 de 23/09/1997",
+    ],
+]
+
+
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def gerar_pdf(paginas):
+    """Bytes de um PDF com uma página por item de `paginas` (lista de linhas)."""
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages, preenchido quando os ids das páginas são conhecidos
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    ids_paginas = []
+    for linhas in paginas:
+        comandos = ["BT", "/F1 9 Tf", "11 TL", "30 800 Td"]
+        comandos += [f"({_escapar(linha)}) Tj T*" for linha in linhas]
+        comandos.append("ET")
+        fluxo = "\n".join(comandos).encode("cp1252")
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objetos)
+        )
+        ids_paginas.append(len(objetos))
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas).encode("ascii")
+    objetos[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(ids_paginas)
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b"%010d 00000 n \n" % posicao
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(saida)
+
+
+@pytest.fixture
+def boleto_pdf(tmp_path):
+    """Caminho de um boleto com duas multas (duas linhas de AIT) em duas páginas."""
+    caminho = tmp_path / "boleto.pdf"
+    caminho.write_bytes(gerar_pdf(PAGINAS_BOLETO))
+    return str(caminho)
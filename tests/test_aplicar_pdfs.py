@@ -0,0 +1,67 @@
+import pandas as pd
+
+from detran_manual import COLUNAS_PDF, aplicar_pdfs_no_dataframe
+
+SEM_DADOS = ("-", "-", "-", "-")
+
+
+def _registro(ait, orgao="DETRAN-CE", infracao="06/11/2025", vencimento="30/01/2026"):
+    return {
+        "ait": ait, "orgao": orgao, "data_infracao": infracao, "vencimento": vencimento,
+        "codigo_pagamento": "8563 0000", "linha": f"{orgao} | {ait} | 07455 | MULTA",
+    }
+
+
+def _planilha():
+    return pd.DataFrame({
+        "Placa": ["AAA1111", "AAA1111", "BBB2222"],
+        "AIT": ["V607910965", "f-123456789", "X999"],
+        "Órgão Autuador": ["-", "-", "-"],
+        "Código de pagamento em barra": ["-", "-", "-"],
+        "Data Infração": ["01/01/2025", "02/02/2025", "03/03/2025"],
+        "Data Vencimento": ["-", "-", "-"],
+    })
+
+
+def test_casa_linhas_pelo_ait_normalizado():
+    df = _planilha()
+    linhas = aplicar_pdfs_no_dataframe(df, [
+        ("a.pdf", SEM_DADOS, [_registro("V607910965"), _registro("F123456789", orgao="DEMUTRAN", vencimento="-")]),
+    ])
+
+    assert linhas == {"a.pdf": [2, 3]}
+    assert list(df["Órgão Autuador"]) == ["DETRAN-CE", "DEMUTRAN", "-"]
+    assert df.loc[0, "Código de pagamento em barra"] == "8563 0000 | DETRAN-CE | V607910965 | 07455 | MULTA"
+    # Data que o PDF não trouxe não apaga a do Excel
+    assert list(df["Data Vencimento"]) == ["30/01/2026", "-", "-"]
+
+
+def test_pdf_mais_recente_vence():
+    df = _planilha()
+    linhas = aplicar_pdfs_no_dataframe(df, [
+        ("antigo.pdf", SEM_DADOS, [_registro("V607910965", orgao="ANTIGO")]),
+        ("novo.pdf", SEM_DADOS, [_registro("V607910965", orgao="NOVO")]),
+    ])
+
+    assert linhas == {"antigo.pdf": [], "novo.pdf": [2]}
+    assert df.loc[0, "Órgão Autuador"] == "NOVO"
+
+
+def test_pdf_sem_ait_preenche_linhas_livres_em_ordem():
+    df = _planilha()
+    linhas = aplicar_pdfs_no_dataframe(df, [
+        ("ait.pdf", SEM_DADOS, [_registro("V607910965")]),
+        ("solto.pdf", ("SEMOB", "8563 9999", "05/03/2025", "-"), []),
+        ("vazio.pdf", SEM_DADOS, []),
+    ])
+
+    assert linhas == {"ait.pdf": [2], "solto.pdf": [3], "vazio.pdf": []}
+    assert df.loc[1, list(COLUNAS_PDF)].tolist() == ["SEMOB", "8563 9999", "05/03/2025", "-"]
+    assert df.loc[2, "Órgão Autuador"] == "-"
+
+
+def test_cria_colunas_que_faltam():
+    df = pd.DataFrame({"AIT": ["V607910965"]})
+    aplicar_pdfs_no_dataframe(df, [("a.pdf", SEM_DADOS, [_registro("V607910965")])])
+    assert df.loc[0, list(COLUNAS_PDF)].tolist()[0] == "DETRAN-CE"
+    assert df.loc[0, "Data Infração"] == "06/11/2025"
@@ -0,0 +1,81 @@
+import threading
+
+from cache_leitura import CacheLeitura
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _cache(monkeypatch, **opcoes):
+    relogio = Relogio()
+    monkeypatch.setattr("cache_leitura.time.monotonic", relogio)
+    return CacheLeitura(**opcoes), relogio
+
+
+def test_entrada_mutavel_expira_no_ttl(monkeypatch):
+    cache, relogio = _cache(monkeypatch, ttl_s=2)
+    leituras = []
+
+    def carregar():
+        leituras.append(1)
+        return len(leituras)
+
+    assert cache.obter("status", "c1", carregar) == 1
+    relogio.agora += 1.9
+    assert cache.obter("status", "c1", carregar) == 1
+    relogio.agora += 0.2
+    assert cache.obter("status", "c1", carregar) == 2
+    assert cache.estatisticas()["acertos"] == 1
+
+
+def test_entrada_imutavel_nao_expira(monkeypatch):
+    cache, relogio = _cache(monkeypatch, ttl_s=2)
+    cache.obter("multas", "c1", lambda: ["m1"], imutavel=lambda valor: True)
+    relogio.agora += 3600
+    assert cache.obter("multas", "c1", lambda: ["outra"]) == ["m1"]
+
+
+def test_invalidar_descarta_so_a_consulta(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    cache.obter("status", "c1", lambda: "a1", imutavel=lambda v: True)
+    cache.obter("multas", "c1", lambda: "b1", imutavel=lambda v: True)
+    cache.obter("status", "c2", lambda: "a2", imutavel=lambda v: True)
+    cache.invalidar("c1")
+
+    assert cache.obter("status", "c1", lambda: "novo") == "novo"
+    assert cache.obter("status", "c2", lambda: "novo") == "a2"
+
+
+def test_leitura_concorrente_com_invalidacao_nao_e_guardada(monkeypatch):
+    cache, _ = _cache(monkeypatch)
+    lendo, liberar = threading.Event(), threading.Event()
+
+    def carregar_lento():
+        lendo.set()
+        liberar.wait(5)
+        return "antes da escrita"
+
+    leitor = threading.Thread(target=cache.obter, args=("status", "c1", carregar_lento))
+    leitor.start()
+    lendo.wait(5)
+    cache.invalidar("c1")  # o worker gravou enquanto a leitura estava em andamento
+    liberar.set()
+    leitor.join(5)
+
+    assert cache.obter("status", "c1", lambda: "depois da escrita") == "depois da escrita"
+
+
+def test_lru_respeita_max_entradas(monkeypatch):
+    cache, _ = _cache(monkeypatch, max_entradas=2)
+    for consulta_id in ("c1", "c2"):
+        cache.obter("status", consulta_id, lambda: consulta_id, imutavel=lambda v: True)
+    cache.obter("status", "c1", lambda: "x")  # c1 vira a mais recente
+    cache.obter("status", "c3", lambda: "c3", imutavel=lambda v: True)
+
+    assert cache.obter("status", "c1", lambda: "recarregada") == "c1"
+    assert cache.obter("status", "c2", lambda: "recarregada") == "recarregada"
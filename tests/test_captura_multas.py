@@ -0,0 +1,95 @@
+from captura_multas import CapturaMultas, _data_br, casar_com_linhas, _valor_float, encontrar_lista_multas, multas_do_payload
+
+LISTAGEM = {
+    "status": "ok",
+    "veiculo": {"placa": "ABC1D23", "proprietario": {"nome": "FULANO"}},
+    "dados": {
+        "taxas": [{"codigo": 1, "descricao": "LICENCIAMENTO", "valor": "120,00"}],
+        "multas": [
+            {"numeroAit": "V607910965", "descricaoInfracao": "TRANSITAR  EM\nVELOCIDADE",
+             "dataInfracao": "2025-11-06T10:30:00", "dataVencimento": "30/01/2026",
+             "valorOriginal": "130,16", "valorAPagar": "R$ 1.104,13"},
+            {"numeroAit": "F123456789", "descricaoInfracao": "ESTACIONAR",
+             "dataInfracao": "2025-10-01", "valor": 195.23},
+            {"numeroAit": "Q000000001", "descricaoInfracao": "PAGA", "valorAPagar": "0,00"},
+        ],
+    },
+}
+
+
+class _PaginaFalsa:
+    def on(self, evento, handler):
+        pass
+
+
+def test_encontrar_lista_multas_acha_a_lista_aninhada():
+    assert encontrar_lista_multas(LISTAGEM) is LISTAGEM["dados"]["multas"]
+
+
+def test_encontrar_lista_multas_ignora_listas_sem_ait():
+    assert encontrar_lista_multas({"taxas": [{"valor": 1}], "itens": []}) is None
+
+
+def test_encontrar_lista_multas_prefere_a_maior_lista():
+    pequena = [{"ait": "A1234"}, {"ait": "B1234", "valor": 10}]
+    grande = [{"ait": f"C{i:05d}", "valor": 1} for i in range(3)]
+    assert encontrar_lista_multas({"a": pequena, "b": {"c": grande}}) is grande
+
+
+def test_multas_do_payload_converte_campos_e_pula_pagas():
+    multas, total, indices = multas_do_payload(LISTAGEM["dados"]["multas"], "ABC1D23")
+
+    assert indices == [0, 1]
+    assert total == 1104.13 + 195.23
+    primeira, segunda = multas
+    assert primeira["AIT"] == "V607910965"
+    assert primeira["Motivo"] == "TRANSITAR EM VELOCIDADE"
+    assert (primeira["Data Infração"], primeira["Data Vencimento"]) == ("06/11/2025", "30/01/2026")
+    assert (primeira["Valor"], primeira["Valor a Pagar"]) == ("R$ 130,16", "R$ 1.104,13")
+    # Sem valor a pagar, o valor original vale para os dois
+    assert (segunda["Valor"], segunda["Valor a Pagar"]) == ("R$ 195,23", "R$ 195,23")
+    assert segunda["Data Vencimento"] == "-"
+    assert [m["#"] for m in multas] == [1, 2]
+
+
+def test_conversoes_de_data_e_valor():
+    assert _data_br("2026-01-30") == "30/01/2026"
+    assert _data_br(None) == "-"
+    assert _valor_float("R$ 1.234,56") == 1234.56
+    assert _valor_float("12.5") == 12.5
+    assert _valor_float("abc") == 0.0
+
+
+TEXTOS_TABELA = [
+    "□ Q000000001 -- PAGA 01/01/2025 R$ 0,00",
+    "□ F123456789 -- ESTACIONAR 01/10/2025 R$ 195,23",
+    "□ V607910965 -- TRANSITAR EM VELOCIDADE 30/01/2026 06/11/2025 R$ 130,16 R$ 1.104,13",
+]
+
+
+def test_casar_com_linhas_segue_a_ordem_da_tabela():
+    multas, _, _ = multas_do_payload(LISTAGEM["dados"]["multas"], "ABC1D23")
+    multas, indices = casar_com_linhas(multas, TEXTOS_TABELA)
+
+    assert indices == [1, 2]
+    assert [(m["#"], m["AIT"]) for m in multas] == [(1, "F123456789"), (2, "V607910965")]
+
+
+def test_casar_com_linhas_recusa_ait_ausente_ou_ambiguo():
+    multas, _, _ = multas_do_payload(LISTAGEM["dados"]["multas"], "ABC1D23")
+    assert casar_com_linhas(multas, TEXTOS_TABELA[:2]) is None
+    assert casar_com_linhas(multas, TEXTOS_TABELA + ["V607910965 repetido"]) is None
+    # AIT contido em outro maior não conta
+    assert casar_com_linhas(multas[:1], ["XV6079109650 -- OUTRA"]) is None
+
+
+def test_escolher_descarta_resposta_que_nao_bate_com_a_tabela():
+    captura = CapturaMultas(_PaginaFalsa())
+    payloads = [("/api/multas", LISTAGEM), ("/api/multas?pagina=2", {"multas": [{"ait": "Z12345", "valor": 5}]})]
+
+    multas, _, indices = captura._escolher(payloads, "ABC1D23", TEXTOS_TABELA)
+    assert [m["AIT"] for m in multas] == ["F123456789", "V607910965"]
+    assert indices == [1, 2]
+    assert captura._escolher(payloads, "ABC1D23", TEXTOS_TABELA[:2]) is None
+    # Mesma quantidade de linhas, mas outros AITs: volta para o DOM
+    assert captura._escolher(payloads, "ABC1D23", ["A1", "B2", "C3"]) is None
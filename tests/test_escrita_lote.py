@@ -0,0 +1,148 @@
+import httpx
+import pytest
+
+from escrita_lote import EscritaEmLote
+
+
+class _Consulta:
+    def __init__(self, cliente, tabela, operacao, linhas, opcoes):
+        self.cliente, self.chamada = cliente, (tabela, operacao, linhas, opcoes)
+
+    def eq(self, coluna, valor):
+        self.chamada[3][coluna] = valor
+        return self
+
+    def execute(self):
+        falha = self.cliente.falhas.pop(0) if self.cliente.falhas else None
+        if falha is not None:
+            raise falha
+        self.cliente.chamadas.append(self.chamada)
+
+
+class _Tabela:
+    def __init__(self, cliente, nome):
+        self.cliente, self.nome = cliente, nome
+
+    def upsert(self, linhas, on_conflict):
+        return _Consulta(self.cliente, self.nome, "upsert", linhas, {"on_conflict": on_conflict})
+
+    def insert(self, linhas):
+        return _Consulta(self.cliente, self.nome, "insert", linhas, {})
+
+    def update(self, dados):
+        return _Consulta(self.cliente, self.nome, "update", dados, {})
+
+
+class ClienteFalso:
+    """Registra cada .execute(); `falhas` é a fila de exceções das próximas chamadas (None = sucesso)."""
+
+    def __init__(self, falhas=()):
+        self.chamadas = []
+        self.falhas = list(falhas)
+
+    def table(self, nome):
+        return _Tabela(self, nome)
+
+
+def _multa(placa, numero, ait="-", valor="R$ 10,00"):
+    return {"consulta_id": "c1", "placa": placa, "numero": numero, "ait": ait, "valor": valor}
+
+
+@pytest.fixture
+def gravadas():
+    return []
+
+
+def _escrita(cliente, gravadas):
+    # Intervalo longo: só descarregar() explícito grava nos testes
+    return EscritaEmLote(cliente, lote_maximo=1000, intervalo_s=60, ao_gravar=gravadas.append)
+
+
+def test_status_coalescido_e_multas_num_lote(gravadas):
+    cliente = ClienteFalso()
+    escrita = _escrita(cliente, gravadas)
+    escrita.atualizar_veiculo("c1", "AAA1111", {"status": "processing"})
+    escrita.atualizar_veiculo("c1", "AAA1111", {"status": "completed", "multas_count": 2})
+    escrita.atualizar_veiculo("c1", "BBB2222", {"status": "processing"})
+    escrita.inserir_multas([_multa("AAA1111", 1, "V1"), _multa("AAA1111", 2, "V2")])
+    escrita.descarregar()
+
+    veiculos = [c for c in cliente.chamadas if c[0] == "veiculos_consulta"]
+    assert [c[1] for c in veiculos] == ["upsert", "upsert"]  # dois grupos de colunas
+    linhas = {l["placa"]: l for c in veiculos for l in c[2]}
+    assert linhas["AAA1111"] == {"consulta_id": "c1", "placa": "AAA1111", "status": "completed", "multas_count": 2}
+    assert cliente.chamadas[-1][:2] == ("multas", "upsert")
+    assert cliente.chamadas[-1][3] == {"on_conflict": "consulta_id,placa,numero"}
+    assert escrita.estatisticas() == {"pendentes": 0, "round_trips": 3, "linhas_gravadas": 4}
+    assert gravadas == [{"c1"}]
+    escrita.encerrar()
+
+
+def test_multas_sem_ait_nao_se_fundem(gravadas):
+    cliente = ClienteFalso()
+    escrita = _escrita(cliente, gravadas)
+    # AIT não lido vira "-": cada multa continua sendo uma linha
+    multas = [_multa("AAA1111", 1), _multa("AAA1111", 2), _multa("BBB2222", 1)]
+    escrita.inserir_multas(multas)
+    escrita.descarregar()
+
+    assert cliente.chamadas == [("multas", "upsert", multas, {"on_conflict": "consulta_id,placa,numero"})]
+    escrita.encerrar()
+
+
+def test_multa_reenfileirada_vira_uma_linha(gravadas):
+    cliente = ClienteFalso()
+    escrita = _escrita(cliente, gravadas)
+    escrita.inserir_multas([_multa("AAA1111", 1, "V1", "R$ 1,00"), _multa("AAA1111", 1, "V1", "R$ 2,00")])
+    escrita.descarregar()
+
+    assert cliente.chamadas[0][2] == [_multa("AAA1111", 1, "V1", "R$ 2,00")]
+    escrita.encerrar()
+
+
+def test_falha_devolve_ao_buffer_sem_sobrescrever_status_novo(gravadas):
+    cliente = ClienteFalso(falhas=[httpx.ReadTimeout("lento")])
+    escrita = _escrita(cliente, gravadas)
+    escrita.atualizar_veiculo("c1", "AAA1111", {"status": "processing", "mensagem": None})
+    escrita.inserir_multas([_multa("AAA1111", 1, "V1")])
+    with pytest.raises(httpx.ReadTimeout):
+        escrita.descarregar()
+    escrita.atualizar_veiculo("c1", "AAA1111", {"status": "completed"})
+    assert escrita.estatisticas()["pendentes"] == 2
+
+    escrita.descarregar()
+    assert cliente.chamadas[0][2] == [{"consulta_id": "c1", "placa": "AAA1111", "status": "completed", "mensagem": None}]
+    assert cliente.chamadas[1][2] == [_multa("AAA1111", 1, "V1")]
+    assert gravadas == [{"c1"}, {"c1"}]
+    escrita.encerrar()
+
+
+def test_sem_indice_unico_cai_para_update_e_insert(gravadas):
+    sem_indice = Exception("{'code': '42P10', 'message': 'no unique constraint'}")
+    cliente = ClienteFalso(falhas=[sem_indice, None, sem_indice])
+    escrita = _escrita(cliente, gravadas)
+    escrita.atualizar_veiculo("c1", "AAA1111", {"status": "completed"})
+    escrita.inserir_multas([_multa("AAA1111", 1, "V1")])
+    escrita.descarregar()
+
+    assert [c[:2] for c in cliente.chamadas] == [("veiculos_consulta", "update"), ("multas", "insert")]
+    escrita.encerrar()
+
+
+def test_insert_com_resultado_incerto_nao_e_repetido(gravadas):
+    sem_indice = Exception("42P10")
+    cliente = ClienteFalso(falhas=[sem_indice, httpx.ReadTimeout("lento")])
+    escrita = _escrita(cliente, gravadas)
+    escrita.inserir_multas([_multa("AAA1111", 1, "V1")])
+    with pytest.raises(httpx.ReadTimeout):
+        escrita.descarregar()
+    assert escrita.estatisticas()["pendentes"] == 0
+
+    # Sem conexão nada chegou ao banco: o lote volta para o buffer
+    cliente.falhas = [httpx.ConnectError("recusada")]
+    escrita.inserir_multas([_multa("AAA1111", 2, "V2")])
+    with pytest.raises(httpx.ConnectError):
+        escrita.descarregar()
+    assert escrita.estatisticas()["pendentes"] == 1
+    escrita.encerrar()
+    assert cliente.chamadas == [("multas", "insert", [_multa("AAA1111", 2, "V2")], {})]
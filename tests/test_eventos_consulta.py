@@ -0,0 +1,59 @@
+import asyncio
+
+from eventos_consulta import BarramentoEventos
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _barramento(monkeypatch, **opcoes):
+    relogio = Relogio()
+    monkeypatch.setattr("eventos_consulta.time.monotonic", relogio)
+    return BarramentoEventos(**opcoes), relogio
+
+
+def test_encerrada_sai_depois_da_retencao_em_qualquer_publicacao(monkeypatch):
+    barramento, relogio = _barramento(monkeypatch, retencao_s=10, max_idade_s=100)
+    barramento.iniciar("c1", ["AAA1111"])
+    barramento.status("c1", "completed")
+    barramento.iniciar("c2", ["BBB2222"])
+
+    relogio.agora += 11
+    barramento.veiculo("c2", "BBB2222", {"status": "processing"})
+
+    assert "c1" not in barramento._consultas
+    assert "c2" in barramento._consultas
+
+
+def test_consulta_parada_sai_pela_idade(monkeypatch):
+    barramento, relogio = _barramento(monkeypatch, retencao_s=10, max_idade_s=100)
+    barramento.iniciar("parada", ["AAA1111"])
+    barramento.iniciar("viva", ["BBB2222"])
+
+    relogio.agora += 60
+    barramento.veiculo("viva", "BBB2222", {"status": "processing"})
+    relogio.agora += 60
+
+    assert barramento.ativas() == 1
+    assert list(barramento._consultas) == ["viva"]
+
+
+def test_assinante_segura_a_consulta_ate_cancelar(monkeypatch):
+    barramento, relogio = _barramento(monkeypatch, retencao_s=10, max_idade_s=100)
+    barramento.iniciar("c1", ["AAA1111"])
+
+    async def assistir():
+        return barramento.assinar("c1")
+
+    _, fila = asyncio.run(assistir())
+    relogio.agora += 200
+    assert barramento.ativas() == 1
+
+    barramento.cancelar("c1", fila)
+    assert barramento._consultas == {}
+    assert asyncio.run(assistir()) is None
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+
+import pytest
+
+import exportacao_multas
+from exportacao_multas import COLUNAS_EXPORTACAO, exportar
+
+
+def _banco(total):
+    """buscar_pagina sobre `total` multas em memória, anotando cada chamada."""
+    linhas = [
+        {"id": i, "placa": "ABC1D23", "numero": i, "ait": f"V{i:09d}", "motivo": f"MULTA {i}", "valor": "R$ 1,00"}
+        for i in range(1, total + 1)
+    ]
+    chamadas = []
+
+    def buscar_pagina(depois_de_id, tamanho):
+        chamadas.append(depois_de_id)
+        inicio = 0 if depois_de_id is None else depois_de_id
+        return linhas[inicio:inicio + tamanho]
+
+    return buscar_pagina, chamadas
+
+
+def test_csv_paginado_com_bom_e_cabecalho():
+    buscar_pagina, chamadas = _banco(5)
+    corpo = b"".join(exportar("csv", buscar_pagina, tamanho=2)).decode("utf-8")
+
+    assert corpo.startswith("﻿")
+    linhas = list(csv.reader(io.StringIO(corpo[1:])))
+    assert linhas[0] == COLUNAS_EXPORTACAO
+    assert [l[2] for l in linhas[1:]] == [f"V{i:09d}" for i in range(1, 6)]
+    assert chamadas == [None, 2, 4]
+
+
+def test_ndjson_uma_linha_por_multa():
+    buscar_pagina, chamadas = _banco(4)
+    linhas = b"".join(exportar("ndjson", buscar_pagina, tamanho=2)).decode("utf-8").splitlines()
+
+    assert [json.loads(l)["numero"] for l in linhas] == [1, 2, 3, 4]
+    assert set(json.loads(linhas[0])) == set(COLUNAS_EXPORTACAO)
+    # Página cheia na última: mais uma busca, vazia, encerra
+    assert chamadas == [None, 2, 4]
+
+
+def test_parquet_um_row_group_por_pagina():
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    buscar_pagina, _ = _banco(5)
+    corpo = b"".join(exportar("parquet", buscar_pagina, tamanho=2))
+    arquivo = pyarrow.parquet.ParquetFile(io.BytesIO(corpo))
+
+    assert arquivo.metadata.num_row_groups == 3
+    tabela = arquivo.read()
+    assert tabela.column_names == COLUNAS_EXPORTACAO
+    assert tabela.column("numero").to_pylist() == [1, 2, 3, 4, 5]
+    assert tabela.column("data_infracao").to_pylist() == [None] * 5
+
+
+def test_parquet_sem_pyarrow_falha_com_mensagem(monkeypatch):
+    monkeypatch.setattr(exportacao_multas, "pyarrow", None)
+    assert not exportacao_multas.parquet_disponivel()
+    with pytest.raises(RuntimeError, match="pyarrow"):
+        list(exportar("parquet", _banco(1)[0]))
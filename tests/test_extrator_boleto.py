@@ -0,0 +1,60 @@
+from conftest import LINHA_DIGITAVEL, PAGINAS_BOLETO
+from extrator_boleto import extrair_boleto, extrair_campos, indexar_por_ait, normalizar_ait
+
+
+def _paginas(paginas, lidas):
+    """Gerador que anota quantas páginas o extrator pediu."""
+    for linhas in paginas:
+        lidas.append(len(lidas))
+        yield "\n".join(linhas)
+
+
+def test_extrair_boleto_registra_cada_ait():
+    campos, registros = extrair_boleto(_paginas(PAGINAS_BOLETO, []))
+
+    assert campos[0] == "DETRAN-CE"
+    assert campos[2:] == ("06/11/2025", "30/01/2026")
+    assert [r["ait"] for r in registros] == ["V607910965", "F123456789"]
+    segundo = registros[1]
+    assert segundo["orgao"] == "DEMUTRAN FORTALEZA"
+    assert segundo["descricao"] == "ESTACIONAR EM LOCAL PROIBIDO"
+    assert (segundo["data_infracao"], segundo["vencimento"]) == ("01/10/2025", "28/02/2026")
+    assert (segundo["valor"], segundo["valor_a_pagar"]) == ("195,23", "156,18")
+    assert all(r["codigo_pagamento"] == LINHA_DIGITAVEL for r in registros)
+
+
+def test_extrair_boleto_para_depois_do_fim_da_tabela():
+    lidas = []
+    extrair_boleto(_paginas(PAGINAS_BOLETO, lidas))
+    assert lidas == [0]
+
+
+def test_extrair_boleto_le_tabela_que_continua_na_pagina_seguinte():
+    paginas = [
+        PAGINAS_BOLETO[0][:5],
+        ["DETRAN-CE | V700000001 | 07455 | AVANCAR SINAL 02/12/2025 30/01/2026 293,47 234,78", "Total 293,47", LINHA_DIGITAVEL],
+    ]
+    lidas = []
+    campos, registros = extrair_boleto(_paginas(paginas, lidas))
+
+    assert lidas == [0, 1]
+    assert [r["ait"] for r in registros] == ["V607910965", "V700000001"]
+    assert campos[1].startswith(LINHA_DIGITAVEL)
+
+
+def test_extrair_campos_tem_o_mesmo_cabecalho_que_extrair_boleto():
+    assert extrair_campos(_paginas(PAGINAS_BOLETO, [])) == extrair_boleto(_paginas(PAGINAS_BOLETO, []))[0]
+
+
+def test_fallbacks_sem_linha_de_multa():
+    paginas = [["SEMOB", "Data Infração Vencimento", "Multa 05/03/2025 20/04/2025"], [LINHA_DIGITAVEL]]
+    campos, registros = extrair_boleto(_paginas(paginas, []))
+
+    assert campos == ("SEMOB", LINHA_DIGITAVEL, "05/03/2025", "20/04/2025")
+    assert registros == []
+
+
+def test_indexar_por_ait_normaliza_a_chave():
+    registros = [{"ait": "v-607.910965"}, {"ait": "V607910965", "repetido": True}]
+    assert normalizar_ait(" v-607.910965 ") == "V607910965"
+    assert indexar_por_ait(registros) == {"V607910965": registros[0]}
@@ -0,0 +1,64 @@
+import os
+
+from manifesto_pdfs import ManifestoReprocessamento
+
+
+def _arquivos(tmp_path):
+    excel = tmp_path / "multas.xlsx"
+    excel.write_bytes(b"planilha v1")
+    pdf = tmp_path / "boleto.pdf"
+    pdf.write_bytes(b"%PDF-1.4 boleto")
+    return str(excel), str(pdf)
+
+
+def _aplicar(caminho_manifesto, excel, pdf, linhas):
+    manifesto = ManifestoReprocessamento(caminho_manifesto)
+    manifesto.conferir_planilha(excel)
+    pendentes = manifesto.classificar([pdf], "v1")
+    manifesto.registrar(pdf, "v1", linhas)
+    manifesto.salvar()
+    return pendentes
+
+
+def test_pdf_aplicado_fica_inalterado(tmp_path):
+    excel, pdf = _arquivos(tmp_path)
+    caminho = str(tmp_path / "manifesto.json")
+    assert _aplicar(caminho, excel, pdf, [2]) == ([pdf], [], [])
+
+    manifesto = ManifestoReprocessamento(caminho)
+    manifesto.conferir_planilha(excel)
+    assert manifesto.classificar([pdf], "v1") == ([], [], [pdf])
+    assert manifesto.classificar([pdf], "v2") == ([], [pdf], [])
+
+
+def test_pdf_sem_linhas_atualizadas_continua_pendente(tmp_path):
+    excel, pdf = _arquivos(tmp_path)
+    caminho = str(tmp_path / "manifesto.json")
+    _aplicar(caminho, excel, pdf, [])
+
+    manifesto = ManifestoReprocessamento(caminho)
+    manifesto.conferir_planilha(excel)
+    assert manifesto.classificar([pdf], "v1") == ([pdf], [], [])
+
+
+def test_excel_alterado_invalida_todas_as_entradas(tmp_path):
+    excel, pdf = _arquivos(tmp_path)
+    caminho = str(tmp_path / "manifesto.json")
+    _aplicar(caminho, excel, pdf, [2])
+
+    with open(excel, "wb") as f:
+        f.write(b"planilha v2, regravada por outra execucao")
+    manifesto = ManifestoReprocessamento(caminho)
+    manifesto.conferir_planilha(excel)
+    assert manifesto.classificar([pdf], "v1") == ([pdf], [], [])
+
+
+def test_excel_so_tocado_nao_invalida(tmp_path):
+    excel, pdf = _arquivos(tmp_path)
+    caminho = str(tmp_path / "manifesto.json")
+    _aplicar(caminho, excel, pdf, [2])
+
+    os.utime(excel, (1, 1))
+    manifesto = ManifestoReprocessamento(caminho)
+    manifesto.conferir_planilha(excel)
+    assert manifesto.classificar([pdf], "v1") == ([], [], [pdf])
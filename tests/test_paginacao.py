@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+from postgrest import SyncPostgrestClient
+
+from paginacao import codificar_cursor, decodificar_cursor, fatiar, pagina
+
+
+def _consulta():
+    return SyncPostgrestClient("http://postgrest.invalido").table("consultas").select("id,created_at")
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor("2025-01-02T03:04:05.123456+00:00", 42)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == ("2025-01-02T03:04:05.123456+00:00", 42)
+
+
+@pytest.mark.parametrize("cursor", ["@@@", codificar_cursor("x", 1)[:-3], "WzFd", "W1sxXSwxXQ", "W3RydWUsMV0"])
+def test_cursor_invalido_e_400(cursor):
+    # "WzFd" = [1]; "W1sxXSwxXQ" = [[1],1]; "W3RydWUsMV0" = [true,1]
+    with pytest.raises(HTTPException) as erro:
+        decodificar_cursor(cursor)
+    assert erro.value.status_code == 400
+
+
+def test_sem_limite_nem_cursor_traz_tudo_ordenado():
+    params = pagina(_consulta(), "created_at").params
+    assert params.get_list("order") == ["created_at.desc.nullsfirst,id.desc"]
+    assert "limit" not in params and "or" not in params
+
+
+def test_pagina_com_cursor_filtra_depois_da_ultima_linha():
+    cursor = codificar_cursor("2025-01-02T03:04:05+00:00", 7)
+    params = pagina(_consulta(), "created_at", 50, cursor).params
+
+    assert params["limit"] == "51"
+    assert params["order"] == "created_at.desc.nullsfirst,id.desc"
+    assert params["or"] == (
+        '(created_at.lt."2025-01-02T03:04:05+00:00",'
+        'and(created_at.eq."2025-01-02T03:04:05+00:00",id.lt."7"))'
+    )
+
+
+def test_cursor_parado_em_coluna_null():
+    linhas = [{"id": 9, "created_at": None}, {"id": 8, "created_at": None}, {"id": 7, "created_at": "2025-01-02"}]
+    _, proximo = fatiar(linhas, "created_at", 2)
+    assert decodificar_cursor(proximo) == (None, 8)
+
+    params = pagina(_consulta(), "created_at", 2, proximo).params
+    assert params["or"] == '(and(created_at.is.null,id.lt."8"),created_at.not.is.null)'
+
+
+def test_valor_do_cursor_fica_entre_aspas_com_escape():
+    cursor = codificar_cursor('a,b.(c)"d\\e', "x")
+    filtro = pagina(_consulta(), "nome", 10, cursor).params["or"]
+    assert filtro == '(nome.lt."a,b.(c)\\"d\\\\e",and(nome.eq."a,b.(c)\\"d\\\\e",id.lt."x"))'
+
+
+def test_fatiar():
+    linhas = [{"id": i, "created_at": f"2025-01-{31 - i:02d}"} for i in range(3)]
+
+    assert fatiar(linhas, "created_at", 3) == (linhas, None)
+    assert fatiar(linhas, "created_at", None) == (linhas, None)
+    pagina_1, proximo = fatiar(linhas, "created_at", 2)
+    assert pagina_1 == linhas[:2]
+    assert decodificar_cursor(proximo) == ("2025-01-30", 1)
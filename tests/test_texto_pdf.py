@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import LINHA_DIGITAVEL, gerar_pdf
+from extrator_boleto import extrair_campos
+from texto_pdf import BACKENDS, BackendPdfium, BackendPdfplumber, verificar_paridade
+
+CAMPOS_ESPERADOS = (
+    "DETRAN-CE",
+    f"{LINHA_DIGITAVEL} | DETRAN-CE | V607910965 | 07455 | TRANSITAR EM VELOCIDADE 06/11/2025 30/01/2026 130,16 104,13",
+    "06/11/2025",
+    "30/01/2026",
+)
+
+
+def _campos(backend, fonte):
+    with backend.paginas(fonte) as paginas:
+        return tuple(extrair_campos(paginas))
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    classe = BACKENDS[request.param]
+    if not classe.disponivel():
+        pytest.skip(f"backend {request.param} não instalado")
+    return classe()
+
+
+def test_backend_extrai_campos_do_boleto(backend, boleto_pdf):
+    assert _campos(backend, boleto_pdf) == CAMPOS_ESPERADOS
+
+
+def test_pdfplumber_e_pdfium_extraem_os_mesmos_campos(boleto_pdf, tmp_path):
+    if not (BackendPdfplumber.disponivel() and BackendPdfium.disponivel()):
+        pytest.skip("precisa de pdfplumber e pypdfium2")
+    # Um boleto sem linha de multa força os fallbacks sobre o texto inteiro
+    sem_ait = tmp_path / "sem_ait.pdf"
+    sem_ait.write_bytes(gerar_pdf([
+        ["SEMOB", "Data Infração Vencimento", "Multa 05/03/2025 20/04/2025"],
+        [LINHA_DIGITAVEL],
+    ]))
+
+    assert _campos(BackendPdfplumber(), boleto_pdf) == _campos(BackendPdfium(), boleto_pdf)
+    _, divergencias = verificar_paridade([boleto_pdf, str(sem_ait)])
+    assert divergencias == []
+
+
+def test_pdf_ilegivel_nao_diverge(tmp_path):
+    if not (BackendPdfplumber.disponivel() and BackendPdfium.disponivel()):
+        pytest.skip("precisa de pdfplumber e pypdfium2")
+    quebrado = tmp_path / "quebrado.pdf"
+    quebrado.write_bytes(b"isto nao e um pdf")
+    _, divergencias = verificar_paridade([str(quebrado)])
+    assert divergencias == []
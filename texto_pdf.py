@@ -0,0 +1,154 @@
+"""
+Backends de extração de texto dos boletos em PDF.
+
+Todo backend devolve o texto página a página, sob demanda: o extrator
+(extrator_boleto) para de pedir páginas assim que achou os campos do
+cabeçalho e a tabela de AITs terminou, então a página 2 só é lida quando a
+tabela continua nela (ou falta algum campo).
+
+    pdfplumber  referência (análise de layout completa, mais lento)
+    pdfium      pypdfium2, texto direto do PDFium (bem mais rápido)
+
+DETRAN_TEXTO_PDF escolhe o backend; se o escolhido não estiver instalado,
+cai no pdfplumber. `python texto_pdf.py <pasta>` compara os backends nos
+PDFs da pasta (mesmos quatro campos em todos).
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+BACKEND_TEXTO = os.getenv("DETRAN_TEXTO_PDF", "pdfplumber").lower()
+MAX_PAGINAS = 2  # cabeçalho e descrição ficam nas 2 primeiras páginas
+
+
+def log(msg):
+    print(msg)
+
+
+class BackendPdfplumber:
+    nome = "pdfplumber"
+
+    @staticmethod
+    def disponivel():
+        return pdfplumber is not None
+
+    @contextmanager
+    def paginas(self, fonte, max_paginas=MAX_PAGINAS):
+        """Gerador do texto de cada página, extraído só quando é pedido."""
+        with pdfplumber.open(fonte) as pdf:
+            yield ((page.extract_text() or "") for page in pdf.pages[:max_paginas])
+
+
+class BackendPdfium:
+    nome = "pdfium"
+
+    @staticmethod
+    def disponivel():
+        return pypdfium2 is not None
+
+    @contextmanager
+    def paginas(self, fonte, max_paginas=MAX_PAGINAS):
+        documento = pypdfium2.PdfDocument(fonte)
+        try:
+            yield self._textos(documento, max_paginas)
+        finally:
+            documento.close()
+
+    @staticmethod
+    def _textos(documento, max_paginas):
+        for indice in range(min(max_paginas, len(documento))):
+            pagina = documento[indice]
+            texto_pagina = pagina.get_textpage()
+            try:
+                texto = texto_pagina.get_text_range()
+            finally:
+                texto_pagina.close()
+                pagina.close()
+            # PDFium separa linhas com \r\n; o extrator trabalha com \n como o pdfplumber
+            yield texto.replace("\r\n", "\n").replace("\r", "\n")
+
+
+BACKENDS = {
+    BackendPdfplumber.nome: BackendPdfplumber,
+    BackendPdfium.nome: BackendPdfium,
+}
+
+
+def obter_backend(nome=None):
+    """Instância do backend `nome` (padrão: DETRAN_TEXTO_PDF), ou None sem nenhum disponível."""
+    nome = (nome or BACKEND_TEXTO).lower()
+    classe = BACKENDS.get(nome)
+    if classe is None or not classe.disponivel():
+        if nome != BackendPdfplumber.nome:
+            log(f"⚠️ Backend de texto '{nome}' indisponível, usando pdfplumber")
+        classe = BackendPdfplumber
+    return classe() if classe.disponivel() else None
+
+
+def verificar_paridade(caminhos, backends=tuple(BACKENDS)):
+    """Extrai os campos de cada PDF com cada backend e lista as divergências.
+
+    Retorna (tempos_por_backend_em_s, divergencias), onde cada divergência é
+    (caminho, {backend: campos}).
+    """
+    from extrator_boleto import extrair_campos
+
+    instancias = [BACKENDS[nome]() for nome in backends if BACKENDS[nome].disponivel()]
+    tempos = {b.nome: 0.0 for b in instancias}
+    divergencias = []
+    for caminho in caminhos:
+        campos = {}
+        for backend in instancias:
+            inicio = time.perf_counter()
+            try:
+                with backend.paginas(caminho) as paginas:
+                    campos[backend.nome] = tuple(extrair_campos(paginas))
+            except Exception:
+                # Como em extrair_dados_do_pdf: PDF ilegível vira campos vazios
+                campos[backend.nome] = ("-", "-", "-", "-")
+            tempos[backend.nome] += time.perf_counter() - inicio
+        if len(set(campos.values())) > 1:
+            divergencias.append((caminho, campos))
+    return tempos, divergencias
+
+
+def main():
+    pasta = sys.argv[1] if len(sys.argv) > 1 else "boletos"
+    caminhos = sorted(
+        os.path.join(raiz, arquivo)
+        for raiz, _, arquivos in os.walk(pasta)
+        for arquivo in arquivos
+        if arquivo.lower().endswith(".pdf")
+    )
+    if not caminhos:
+        log(f"❌ Nenhum PDF em {pasta}")
+        sys.exit(1)
+
+    tempos, divergencias = verificar_paridade(caminhos)
+    log(f"📄 {len(caminhos)} PDF(s)")
+    for nome, segundos in tempos.items():
+        log(f"   {nome:<11} {segundos * 1000:8.1f} ms  ({segundos / len(caminhos) * 1000:.1f} ms/PDF)")
+    if divergencias:
+        log(f"❌ {len(divergencias)} PDF(s) com campos diferentes entre backends:")
+        for caminho, campos in divergencias[:10]:
+            log(f"   {caminho}")
+            for nome, valores in campos.items():
+                log(f"      {nome}: {valores}")
+        sys.exit(1)
+    log("✅ Todos os backends extraíram os mesmos campos")
+
+
+if __name__ == "__main__":
+    main()